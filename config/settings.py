@@ -4,6 +4,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DATA_PATH = os.getenv("DATA_PATH", "data/test.csv")
+# Caché columnar del dataset (offsets + blob mapeados en memoria), validado contra el tamaño y el hash del CSV
+DATASET_CACHE_ENABLED = os.getenv("DATASET_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", "data/dataset_cache")
 
 CACHE_HOST = os.getenv("CACHE_HOST", "localhost")
 CACHE_PORT = int(os.getenv("CACHE_PORT", "6379"))
@@ -21,21 +24,122 @@ GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash-exp")
 # Ollama (Local)
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 OLLAMA_MODEL_NAME = os.getenv("OLLAMA_MODEL_NAME", "llama3.2")  
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 
 # Groq 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL_NAME = os.getenv("GROQ_MODEL_NAME", "llama-3.3-70b-versatile")
 
+# Warm-up del LLM (precarga del modelo y prompts de calibración)
+LLM_WARMUP_ENABLED = os.getenv("LLM_WARMUP_ENABLED", "true").lower() in ("true", "1", "yes")
+LLM_WARMUP_PROMPTS = int(os.getenv("LLM_WARMUP_PROMPTS", "1"))
+
+# Scoring: PAIR ajusta el TF-IDF por cada par, CORPUS lo ajusta una vez sobre best_answer
+# y HASHING usa buckets de hashing con un IDF precalculado (memoria fija)
+SCORER_MODE = os.getenv("SCORER_MODE", "PAIR")
+SCORER_CACHE_DIR = os.getenv("SCORER_CACHE_DIR", "data/scorer_cache")
+SCORER_CORPUS_MAX_FEATURES = int(os.getenv("SCORER_CORPUS_MAX_FEATURES", "50000"))
+SCORER_HASHING_FEATURES = int(os.getenv("SCORER_HASHING_FEATURES", str(2**18)))
+SCORER_REFERENCE_VECTORS_PATH = os.getenv("SCORER_REFERENCE_VECTORS_PATH", "data/reference_vectors")
+
+# Métricas de calidad (separadas por coma): tfidf_cosine, token_f1, jaccard, minhash, rouge_l
+SCORING_METRICS = os.getenv("SCORING_METRICS", "tfidf_cosine")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# Scoring asíncrono en un pool de procesos (fuera del camino del request)
+SCORING_ASYNC = os.getenv("SCORING_ASYNC", "false").lower() in ("true", "1", "yes")
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "2"))
+SCORING_QUEUE_SIZE = int(os.getenv("SCORING_QUEUE_SIZE", "100"))
+
 DB_TYPE = os.getenv("DB_TYPE", "SQLITE")
 SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "data/results.db")
 
-# POSTGRES_DB_USER = os.getenv("POSTGRES_DB_USER")
-# POSTGRES_DB_PASSWORD = os.getenv("POSTGRES_DB_PASSWORD")
-# POSTGRES_DB_HOST = os.getenv("POSTGRES_DB_HOST")
-# POSTGRES_DB_PORT = int(os.getenv("POSTGRES_DB_PORT", "5432"))
-# POSTGRES_DB_NAME = os.getenv("POSTGRES_DB_NAME")
+# Conexión SQLite persistente en modo WAL y escritura diferida por lotes
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_WRITE_BEHIND = os.getenv("DB_WRITE_BEHIND", "true").lower() in ("true", "1", "yes")
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "200"))
+DB_WRITE_FLUSH_INTERVAL = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "0.5"))
+
+# Exportación columnar (Parquet, una partición por experimento) para los análisis
+COLUMNAR_DIR = os.getenv("COLUMNAR_DIR", "data/columnar")
+COLUMNAR_COMPRESSION = os.getenv("COLUMNAR_COMPRESSION", "zstd")
+COLUMNAR_SINK_ENABLED = os.getenv("COLUMNAR_SINK_ENABLED", "false").lower() in ("true", "1", "yes")
+COLUMNAR_SINK_FLUSH_ROWS = int(os.getenv("COLUMNAR_SINK_FLUSH_ROWS", "10000"))
+
+# Backend PostgreSQL (DB_TYPE=POSTGRESQL): varios generadores pueden escribir en la misma base de datos
+POSTGRES_DB_USER = os.getenv("POSTGRES_DB_USER", "yahoo")
+POSTGRES_DB_PASSWORD = os.getenv("POSTGRES_DB_PASSWORD")
+POSTGRES_DB_HOST = os.getenv("POSTGRES_DB_HOST", "localhost")
+POSTGRES_DB_PORT = int(os.getenv("POSTGRES_DB_PORT", "5432"))
+POSTGRES_DB_NAME = os.getenv("POSTGRES_DB_NAME", "yahoo_results")
+POSTGRES_POOL_MIN_CONN = int(os.getenv("POSTGRES_POOL_MIN_CONN", "1"))
+POSTGRES_POOL_MAX_CONN = int(os.getenv("POSTGRES_POOL_MAX_CONN", "5"))
 
 TRAFFIC_DISTRIBUTION_TYPE = os.getenv("TRAFFIC_DISTRIBUTION_TYPE", "POISSON")
 TRAFFIC_LAMBDA = float(os.getenv("TRAFFIC_LAMBDA", "0.1"))
 TRAFFIC_NUM_REQUESTS = int(os.getenv("TRAFFIC_NUM_REQUESTS", "50"))
 TRAFFIC_MAX_DELAY_SECONDS = int(os.getenv("TRAFFIC_MAX_DELAY_SECONDS", "20"))
+# CLOSED_LOOP procesa un request y luego espera; OPEN_LOOP programa las llegadas de antemano y las despacha a workers;
+# SIMULATION recorre las mismas llegadas con un reloj virtual, caché en memoria y un LLM simulado
+TRAFFIC_MODE = os.getenv("TRAFFIC_MODE", "CLOSED_LOOP").upper()
+TRAFFIC_WORKERS = int(os.getenv("TRAFFIC_WORKERS", "8"))
+# Índice del proceso cuando scripts/run_load.py lanza varios generadores (vacío en una ejecución normal)
+TRAFFIC_PROCESS_INDEX = int(os.getenv("TRAFFIC_PROCESS_INDEX")) if os.getenv("TRAFFIC_PROCESS_INDEX") else None
+# Popularidad de las preguntas: UNIFORM, ZIPF (exponente s) o HOTSET (una fracción caliente recibe la mayoría de requests)
+TRAFFIC_POPULARITY_MODEL = os.getenv("TRAFFIC_POPULARITY_MODEL", "UNIFORM").upper()
+TRAFFIC_ZIPF_S = float(os.getenv("TRAFFIC_ZIPF_S", "1.0"))
+TRAFFIC_HOT_SET_FRACTION = float(os.getenv("TRAFFIC_HOT_SET_FRACTION", "0.01"))
+TRAFFIC_HOT_SET_PROBABILITY = float(os.getenv("TRAFFIC_HOT_SET_PROBABILITY", "0.9"))
+# Peso relativo por categoría (class_index), p. ej. "1:5,4:2"; las categorías no listadas pesan 1
+TRAFFIC_CATEGORY_WEIGHTS = os.getenv("TRAFFIC_CATEGORY_WEIGHTS", "")
+# Semilla de la secuencia de preguntas e intervalos para repetirla entre experimentos
+TRAFFIC_SEED = int(os.getenv("TRAFFIC_SEED")) if os.getenv("TRAFFIC_SEED") else None
+# Tamaño de los bloques con que se generan de antemano las preguntas y los intervalos
+TRAFFIC_STREAM_BATCH_SIZE = int(os.getenv("TRAFFIC_STREAM_BATCH_SIZE", "65536"))
+# Perfil de carga variable en el tiempo (vacío: intervalos estacionarios de TRAFFIC_DISTRIBUTION_TYPE). CONSTANT, RAMP
+# (de TRAFFIC_PROFILE_MIN_LAMBDA a TRAFFIC_LAMBDA en un período), STEP (TRAFFIC_PROFILE_STEPS escalones de un período
+# cada uno), BURST (ráfagas on/off de duración exponencial) o DIURNAL (ciclo sinusoidal de un período)
+TRAFFIC_LOAD_PROFILE = os.getenv("TRAFFIC_LOAD_PROFILE", "").upper()
+TRAFFIC_PROFILE_MIN_LAMBDA = float(os.getenv("TRAFFIC_PROFILE_MIN_LAMBDA", str(TRAFFIC_LAMBDA / 10)))
+TRAFFIC_PROFILE_PERIOD_SECONDS = float(os.getenv("TRAFFIC_PROFILE_PERIOD_SECONDS", "600"))
+TRAFFIC_PROFILE_STEPS = int(os.getenv("TRAFFIC_PROFILE_STEPS", "5"))
+TRAFFIC_BURST_ON_SECONDS = float(os.getenv("TRAFFIC_BURST_ON_SECONDS", "30"))
+TRAFFIC_BURST_OFF_SECONDS = float(os.getenv("TRAFFIC_BURST_OFF_SECONDS", "120"))
+# Traza binaria (question_id, llegada programada) de cada ejecución, para repetirla después
+TRAFFIC_TRACE_RECORD = os.getenv("TRAFFIC_TRACE_RECORD", "true").lower() in ("true", "1", "yes")
+TRAFFIC_TRACE_DIR = os.getenv("TRAFFIC_TRACE_DIR", "data/traces")
+# Si se indica, se repite esa traza en lugar de generar requests; velocidad "1", "N" (N veces más rápido) o "MAX"
+TRAFFIC_TRACE_REPLAY_PATH = os.getenv("TRAFFIC_TRACE_REPLAY_PATH", "")
+TRAFFIC_REPLAY_SPEED = os.getenv("TRAFFIC_REPLAY_SPEED", "1").upper()
+
+# Simulación (TRAFFIC_MODE=SIMULATION): latencia del LLM LOGNORMAL (mediana y sigma) o SAMPLES (latencias
+# registradas en otra base de resultados); TRAFFIC_WORKERS es la cantidad de llamadas concurrentes al LLM
+SIMULATION_LATENCY_MODEL = os.getenv("SIMULATION_LATENCY_MODEL", "LOGNORMAL").upper()
+SIMULATION_LLM_LATENCY_MEDIAN_SECONDS = float(os.getenv("SIMULATION_LLM_LATENCY_MEDIAN_SECONDS", "2.0"))
+SIMULATION_LLM_LATENCY_SIGMA = float(os.getenv("SIMULATION_LLM_LATENCY_SIGMA", "0.5"))
+SIMULATION_LATENCY_SAMPLES_PATH = os.getenv("SIMULATION_LATENCY_SAMPLES_PATH", "")
+SIMULATION_LLM_ERROR_RATE = float(os.getenv("SIMULATION_LLM_ERROR_RATE", "0.0"))
+SIMULATION_CACHE_LATENCY_SECONDS = float(os.getenv("SIMULATION_CACHE_LATENCY_SECONDS", "0.001"))
+SIMULATION_DB_WRITE_SECONDS = float(os.getenv("SIMULATION_DB_WRITE_SECONDS", "0.002"))
+
+# Prefetch en tiempo ocioso: sin requests en curso se generan de antemano las preguntas más probables según la
+# frecuencia de cada pregunta y de su categoría, con decaimiento exponencial (vida media en requests). Un request real
+# cancela los prefetches en curso; solo se precargan preguntas con probabilidad estimada >= PREFETCH_MIN_PROBABILITY
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() in ("true", "1", "yes")
+PREFETCH_HALF_LIFE_REQUESTS = float(os.getenv("PREFETCH_HALF_LIFE_REQUESTS", "1000"))
+PREFETCH_CATEGORY_WEIGHT = float(os.getenv("PREFETCH_CATEGORY_WEIGHT", "1.0"))
+PREFETCH_MIN_PROBABILITY = float(os.getenv("PREFETCH_MIN_PROBABILITY", "0.001"))
+PREFETCH_CANDIDATES = int(os.getenv("PREFETCH_CANDIDATES", "256"))
+PREFETCH_MAX_IN_FLIGHT = int(os.getenv("PREFETCH_MAX_IN_FLIGHT", "1"))
+
+# Búsqueda de capacidad (scripts/capacity_search.py): la tasa ofrecida arranca en CAPACITY_START_LAMBDA y se multiplica
+# por CAPACITY_LAMBDA_FACTOR hasta que el p99 o la tasa de errores superan el SLO; luego se refina por bisección
+CAPACITY_START_LAMBDA = float(os.getenv("CAPACITY_START_LAMBDA", "0.5"))
+CAPACITY_LAMBDA_FACTOR = float(os.getenv("CAPACITY_LAMBDA_FACTOR", "2.0"))
+CAPACITY_MAX_STEPS = int(os.getenv("CAPACITY_MAX_STEPS", "10"))
+CAPACITY_REFINE_STEPS = int(os.getenv("CAPACITY_REFINE_STEPS", "3"))
+CAPACITY_SLO_P99_SECONDS = float(os.getenv("CAPACITY_SLO_P99_SECONDS", "10.0"))
+CAPACITY_SLO_ERROR_RATE = float(os.getenv("CAPACITY_SLO_ERROR_RATE", "0.01"))
+CAPACITY_DIR = os.getenv("CAPACITY_DIR", "data/capacity")
@@ -19,6 +19,10 @@ def get_connection():
         sys.exit(1)
     return sqlite3.connect(settings.SQLITE_DB_PATH)
 
+def format_score(score):
+    # Respuestas sin score (scoring asíncrono pendiente o simulación sin respuestas registradas)
+    return "N/A" if score is None or pd.isna(score) else f"{score:.4f}"
+
 def general_statistics():
     print_header("ESTADÍSTICAS GENERALES")
     
@@ -44,9 +48,9 @@ def general_statistics():
     print(f"Total de consultas (con repeticiones): {total_requests}")
     print(f"Cache hits: {cache_hits} ({cache_hit_rate:.2f}%)")
     print(f"\nQuality Score:")
-    print(f"  - Promedio: {avg_score:.4f}")
-    print(f"  - Máximo: {max_score:.4f}")
-    print(f"  - Mínimo: {min_score:.4f}")
+    print(f"  - Promedio: {format_score(avg_score)}")
+    print(f"  - Máximo: {format_score(max_score)}")
+    print(f"  - Mínimo: {format_score(min_score)}")
     
     conn.close()
 
@@ -66,7 +70,7 @@ def top_questions():
     else:
         print("\n")
         for idx, row in df.iterrows():
-            print(f"{idx+1}. [{row['request_count']} consultas] Score: {row['quality_score']:.4f}")
+            print(f"{idx+1}. [{row['request_count']} consultas] Score: {format_score(row['quality_score'])}")
             print(f"   {row['question_title'][:80]}...")
             print()
     
@@ -88,7 +92,7 @@ def best_answers():
     else:
         print("\n")
         for idx, row in df.iterrows():
-            print(f"{idx+1}. Score: {row['quality_score']:.4f}")
+            print(f"{idx+1}. Score: {format_score(row['quality_score'])}")
             print(f"   Pregunta: {row['question_title'][:70]}...")
             print(f"   Respuesta: {row['llm_generated_answer'][:100]}...")
             print()
@@ -0,0 +1,127 @@
+import sys
+import os
+import io
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+
+SAMPLED_REQUESTS = 10000
+
+def print_header(title):
+    print("\n" + "="*70)
+    print(f" {title}")
+    print("="*70)
+
+def current_memory_mb():
+    # RSS total y memoria privada (RssAnon) en Linux: las páginas del caché mapeado cuentan en el RSS pero son
+    # caché de archivos compartido entre procesos. En otros sistemas solo el máximo que da resource
+    memory = {}
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'RssAnon:')):
+                    memory[line.split(':')[0]] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if not memory:
+        import resource
+        memory['VmRSS'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return memory.get('VmRSS'), memory.get('RssAnon', memory.get('VmRSS'))
+
+def make_csv(path, num_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    words = np.array("paris france capital plant light energy python language code music guitar pizza book sun".split())
+    pd.DataFrame({
+        'class_index': rng.integers(1, 11, num_rows),
+        'title': [" ".join(rng.choice(words, 6)) for _ in range(num_rows)],
+        'content': [" ".join(rng.choice(words, 30)) for _ in range(num_rows)],
+        'best_answer': [" ".join(rng.choice(words, 60)) for _ in range(num_rows)]
+    }).to_csv(path, header=False, index=False)
+
+def run_child(mode, data_path):
+    # Cada medición corre en un proceso nuevo, como un subproceso de run_experiments.py
+    from src.utils import load_dataset
+    from src.popularity import PopularityModel
+    from src.request_stream import RequestStream
+    rss_before, private_before = current_memory_mb()
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        dataset = load_dataset(data_path, use_cache=(mode != 'csv'))
+    load_seconds = time.perf_counter() - start
+    rss_loaded, private_loaded = current_memory_mb()
+
+    start = time.perf_counter()
+    stream = RequestStream.generate(dataset, PopularityModel(dataset, model='UNIFORM', category_weights={}, seed=7),
+                                    num_requests=SAMPLED_REQUESTS, seed=7)
+    characters = sum(len(question['original_best_answer']) for question, _ in stream)
+    sample_seconds = time.perf_counter() - start
+    rss_sampled, private_sampled = current_memory_mb()
+
+    print(json.dumps({
+        'rows': len(dataset),
+        'load_seconds': load_seconds,
+        'sample_seconds': sample_seconds,
+        'rss_loaded_mb': rss_loaded - rss_before,
+        'private_loaded_mb': private_loaded - private_before,
+        'rss_sampled_mb': rss_sampled - rss_before,
+        'private_sampled_mb': private_sampled - private_before,
+        'characters': characters
+    }))
+
+def measure(mode, data_path, cache_dir):
+    env = dict(os.environ, DATASET_CACHE_DIR=cache_dir)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, data_path],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    print("\n" + "="*70)
+    print(" "*17 + "BENCHMARK DE CARGA DEL DATASET")
+    print(" "*10 + "Sistema de Análisis Yahoo! Answers")
+    print("="*70)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = settings.DATA_PATH
+        if not os.path.exists(data_path):
+            num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+            data_path = os.path.join(tmp_dir, 'synthetic.csv')
+            make_csv(data_path, num_rows)
+            print(f"\nDataset sintético: {num_rows} filas ({settings.DATA_PATH} no encontrado)")
+        print(f"CSV: {data_path} ({os.path.getsize(data_path) / 1024 / 1024:.1f} MB)")
+        cache_dir = os.path.join(tmp_dir, 'dataset_cache')
+
+        results = [('CSV (pd.read_csv + dropna)', measure('csv', data_path, cache_dir)),
+                   ('Caché columnar (primera vez, se construye)', measure('cache', data_path, cache_dir)),
+                   ('Caché columnar (mapeado en memoria)', measure('cache', data_path, cache_dir))]
+        cache_size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(cache_dir) for f in files)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print_header("ARRANQUE Y MEMORIA")
+    print(f"\n{'':<44} {'--------- carga ---------':>30} {f'-------- +{SAMPLED_REQUESTS} requests --------':>32}")
+    print(f"{'Variante':<44} {'Tiempo (s)':>10} {'RSS':>9} {'Privada':>9} {'Tiempo (s)':>12} {'RSS':>9} {'Privada':>9}")
+    for label, result in results:
+        print(f"{label:<44} {result['load_seconds']:>10.3f} {result['rss_loaded_mb']:>9.1f} {result['private_loaded_mb']:>9.1f} "
+              f"{result['sample_seconds']:>12.3f} {result['rss_sampled_mb']:>9.1f} {result['private_sampled_mb']:>9.1f}")
+    assert len({result['characters'] for _, result in results}) == 1, "Las variantes deberían muestrear las mismas respuestas."
+
+    csv_result, warm_result = results[0][1], results[2][1]
+    print(f"\nFilas: {csv_result['rows']} | Tamaño del caché en disco: {cache_size / 1024 / 1024:.1f} MB")
+    print(f"Arranque {csv_result['load_seconds'] / warm_result['load_seconds']:.1f}x más rápido, "
+          f"memoria privada {csv_result['private_sampled_mb'] - warm_result['private_sampled_mb']:.1f} MB menor")
+    print("Memoria en MB, como incremento sobre el proceso ya importado")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3])
+    else:
+        main()
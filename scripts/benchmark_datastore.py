@@ -0,0 +1,218 @@
+import sys
+import os
+import io
+import sqlite3
+import time
+import random
+import tempfile
+import pandas as pd
+from contextlib import redirect_stdout
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_store import DataStore
+
+def print_header(title):
+    print("\n" + "="*70)
+    print(f" {title}")
+    print("="*70)
+
+def make_results(num_writes, num_questions, seed=42):
+    rng = random.Random(seed)
+    results = []
+    for _ in range(num_writes):
+        question_id = f"q_{rng.randrange(num_questions)}"
+        results.append({
+            'question_id': question_id,
+            'question_title': f"Pregunta {question_id}",
+            'question_content': "Contenido de la pregunta " * 5,
+            'original_best_answer': "Respuesta original del dataset " * 10,
+            'llm_generated_answer': "Respuesta generada por el LLM " * 20,
+            'quality_score': rng.random(),
+            'prompt_tokens': 120,
+            'completion_tokens': 80,
+            'llm_latency_seconds': 1.5,
+            'llm_retries': 0,
+            'rate_limit_wait_seconds': 0.0
+        })
+    return results
+
+def legacy_save(db_path, result):
+    # Comportamiento anterior: una conexión, un SELECT, un UPDATE/INSERT y un commit por escritura
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT request_count FROM query_results WHERE question_id = ?", (result['question_id'],))
+    existing_record = cursor.fetchone()
+    if existing_record:
+        cursor.execute("""
+            UPDATE query_results SET llm_generated_answer = ?, quality_score = ?, request_count = ?, timestamp = ?
+            WHERE question_id = ?;
+        """, (result['llm_generated_answer'], result['quality_score'], existing_record[0] + 1,
+              datetime.now().isoformat(), result['question_id']))
+    else:
+        cursor.execute("""
+            INSERT INTO query_results (question_id, question_title, question_content, original_best_answer,
+                                       llm_generated_answer, quality_score, request_count, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+        """, (result['question_id'], result['question_title'], result['question_content'],
+              result['original_best_answer'], result['llm_generated_answer'], result['quality_score'],
+              1, datetime.now().isoformat()))
+    conn.commit()
+    conn.close()
+
+def create_legacy_db(db_path):
+    # Tabla única query_results en modo rollback journal, como la dejaba la versión anterior
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE query_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_id TEXT NOT NULL,
+            question_title TEXT,
+            question_content TEXT,
+            original_best_answer TEXT,
+            llm_generated_answer TEXT,
+            quality_score REAL,
+            request_count INTEGER DEFAULT 1,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(question_id) ON CONFLICT REPLACE
+        );
+    """)
+    conn.commit()
+    conn.close()
+
+def benchmark_legacy(db_path, results):
+    create_legacy_db(db_path)
+    start = time.perf_counter()
+    for result in results:
+        legacy_save(db_path, result)
+    return time.perf_counter() - start
+
+def benchmark_store(db_path, results, write_behind):
+    # Se descartan los prints por escritura para medir solo la DB
+    with redirect_stdout(io.StringIO()):
+        store = DataStore(db_path, write_behind=write_behind, db_type="SQLITE")
+        start = time.perf_counter()
+        for result in results:
+            store.save_query_result(result)
+            store.record_request_event(result['question_id'], hit=False)
+        enqueue_elapsed = time.perf_counter() - start
+        store.flush()
+        elapsed = time.perf_counter() - start
+        write_stats = store.get_write_stats()
+        store.close()
+    return elapsed, enqueue_elapsed, write_stats
+
+def legacy_hit(db_path, question_id):
+    # Camino de hit anterior: leer la fila completa y volver a guardarla entera
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    row = dict(conn.execute("SELECT * FROM query_results WHERE question_id = ?", (question_id,)).fetchone())
+    conn.close()
+    legacy_save(db_path, row)
+
+def benchmark_hits(db_path, results, hit_ids, mode):
+    with redirect_stdout(io.StringIO()):
+        if mode == 'legacy':
+            create_legacy_db(db_path)
+            for result in results:
+                legacy_save(db_path, result)
+        else:
+            store = DataStore(db_path, write_behind=(mode == 'write_behind'), db_type="SQLITE")
+            for result in results:
+                store.save_query_result(result)
+                store.record_request_event(result['question_id'], hit=False)
+            store.flush()
+
+        start = time.perf_counter()
+        for question_id in hit_ids:
+            if mode == 'legacy':
+                legacy_hit(db_path, question_id)
+            else:
+                store.record_request_event(question_id, hit=True)
+        if mode != 'legacy':
+            store.flush()
+            store.close()
+    return time.perf_counter() - start
+
+def compare_hit_path(tmp_dir, results, num_hits):
+    print_header("CAMINO DE CACHE HIT")
+    rng = random.Random(7)
+    question_ids = sorted({result['question_id'] for result in results})
+    hit_ids = [rng.choice(question_ids) for _ in range(num_hits)]
+
+    print(f"\n{'Variante':<38} {'Hits/s':>13} {'µs por hit':>11}")
+    counts = {}
+    for label, mode in [('Leer fila + reescribirla (anterior)', 'legacy'),
+                        ('Evento de hit', 'sync'),
+                        ('Evento de hit diferido', 'write_behind')]:
+        db_path = os.path.join(tmp_dir, f"hits_{mode}.db")
+        elapsed = benchmark_hits(db_path, results, hit_ids, mode)
+        print(f"{label:<38} {num_hits / elapsed:>13.1f} {elapsed / num_hits * 1e6:>11.1f}")
+        counts[mode] = count_rows(db_path)
+    assert len(set(counts.values())) == 1, "Todas las variantes deberían sumar los mismos request_count."
+
+def compare_stats(db_path, repeats=20):
+    print_header("ESTADÍSTICAS PERIÓDICAS")
+    with redirect_stdout(io.StringIO()):
+        store = DataStore(db_path, write_behind=False, db_type="SQLITE")
+
+    # Antes: cargar la tabla completa (con los textos) solo para contar filas
+    start = time.perf_counter()
+    for _ in range(repeats):
+        with store.backend.connection() as conn:
+            row_count = len(pd.read_sql_query("SELECT * FROM query_results;", conn))
+    full_load_elapsed = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        store_stats = store.stats()
+    stats_elapsed = (time.perf_counter() - start) / repeats
+    store.close()
+
+    assert store_stats['answers'] == row_count, "stats() no cuenta las mismas filas que la tabla completa."
+    print(f"\n{'len(get_all_results) (anterior)':<38} {full_load_elapsed * 1000:>10.3f}ms")
+    print(f"{'stats()':<38} {stats_elapsed * 1000:>10.3f}ms")
+    print(f"Aceleración: {full_load_elapsed / stats_elapsed:.1f}x")
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    count, requests = conn.execute("SELECT COUNT(*), SUM(request_count) FROM query_results;").fetchone()
+    conn.close()
+    return count, requests
+
+def main():
+    print("\n" + "="*70)
+    print(" "*19 + "BENCHMARK DE DATASTORE")
+    print(" "*10 + "Sistema de Análisis Yahoo! Answers")
+    print("="*70)
+
+    num_writes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    num_questions = int(sys.argv[2]) if len(sys.argv) > 2 else num_writes // 2
+    results = make_results(num_writes, num_questions)
+    print(f"\nEscrituras: {num_writes} sobre {num_questions} preguntas distintas")
+
+    print_header("ESCRITURAS POR SEGUNDO")
+    print(f"\n{'Variante':<38} {'Tiempo (s)':>11} {'Escrituras/s':>13} {'Commits':>9}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = os.path.join(tmp_dir, 'legacy.db')
+        legacy_elapsed = benchmark_legacy(legacy_path, results)
+        print(f"{'Conexión por escritura (anterior)':<38} {legacy_elapsed:>11.3f} {num_writes / legacy_elapsed:>13.1f} {num_writes:>9}")
+
+        variants = [('Conexión persistente + WAL', 'sync.db', False),
+                    ('WAL + escritura diferida por lotes', 'write_behind.db', True)]
+        for label, filename, write_behind in variants:
+            db_path = os.path.join(tmp_dir, filename)
+            elapsed, enqueue_elapsed, write_stats = benchmark_store(db_path, results, write_behind)
+            print(f"{label:<38} {elapsed:>11.3f} {num_writes / elapsed:>13.1f} {write_stats['batches']:>9}")
+            if write_behind:
+                print(f"{'  (tiempo en el camino del request)':<38} {enqueue_elapsed:>11.3f} {num_writes / enqueue_elapsed:>13.1f}")
+            assert count_rows(db_path) == count_rows(legacy_path), f"{label} no deja la DB en el mismo estado que la versión anterior."
+
+        compare_hit_path(tmp_dir, results, num_writes)
+        compare_stats(os.path.join(tmp_dir, 'write_behind.db'))
+
+    print("\n✓ Todas las variantes dejan el mismo número de filas y request_count")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import sys
+import os
+import io
+import time
+import numpy as np
+import pandas as pd
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from src.utils import load_dataset, select_random_question, calculate_delay
+from src.popularity import PopularityModel
+from src.request_stream import RequestStream
+
+# Las variantes por request son lentas: se miden sobre una muestra y se extrapolan al total
+PER_REQUEST_SAMPLE = 2000
+
+def print_header(title):
+    print("\n" + "="*70)
+    print(f" {title}")
+    print("="*70)
+
+def make_dataset(num_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    words = np.array("paris france capital plant light energy python language code music guitar pizza".split())
+    return pd.DataFrame({
+        'class_index': rng.integers(1, 11, num_rows),
+        'title': [" ".join(rng.choice(words, 4)) for _ in range(num_rows)],
+        'content': "Contenido de la pregunta " * 5,
+        'best_answer': "Respuesta original del dataset " * 10
+    })
+
+def benchmark_sample(dataset, num_requests):
+    # Camino anterior: una fila de pandas y un número aleatorio de Python por request
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        select_random_question(dataset)
+        calculate_delay(settings.TRAFFIC_DISTRIBUTION_TYPE, settings.TRAFFIC_LAMBDA, settings.TRAFFIC_MAX_DELAY_SECONDS)
+    return time.perf_counter() - start
+
+def benchmark_alias(dataset, popularity, num_requests):
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        select_random_question(dataset, popularity)
+        calculate_delay(settings.TRAFFIC_DISTRIBUTION_TYPE, settings.TRAFFIC_LAMBDA, settings.TRAFFIC_MAX_DELAY_SECONDS)
+    return time.perf_counter() - start
+
+def benchmark_stream(dataset, popularity, num_requests):
+    start = time.perf_counter()
+    stream = RequestStream.generate(dataset, popularity, num_requests, seed=7)
+    build_elapsed = time.perf_counter() - start
+    requests = 0
+    for question, delay in stream:
+        requests += 1
+    return time.perf_counter() - start, build_elapsed, requests
+
+def main():
+    print("\n" + "="*70)
+    print(" "*16 + "BENCHMARK DE SELECCIÓN DE PREGUNTAS")
+    print(" "*10 + "Sistema de Análisis Yahoo! Answers")
+    print("="*70)
+
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with redirect_stdout(io.StringIO()):
+        dataset = load_dataset() if os.path.exists(settings.DATA_PATH) else None
+    if dataset is None:
+        dataset = make_dataset(int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
+        print(f"\nDataset sintético: {len(dataset)} filas ({settings.DATA_PATH} no encontrado)")
+    else:
+        print(f"\nDataset: {settings.DATA_PATH} ({len(dataset)} filas)")
+    popularity = PopularityModel(dataset, seed=7)
+    print(f"Requests: {num_requests} | Popularidad: {popularity.model} | Distribución: {settings.TRAFFIC_DISTRIBUTION_TYPE}")
+
+    print_header("SOBRECARGA DE SELECCIÓN POR REQUEST")
+    print(f"\n{'Variante':<40} {'µs/request':>11} {'Total (s)':>11}")
+    sample_size = min(num_requests, PER_REQUEST_SAMPLE)
+    sample_elapsed = benchmark_sample(dataset, sample_size) / sample_size
+    print(f"{'dataset.sample + calculate_delay':<40} {sample_elapsed * 1e6:>11.2f} {sample_elapsed * num_requests:>10.2f}*")
+    alias_elapsed = benchmark_alias(dataset, popularity, sample_size) / sample_size
+    print(f"{'Tabla alias + iloc + calculate_delay':<40} {alias_elapsed * 1e6:>11.2f} {alias_elapsed * num_requests:>10.2f}*")
+
+    stream_elapsed, build_elapsed, requests = benchmark_stream(dataset, popularity, num_requests)
+    assert requests == num_requests, "El stream no entregó todos los requests."
+    print(f"{'RequestStream (vectorizado)':<40} {stream_elapsed / num_requests * 1e6:>11.2f} {stream_elapsed:>11.2f}")
+    print(f"{'  (generación de filas e intervalos)':<40} {build_elapsed / num_requests * 1e6:>11.2f} {build_elapsed:>11.2f}")
+    print(f"\n* extrapolado desde {sample_size} requests")
+    print(f"Aceleración frente a dataset.sample: {sample_elapsed * num_requests / stream_elapsed:.1f}x")
+
+if __name__ == "__main__":
+    main()
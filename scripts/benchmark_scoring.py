@@ -0,0 +1,175 @@
+import sys
+import os
+import sqlite3
+import time
+import tempfile
+import tracemalloc
+import pandas as pd
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from src.score_calculator import ScoreCalculator
+from src.utils import load_dataset
+
+def print_header(title):
+    print("\n" + "="*70)
+    print(f" {title}")
+    print("="*70)
+
+def load_answer_pairs(data_dir='data'):
+    db_files = [f for f in os.listdir(data_dir) if f.startswith('results_exp') and f.endswith('.db')]
+    frames = []
+    for db_file in sorted(db_files):
+        conn = sqlite3.connect(os.path.join(data_dir, db_file))
+        df = pd.read_sql_query("""
+            SELECT question_id, original_best_answer, llm_generated_answer, quality_score
+            FROM query_results
+        """, conn)
+        conn.close()
+        df['experiment'] = db_file.replace('results_', '').replace('.db', '')
+        frames.append(df)
+
+    if not frames:
+        return pd.DataFrame()
+    pairs = pd.concat(frames, ignore_index=True)
+    return pairs.dropna(subset=['original_best_answer', 'llm_generated_answer'])
+
+def load_corpus(pairs):
+    if os.path.exists(settings.DATA_PATH):
+        dataset = load_dataset()
+        if dataset is not None and not dataset.empty:
+            return dataset['best_answer']
+    print(f"Dataset no disponible en {settings.DATA_PATH}. Usando las respuestas originales de las bases de datos como corpus.")
+    return pairs['original_best_answer'].drop_duplicates()
+
+def time_per_score(calculator, pairs):
+    latencies = []
+    scores = []
+    for original, answer in zip(pairs['original_best_answer'], pairs['llm_generated_answer']):
+        start = time.perf_counter()
+        scores.append(calculator.calculate_score(original, answer))
+        latencies.append(time.perf_counter() - start)
+    return np.array(scores), np.array(latencies) * 1e6
+
+def print_latency(label, latencies_us):
+    print(f"{label}: media={latencies_us.mean():.1f}µs  p50={np.percentile(latencies_us, 50):.1f}µs  "
+          f"p95={np.percentile(latencies_us, 95):.1f}µs")
+
+def compare_pair_vs_corpus(pairs, corpus):
+    print_header("LATENCIA POR SCORE: PAIR vs CORPUS")
+
+    pair_calculator = ScoreCalculator(mode="PAIR")
+    corpus_calculator = ScoreCalculator(mode="CORPUS", corpus=corpus)
+
+    pair_scores, pair_latencies = time_per_score(pair_calculator, pairs)
+    corpus_scores, corpus_latencies = time_per_score(corpus_calculator, pairs)
+
+    print(f"\nPares evaluados: {len(pairs)}")
+    print_latency("PAIR  ", pair_latencies)
+    print_latency("CORPUS", corpus_latencies)
+    print(f"Aceleración (media): {pair_latencies.mean() / corpus_latencies.mean():.2f}x")
+
+    print_header("CAMBIO EN LOS SCORES")
+    report = pairs[['experiment']].copy()
+    report['pair_score'] = pair_scores
+    report['corpus_score'] = corpus_scores
+    report['difference'] = report['corpus_score'] - report['pair_score']
+
+    print(f"\nScore medio PAIR:   {report['pair_score'].mean():.4f}")
+    print(f"Score medio CORPUS: {report['corpus_score'].mean():.4f}")
+    print(f"Diferencia absoluta media: {report['difference'].abs().mean():.4f}")
+    print(f"Correlación de Pearson:  {report['pair_score'].corr(report['corpus_score']):.4f}")
+    print(f"Correlación de Spearman: {report['pair_score'].corr(report['corpus_score'], method='spearman'):.4f}")
+
+    print("\nPor experimento:")
+    by_experiment = report.groupby('experiment')[['pair_score', 'corpus_score', 'difference']].mean()
+    print(by_experiment.to_string(float_format=lambda v: f"{v:.4f}"))
+    return report
+
+def benchmark_batch_throughput(pairs, corpus, sizes=(1, 100, 10000)):
+    print_header("THROUGHPUT: SCORING INDIVIDUAL vs EN LOTE (CORPUS)")
+
+    calculator = ScoreCalculator(mode="CORPUS", corpus=corpus)
+    print(f"\n{'Pares':>8} {'Individual (pares/s)':>22} {'Lote (pares/s)':>18} {'Aceleración':>12}")
+    for size in sizes:
+        # Se repiten los pares disponibles hasta alcanzar el tamaño pedido
+        sample = pairs.iloc[np.resize(np.arange(len(pairs)), size)]
+        originals = sample['original_best_answer'].tolist()
+        answers = sample['llm_generated_answer'].tolist()
+
+        start = time.perf_counter()
+        single_scores = [calculator.calculate_score(original, answer) for original, answer in zip(originals, answers)]
+        single_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch_scores = calculator.calculate_scores_batch(originals, answers)
+        batch_elapsed = time.perf_counter() - start
+
+        assert np.allclose(single_scores, batch_scores), "El scoring en lote no coincide con el individual."
+        print(f"{size:>8} {size / single_elapsed:>22.1f} {size / batch_elapsed:>18.1f} {single_elapsed / batch_elapsed:>11.2f}x")
+
+def measure_worker_memory(mode, corpus, cache_dir):
+    # Memoria que retiene un proceso de scoring al cargar el TF-IDF persistido
+    fitted = ScoreCalculator(mode=mode, corpus=corpus, cache_dir=cache_dir)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    worker = ScoreCalculator(mode=mode, fitted_path=fitted.cache_path)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return worker, after - before
+
+def compare_hashing_vs_corpus(pairs, corpus, fractions=(0.25, 0.5, 1.0)):
+    print_header("MEMORIA: CORPUS vs HASHING")
+
+    corpus = pd.Series(corpus).reset_index(drop=True)
+    print(f"\n{'Corpus':>10} {'CORPUS (MB)':>14} {'HASHING (MB)':>14}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for fraction in fractions:
+            subset = corpus.iloc[:max(1, int(len(corpus) * fraction))]
+            corpus_scorer, corpus_bytes = measure_worker_memory("CORPUS", subset, cache_dir)
+            hashing_scorer, hashing_bytes = measure_worker_memory("HASHING", subset, cache_dir)
+            print(f"{len(subset):>10} {corpus_bytes / 1e6:>14.2f} {hashing_bytes / 1e6:>14.2f}")
+
+    print_header("PRECISIÓN: HASHING vs SCORERS ACTUALES")
+    originals = pairs['original_best_answer'].tolist()
+    answers = pairs['llm_generated_answer'].tolist()
+    hashing_scores = hashing_scorer.calculate_scores_batch(originals, answers)
+    reference_scores = {
+        'CORPUS': corpus_scorer.calculate_scores_batch(originals, answers),
+        'PAIR': ScoreCalculator(mode="PAIR").calculate_scores_batch(originals, answers),
+        'quality_score (DB)': pairs['quality_score'].to_numpy()
+    }
+
+    print(f"\nPares evaluados: {len(pairs)}  Score medio HASHING: {hashing_scores.mean():.4f}")
+    print(f"{'Referencia':>20} {'Score medio':>12} {'Dif. abs. media':>16} {'Pearson':>9}")
+    for name, scores in reference_scores.items():
+        mask = ~np.isnan(scores)
+        difference = np.abs(hashing_scores[mask] - scores[mask]).mean()
+        correlation = np.corrcoef(hashing_scores[mask], scores[mask])[0, 1]
+        print(f"{name:>20} {scores[mask].mean():>12.4f} {difference:>16.4f} {correlation:>9.4f}")
+
+def main():
+    print("\n" + "="*70)
+    print(" "*20 + "BENCHMARK DE SCORING")
+    print(" "*10 + "Sistema de Análisis Yahoo! Answers")
+    print("="*70)
+
+    pairs = load_answer_pairs()
+    if pairs.empty:
+        print("No se encontraron pares de respuestas en data/results_exp*.db")
+        return
+
+    corpus = load_corpus(pairs)
+    section = sys.argv[1] if len(sys.argv) > 1 else 'all'
+
+    if section in ['all', 'corpus']:
+        compare_pair_vs_corpus(pairs, corpus)
+    if section in ['all', 'batch']:
+        benchmark_batch_throughput(pairs, corpus)
+    if section in ['all', 'hashing']:
+        compare_hashing_vs_corpus(pairs, corpus)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from src.utils import load_dataset
+from src.score_calculator import ScoreCalculator, FITTED_MODES
+from src.reference_vectors import ReferenceVectors
+
+def main():
+    print("\n" + "="*70)
+    print(" "*15 + "CONSTRUCCIÓN DE VECTORES DE REFERENCIA")
+    print(" "*10 + "Sistema de Análisis Yahoo! Answers")
+    print("="*70 + "\n")
+
+    output_path = sys.argv[1] if len(sys.argv) > 1 else settings.SCORER_REFERENCE_VECTORS_PATH
+
+    # Se vectorizan todas las respuestas: hace falta el DataFrame completo, no el caché perezoso
+    dataset = load_dataset(use_cache=False)
+    if dataset is None or dataset.empty:
+        print("No se pudo cargar el dataset. Verifica DATA_PATH en .env")
+        return False
+
+    start_time = time.time()
+    # Los vectores se construyen con el mismo TF-IDF que usará el scoring
+    mode = settings.SCORER_MODE.upper() if settings.SCORER_MODE.upper() in FITTED_MODES else "CORPUS"
+    scorer = ScoreCalculator(mode=mode, corpus=dataset['best_answer'])
+    references = ReferenceVectors.build(dataset, scorer, output_path)
+    elapsed_time = time.time() - start_time
+
+    print(f"\n✓ {references.n_rows} vectores de referencia construidos en {elapsed_time:.2f}s")
+    print(f"  Directorio: {output_path}")
+    print(f"  Se usan automáticamente con SCORER_MODE={mode}")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
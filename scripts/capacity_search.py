@@ -0,0 +1,220 @@
+import sys
+import os
+import json
+import time
+import queue
+import random
+import traceback
+import multiprocessing
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from src.latency_histogram import latency_histograms_from_dict, end_to_end_histogram
+from src.utils import start_process_with_env
+
+POLL_SECONDS = 1.0
+
+def print_header(title):
+    print("\n" + "="*70)
+    print(f" {title}")
+    print("="*70)
+
+def step_overrides(lambda_param, db_path, seed):
+    # Todos los pasos usan la misma semilla: solo cambia la tasa ofrecida
+    overrides = {
+        'TRAFFIC_LAMBDA': str(lambda_param),
+        'TRAFFIC_SEED': str(seed),
+        'SQLITE_DB_PATH': db_path,
+        'TRAFFIC_LOAD_PROFILE': settings.TRAFFIC_LOAD_PROFILE or 'CONSTANT',
+        'TRAFFIC_TRACE_RECORD': 'false',
+        'TRAFFIC_TRACE_REPLAY_PATH': ''
+    }
+    if settings.TRAFFIC_LOAD_PROFILE:
+        # Con un perfil se escala la curva completa: la tasa mínima mantiene su proporción con la pico
+        overrides['TRAFFIC_PROFILE_MIN_LAMBDA'] = str(settings.TRAFFIC_PROFILE_MIN_LAMBDA * lambda_param / settings.TRAFFIC_LAMBDA)
+    return overrides
+
+def run_step(log_path, channel):
+    # Proceso hijo: un experimento completo con la tasa de este paso, con la salida en su log
+    log_file = open(log_path, 'w', buffering=1, encoding='utf-8')
+    sys.stdout = sys.stderr = log_file
+    try:
+        from src.traffic_generator import TrafficGenerator
+        generator = TrafficGenerator()
+        # Todos los pasos piden las mismas preguntas: sin vaciar la caché, cada paso empezaría con las respuestas del anterior
+        inherited = generator.cache.size()
+        generator.cache.clear()
+        cache = {'inherited': inherited, 'start_size': generator.cache.size()}
+        generator.run()
+        channel.put(('final', dict(generator.snapshot(), load=generator.get_load_stats(), cache=cache)))
+    except Exception as e:
+        traceback.print_exc()
+        channel.put(('error', str(e)))
+    finally:
+        log_file.close()
+
+def evaluate_step(lambda_param, snapshot):
+    latency = end_to_end_histogram(latency_histograms_from_dict(snapshot['latency_histograms']))
+    stats = snapshot['stats']
+    total = stats['total_requests']
+    result = {
+        'lambda': lambda_param,
+        'offered_rps': snapshot['load']['offered_rps'],
+        'achieved_rps': snapshot['load']['achieved_rps'],
+        'requests': total,
+        'hit_rate': stats['cache_hits'] / total if total else 0.0,
+        'error_rate': stats['llm_errors'] / total if total else 0.0,
+        'p50_seconds': latency.percentile(50),
+        'p99_seconds': latency.percentile(99),
+        'max_in_flight': snapshot['load']['max_in_flight'],
+        'cache_start_size': snapshot['cache']['start_size'],
+        'cache_flushed': snapshot['cache']['inherited']
+    }
+    violations = []
+    if result['p99_seconds'] is None or result['p99_seconds'] > settings.CAPACITY_SLO_P99_SECONDS:
+        violations.append('p99')
+    if result['error_rate'] > settings.CAPACITY_SLO_ERROR_RATE:
+        violations.append('errores')
+    result['violations'] = violations
+    result['passed'] = not violations
+    return result
+
+def measure(context, step, lambda_param, run_dir, seed):
+    db_path = os.path.join(run_dir, f"step{step}_lambda{lambda_param:.4g}.db")
+    log_path = os.path.join(run_dir, f"step{step}_lambda{lambda_param:.4g}.log")
+    print(f"Paso {step}: lambda {lambda_param:.4g} req/s... ", end='', flush=True)
+    channel = context.Queue()
+    worker = start_process_with_env(context, step_overrides(lambda_param, db_path, seed), run_step, f"CapacityStep-{step}",
+                                    (log_path, channel))
+
+    start = time.time()
+    message = None
+    while message is None:
+        try:
+            message = channel.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            # Un hijo que murió sin avisar (p. ej. un error al importar) no va a mandar su resultado
+            if not worker.is_alive():
+                message = ('error', f"terminó con código {worker.exitcode}")
+    worker.join()
+
+    kind, payload = message
+    if kind == 'error':
+        print(f"falló ({payload}); ver {log_path}")
+        return {'lambda': lambda_param, 'passed': False, 'violations': ['fallo'], 'error': payload, 'db_path': db_path}
+    result = evaluate_step(lambda_param, payload)
+    result['db_path'] = db_path
+    result['wall_seconds'] = time.time() - start
+    print(f"{'OK' if result['passed'] else 'SLO superado (' + ', '.join(result['violations']) + ')'} | "
+          f"logrado {result['achieved_rps']:.3f} req/s | p99 {format_seconds(result['p99_seconds'])} | "
+          f"errores {result['error_rate']:.2%} | hits {result['hit_rate']:.1%} | caché inicial {result['cache_start_size']} "
+          f"({result['cache_flushed']} vaciadas) ({result['wall_seconds']:.1f}s)")
+    return result
+
+def format_seconds(seconds):
+    return "N/A" if seconds is None else f"{seconds:.3f}s"
+
+def search_capacity(context, run_dir, seed):
+    # Subida geométrica hasta el primer paso que no cumple el SLO y bisección entre el último que cumple y ese
+    results = []
+    passed, failed = None, None
+    lambda_param = settings.CAPACITY_START_LAMBDA
+    for _ in range(settings.CAPACITY_MAX_STEPS):
+        result = measure(context, len(results), lambda_param, run_dir, seed)
+        results.append(result)
+        if not result['passed']:
+            failed = result
+            break
+        passed = result
+        lambda_param *= settings.CAPACITY_LAMBDA_FACTOR
+    if passed is not None and failed is not None:
+        for _ in range(settings.CAPACITY_REFINE_STEPS):
+            result = measure(context, len(results), (passed['lambda'] + failed['lambda']) / 2, run_dir, seed)
+            results.append(result)
+            if result['passed']:
+                passed = result
+            else:
+                failed = result
+    return results, passed, failed
+
+def print_report(results, passed, failed):
+    print_header("PASOS DE LA BÚSQUEDA")
+    print(f"\n{'Paso':<5} {'Lambda':>9} {'Ofrecido':>9} {'Logrado':>9} {'Caché ini.':>10} {'Hits (%)':>9} {'Errores':>8} {'p50':>9} {'p99':>9}  SLO")
+    for step, result in enumerate(results):
+        if 'error' in result:
+            print(f"{step:<5} {result['lambda']:>9.4g}  falló: {result['error']}")
+            continue
+        print(f"{step:<5} {result['lambda']:>9.4g} {result['offered_rps']:>9.3f} {result['achieved_rps']:>9.3f} {result['cache_start_size']:>10} {result['hit_rate'] * 100:>9.2f} "
+              f"{result['error_rate'] * 100:>7.2f}% {format_seconds(result['p50_seconds']):>9} {format_seconds(result['p99_seconds']):>9}  "
+              f"{'OK' if result['passed'] else 'superado (' + ', '.join(result['violations']) + ')'}")
+
+    print_header("CAPACIDAD")
+    print(f"\nSLO: p99 <= {settings.CAPACITY_SLO_P99_SECONDS}s y errores <= {settings.CAPACITY_SLO_ERROR_RATE:.2%}")
+    if passed is None:
+        print(f"✗ Ya con lambda {settings.CAPACITY_START_LAMBDA} no se cumple el SLO. Baja CAPACITY_START_LAMBDA.")
+    elif failed is None:
+        print(f"El SLO se cumplió en todos los pasos: la capacidad es al menos {passed['achieved_rps']:.3f} req/s "
+              f"(lambda {passed['lambda']:.4g}). Sube CAPACITY_MAX_STEPS o CAPACITY_LAMBDA_FACTOR.")
+    else:
+        print(f"✓ Throughput máximo sostenible: {passed['achieved_rps']:.3f} req/s (lambda {passed['lambda']:.4g}, "
+              f"p99 {format_seconds(passed['p99_seconds'])}, hits {passed['hit_rate']:.1%})")
+        print(f"  El SLO se supera con lambda {failed['lambda']:.4g}.")
+
+def save_report(run_dir, results, passed, failed, seed):
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'slo': {'p99_seconds': settings.CAPACITY_SLO_P99_SECONDS, 'error_rate': settings.CAPACITY_SLO_ERROR_RATE},
+        'cache': {'policy': settings.CACHE_POLICY, 'max_size': settings.CACHE_MAX_SIZE, 'ttl_seconds': settings.CACHE_TTL_SECONDS},
+        'traffic': {'mode': settings.TRAFFIC_MODE, 'workers': settings.TRAFFIC_WORKERS, 'num_requests': settings.TRAFFIC_NUM_REQUESTS,
+                    'load_profile': settings.TRAFFIC_LOAD_PROFILE or 'CONSTANT', 'popularity': settings.TRAFFIC_POPULARITY_MODEL, 'seed': seed},
+        'steps': results,
+        'max_sustainable_rps': passed['achieved_rps'] if passed is not None else None,
+        'max_sustainable_lambda': passed['lambda'] if passed is not None else None,
+        'first_failing_lambda': failed['lambda'] if failed is not None else None
+    }
+    report_path = os.path.join(run_dir, 'capacity.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report_path
+
+def main():
+    print("\n" + "="*70)
+    print(" "*20 + "BÚSQUEDA DE CAPACIDAD")
+    print(" "*10 + "Sistema de Análisis Yahoo! Answers")
+    print("="*70)
+
+    if settings.TRAFFIC_MODE not in ("OPEN_LOOP", "SIMULATION"):
+        print("\n✗ La búsqueda de capacidad necesita llegadas independientes de las respuestas: usa TRAFFIC_MODE=OPEN_LOOP o SIMULATION.")
+        return False
+    if settings.CAPACITY_START_LAMBDA <= 0 or settings.CAPACITY_LAMBDA_FACTOR <= 1:
+        print("\n✗ CAPACITY_START_LAMBDA debe ser positiva y CAPACITY_LAMBDA_FACTOR mayor que 1.")
+        return False
+
+    seed = settings.TRAFFIC_SEED if settings.TRAFFIC_SEED is not None else random.randrange(2**31)
+    run_name = os.path.splitext(os.path.basename(settings.SQLITE_DB_PATH))[0]
+    run_dir = os.path.join(settings.CAPACITY_DIR, f"{run_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(run_dir, exist_ok=True)
+    print(f"\nModo: {settings.TRAFFIC_MODE} ({settings.TRAFFIC_WORKERS} workers) | Caché: {settings.CACHE_POLICY}, "
+          f"{settings.CACHE_MAX_SIZE} entradas, TTL {settings.CACHE_TTL_SECONDS}s | Popularidad: {settings.TRAFFIC_POPULARITY_MODEL}")
+    print(f"Perfil: {settings.TRAFFIC_LOAD_PROFILE or 'CONSTANT'} | {settings.TRAFFIC_NUM_REQUESTS} requests por paso | Semilla: {seed}")
+    print(f"SLO: p99 <= {settings.CAPACITY_SLO_P99_SECONDS}s, errores <= {settings.CAPACITY_SLO_ERROR_RATE:.2%} | "
+          f"lambda desde {settings.CAPACITY_START_LAMBDA} por x{settings.CAPACITY_LAMBDA_FACTOR} (máx. {settings.CAPACITY_MAX_STEPS} pasos, "
+          f"{settings.CAPACITY_REFINE_STEPS} de refinamiento)")
+    if settings.TRAFFIC_MODE != "SIMULATION":
+        print(f"Nota: cada paso vacía la caché (Redis {settings.CACHE_HOST}:{settings.CACHE_PORT}, DB {settings.CACHE_DB}) antes de empezar.")
+    if settings.DB_TYPE.upper() != 'SQLITE':
+        print("Nota: con PostgreSQL todos los pasos escriben en la misma base de datos.")
+    print(f"Resultados de cada paso en {run_dir}\n")
+
+    # spawn: cada paso importa config.settings de cero con sus variables de entorno
+    context = multiprocessing.get_context('spawn')
+    results, passed, failed = search_capacity(context, run_dir, seed)
+    print_report(results, passed, failed)
+    print(f"\nReporte guardado en {save_report(run_dir, results, passed, failed, seed)}")
+    return passed is not None
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -1,6 +1,7 @@
 import sys
 import os
 import sqlite3
+import json
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -9,9 +10,19 @@ import numpy as np
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from config import settings
+from src.storage_backends import REQUEST_STAGES
+from src.latency_histogram import (latency_histograms_from_dict, new_latency_histograms, LATENCY_OUTCOMES, END_TO_END,
+                                   DEFAULT_PERCENTILES)
+
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (12, 6)
 
+# Solo las columnas que usa el análisis; los textos de preguntas y respuestas no se cargan
+ANALYSIS_COLUMNS = ['question_id', 'quality_score', 'request_count', 'llm_latency_seconds',
+                    'prompt_tokens', 'completion_tokens']
+PERCENTILE_LABELS = {percentile: f"p{percentile:g}".replace('.', '') for percentile in DEFAULT_PERCENTILES}
+
 def load_experiment_data(db_path, experiment_name):
     if not os.path.exists(db_path):
         print(f"Advertencia: No se encontró {db_path}")
@@ -19,7 +30,9 @@ def load_experiment_data(db_path, experiment_name):
     
     try:
         conn = sqlite3.connect(db_path)
-        df = pd.read_sql_query("SELECT * FROM query_results", conn)
+        available = {row[1] for row in conn.execute("PRAGMA table_info(query_results);")}
+        columns = [column for column in ANALYSIS_COLUMNS if column in available]
+        df = pd.read_sql_query(f"SELECT {', '.join(columns)} FROM query_results", conn)
         conn.close()
         
         if df.empty:
@@ -32,17 +45,141 @@ def load_experiment_data(db_path, experiment_name):
         print(f"Error cargando {db_path}: {e}")
         return None
 
-def calculate_metrics(df):
+def load_request_summary(db_path):
+    # Con el esquema normalizado los hits salen del log de eventos en lugar de inferirse de request_count
+    conn = sqlite3.connect(db_path)
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'request_events';").fetchone() is None:
+            return None
+        total_requests, cache_hits = conn.execute("SELECT COUNT(*), COALESCE(SUM(hit), 0) FROM request_events;").fetchone()
+        metadata = {}
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'experiment_metadata';").fetchone() is not None:
+            metadata = {name: json.loads(value) for name, value in conn.execute(
+                "SELECT name, value FROM experiment_metadata WHERE name IN ('popularity', 'latency_histograms');")}
+        latency_histograms = (latency_histograms_from_dict(metadata['latency_histograms']) if 'latency_histograms' in metadata
+                              else histograms_from_events(conn))
+    finally:
+        conn.close()
+    return {'total_requests': total_requests, 'cache_hits': cache_hits, 'popularity': metadata.get('popularity'),
+            'latency_histograms': latency_histograms}
+
+def histograms_from_events(conn):
+    # Experimentos sin histogramas guardados: se arman desde las latencias del log de eventos
+    available = {row[1] for row in conn.execute("PRAGMA table_info(request_events);")}
+    if 'latency_seconds' not in available:
+        return None
+    stages = [stage for stage in REQUEST_STAGES if f"{stage}_seconds" in available]
+    columns = ['hit', 'latency_seconds'] + [f"{stage}_seconds" for stage in stages]
+    return histograms_from_rows(conn.execute(f"SELECT {', '.join(columns)} FROM request_events;"), stages)
+
+def histograms_from_rows(rows, stages):
+    # Cada fila: hit, latency_seconds y luego un valor por etapa (None si no se midió)
+    histograms = new_latency_histograms(stages)
+    for row in rows:
+        by_name = histograms['hit' if row[0] else 'miss']
+        by_name[END_TO_END].record(row[1])
+        for stage, seconds in zip(stages, row[2:]):
+            by_name[stage].record(seconds)
+    return histograms
+
+def calculate_latency_metrics(latency_histograms):
+    # Percentiles de punta a punta para hits y misses, y de la llamada al LLM en los misses
+    metrics = {}
+    for outcome in LATENCY_OUTCOMES:
+        histogram = (latency_histograms or {}).get(outcome, {}).get(END_TO_END)
+        for percentile, label in PERCENTILE_LABELS.items():
+            value = histogram.percentile(percentile) if histogram is not None else None
+            metrics[f"{outcome}_{label}_ms"] = value * 1000 if value is not None else np.nan
+    llm_histogram = (latency_histograms or {}).get('miss', {}).get('llm')
+    llm_p99 = llm_histogram.percentile(99) if llm_histogram is not None else None
+    metrics['llm_p99_ms'] = llm_p99 * 1000 if llm_p99 is not None else np.nan
+    return metrics
+
+def get_popularity_label(popularity):
+    # Experimentos anteriores al modelo de popularidad muestreaban de forma uniforme
+    if popularity is None:
+        return 'N/A'
+    parameters = [f"{name}={popularity[name]}" for name in ('zipf_s', 'hot_fraction', 'hot_probability') if name in popularity]
+    return popularity['model'] + (f"({', '.join(parameters)})" if parameters else '')
+
+def columnar_histograms(root, exp_name):
+    # Mismos histogramas que histograms_from_events, leyendo solo las columnas de latencia del experimento
+    from src.columnar_store import read_columnar
+    stage_columns = [f"{stage}_seconds" for stage in REQUEST_STAGES]
+    events = read_columnar('request_events', root=root, columns=['hit', 'latency_seconds'] + stage_columns,
+                           experiments=[exp_name])
+    if events['latency_seconds'].isna().all():
+        return None
+    stages = [stage for stage, column in zip(REQUEST_STAGES, stage_columns) if events[column].notna().any()]
+    columns = ['hit', 'latency_seconds'] + [f"{stage}_seconds" for stage in stages]
+    events = events[columns].astype(object).where(events[columns].notna(), None)
+    return histograms_from_rows(events.itertuples(index=False, name=None), stages)
+
+def load_columnar_experiments(root):
+    # Lee todas las particiones de una vez con proyección de columnas; los eventos se agregan en Arrow
+    from src.columnar_store import read_columnar, summarize_request_events
+    data = read_columnar('results', root=root, columns=ANALYSIS_COLUMNS)
+    summaries = summarize_request_events(root=root).set_index('experiment')
+    experiments = []
+    for exp_name, df in data.groupby('experiment'):
+        request_summary = None
+        if exp_name in summaries.index:
+            request_summary = {'total_requests': int(summaries.loc[exp_name, 'total_requests']),
+                               'cache_hits': int(summaries.loc[exp_name, 'cache_hits']),
+                               'latency_histograms': columnar_histograms(root, exp_name)}
+        experiments.append((exp_name, df.reset_index(drop=True), request_summary))
+    return experiments
+
+def load_sqlite_experiments(data_dir, db_files):
+    experiments = []
+    for db_file in sorted(db_files):
+        db_path = os.path.join(data_dir, db_file)
+        exp_name = db_file.replace('results_', '').replace('.db', '')
+        df = load_experiment_data(db_path, exp_name)
+        if df is not None:
+            experiments.append((exp_name, df, load_request_summary(db_path)))
+    return experiments
+
+CACHE_POLICIES = ['LRU', 'LFU', 'FIFO']
+
+def get_policy_from_experiment(experiment_name):
+    for part in experiment_name.upper().split('_'):
+        if part in CACHE_POLICIES:
+            return part
+    return 'N/A'
+
+def calculate_llm_savings(df):
+    # Bases de datos anteriores al registro de uso del LLM no tienen estas columnas
+    llm_seconds = df['llm_latency_seconds'] if 'llm_latency_seconds' in df else pd.Series(np.nan, index=df.index)
+    prompt_tokens = df['prompt_tokens'] if 'prompt_tokens' in df else pd.Series(np.nan, index=df.index)
+    completion_tokens = df['completion_tokens'] if 'completion_tokens' in df else pd.Series(np.nan, index=df.index)
+    tokens = prompt_tokens.fillna(0) + completion_tokens.fillna(0)
+    
+    # Cada request repetido fue servido desde caché en lugar de volver a llamar al LLM
+    repeated_requests = df['request_count'] - 1
+    
+    return {
+        'llm_seconds': llm_seconds.sum(),
+        'llm_seconds_saved': (llm_seconds * repeated_requests).sum(),
+        'llm_tokens': tokens.sum(),
+        'llm_tokens_saved': (tokens * repeated_requests).sum()
+    }
+
+def calculate_metrics(df, request_summary=None):
     total_unique = len(df)
-    total_requests = df['request_count'].sum()
-    cache_hits = total_requests - total_unique
+    if request_summary is not None:
+        total_requests = request_summary['total_requests']
+        cache_hits = request_summary['cache_hits']
+    else:
+        total_requests = df['request_count'].sum()
+        cache_hits = total_requests - total_unique
     cache_hit_rate = (cache_hits / total_requests * 100) if total_requests > 0 else 0
     
     avg_score = df['quality_score'].mean()
     median_score = df['quality_score'].median()
     std_score = df['quality_score'].std()
     
-    return {
+    metrics = {
         'total_unique_questions': total_unique,
         'total_requests': total_requests,
         'cache_hits': cache_hits,
@@ -51,6 +188,56 @@ def calculate_metrics(df):
         'median_quality_score': median_score,
         'std_quality_score': std_score
     }
+    metrics.update(calculate_llm_savings(df))
+    return metrics
+
+def print_llm_savings_by_policy(metrics_df):
+    savings_columns = ['llm_seconds', 'llm_seconds_saved', 'llm_tokens', 'llm_tokens_saved']
+    by_policy = metrics_df.groupby('policy')[savings_columns].sum()
+    
+    print("\n" + "="*80)
+    print("AHORRO DEL LLM POR POLÍTICA DE CACHÉ")
+    print("="*80 + "\n")
+    for policy, row in by_policy.iterrows():
+        print(f"{policy}:")
+        print(f"  - Tiempo en el LLM: {row['llm_seconds']:.2f}s (ahorrado por caché: {row['llm_seconds_saved']:.2f}s)")
+        print(f"  - Tokens consumidos: {int(row['llm_tokens'])} (ahorrados por caché: {int(row['llm_tokens_saved'])})")
+
+def print_latency_percentiles(metrics_df):
+    print("\n" + "="*80)
+    print("PERCENTILES DE LATENCIA DE PUNTA A PUNTA (ms)")
+    print("="*80 + "\n")
+    labels = list(PERCENTILE_LABELS.values())
+    print(f"{'Experimento':<32} {'Tipo':<5} " + " ".join(f"{label:>10}" for label in labels))
+    for _, row in metrics_df.iterrows():
+        for outcome in LATENCY_OUTCOMES:
+            values = [row[f"{outcome}_{label}_ms"] for label in labels]
+            if all(pd.isna(value) for value in values):
+                continue
+            print(f"{row['experiment']:<32} {outcome:<5} " + " ".join(f"{value:>10.2f}" for value in values))
+
+def plot_latency_percentiles(metrics_df, output_dir):
+    # Escala logarítmica: los hits están en milisegundos y los misses en segundos
+    fig, axes = plt.subplots(1, len(LATENCY_OUTCOMES), figsize=(15, 6))
+    x = np.arange(len(metrics_df))
+    width = 0.8 / len(PERCENTILE_LABELS)
+    for ax, outcome in zip(axes, LATENCY_OUTCOMES):
+        for position, label in enumerate(PERCENTILE_LABELS.values()):
+            ax.bar(x + (position - (len(PERCENTILE_LABELS) - 1) / 2) * width, metrics_df[f"{outcome}_{label}_ms"], width, label=label)
+        ax.set_yscale('log')
+        ax.set_xlabel('Experimento')
+        ax.set_ylabel('Latencia (ms)')
+        ax.set_title(f"Percentiles de latencia ({outcome})")
+        ax.set_xticks(x)
+        ax.set_xticklabels(metrics_df['experiment'], rotation=45, ha='right')
+        ax.legend()
+        ax.grid(axis='y', alpha=0.3)
+    
+    plt.tight_layout()
+    output_file = os.path.join(output_dir, 'latency_percentiles.png')
+    plt.savefig(output_file, dpi=300, bbox_inches='tight')
+    print(f"Gráfico guardado: {output_file}")
+    plt.close()
 
 def plot_cache_performance(metrics_df, output_dir):
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
@@ -183,32 +370,42 @@ def main():
     print("="*80 + "\n")
     
     data_dir = 'data'
-    db_files = [f for f in os.listdir(data_dir) if f.startswith('results_exp') and f.endswith('.db')]
-    
-    if not db_files:
-        print("No se encontraron bases de datos de experimentos en el directorio 'data/'")
-        print("Ejecuta primero 'python scripts/run_experiments.py'")
-        return
-    
-    print(f"Se encontraron {len(db_files)} experimentos:\n")
-    for db_file in sorted(db_files):
-        print(f"  - {db_file}")
+    columnar_root = None
+    if '--columnar' in sys.argv:
+        position = sys.argv.index('--columnar')
+        columnar_root = sys.argv[position + 1] if len(sys.argv) > position + 1 else settings.COLUMNAR_DIR
+    
+    if columnar_root is not None:
+        print(f"Leyendo experimentos exportados en formato columnar desde {columnar_root}")
+        experiments = load_columnar_experiments(columnar_root)
+    else:
+        db_files = [f for f in os.listdir(data_dir) if f.startswith('results_exp') and f.endswith('.db')]
+        
+        if not db_files:
+            print("No se encontraron bases de datos de experimentos en el directorio 'data/'")
+            print("Ejecuta primero 'python scripts/run_experiments.py'")
+            return
+        
+        print(f"Se encontraron {len(db_files)} experimentos:\n")
+        for db_file in sorted(db_files):
+            print(f"  - {db_file}")
+        
+        print("\nCargando datos de experimentos...")
+        experiments = load_sqlite_experiments(data_dir, db_files)
     
     all_data = []
     metrics_list = []
     
-    print("\nCargando datos de experimentos...")
-    for db_file in sorted(db_files):
-        db_path = os.path.join(data_dir, db_file)
-        exp_name = db_file.replace('results_', '').replace('.db', '')
-        
-        df = load_experiment_data(db_path, exp_name)
-        if df is not None:
-            all_data.append(df)
-            metrics = calculate_metrics(df)
-            metrics['experiment'] = exp_name
-            metrics_list.append(metrics)
-            print(f"  ✓ {exp_name}: {len(df)} registros")
+    for exp_name, df, request_summary in experiments:
+        df['experiment'] = exp_name
+        all_data.append(df)
+        metrics = calculate_metrics(df, request_summary)
+        metrics['experiment'] = exp_name
+        metrics['policy'] = get_policy_from_experiment(exp_name)
+        metrics['popularity'] = get_popularity_label((request_summary or {}).get('popularity'))
+        metrics.update(calculate_latency_metrics((request_summary or {}).get('latency_histograms')))
+        metrics_list.append(metrics)
+        print(f"  ✓ {exp_name}: {len(df)} registros")
     
     if not all_data:
         print("\nNo se pudieron cargar datos de ningún experimento.")
@@ -225,12 +422,16 @@ def main():
     plot_cache_performance(metrics_df, output_dir)
     plot_quality_scores(combined_data, output_dir)
     plot_score_comparison(metrics_df, output_dir)
+    if metrics_df[[column for column in metrics_df.columns if column.endswith('_ms')]].notna().any().any():
+        plot_latency_percentiles(metrics_df, output_dir)
     generate_comparison_table(metrics_df, output_dir)
     
     print("\n" + "="*80)
     print("RESUMEN DE MÉTRICAS")
     print("="*80 + "\n")
     print(metrics_df.to_string(index=False))
+    print_llm_savings_by_policy(metrics_df)
+    print_latency_percentiles(metrics_df)
     
     print("\n" + "="*80)
     print("Análisis completado!")
@@ -0,0 +1,75 @@
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from src.data_store import DataStore
+from src.columnar_store import DATASETS, partition_path, experiment_name_from_db_path
+
+def print_header(title):
+    print("\n" + "="*70)
+    print(f" {title}")
+    print("="*70)
+
+def find_result_databases(data_dir='data'):
+    db_files = [f for f in os.listdir(data_dir) if f.startswith('results_exp') and f.endswith('.db')]
+    return [os.path.join(data_dir, f) for f in sorted(db_files)]
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def export_database(db_path, root, datasets):
+    print_header(f"EXPORTANDO {db_path}")
+    experiment = experiment_name_from_db_path(db_path)
+    store = DataStore(db_path, write_behind=False, db_type="SQLITE")
+    try:
+        rows = store.export_columnar(root=root, experiment=experiment, datasets=datasets)
+    finally:
+        store.close()
+
+    db_size = os.path.getsize(db_path)
+    columnar_size = sum(directory_size(partition_path(root, dataset, experiment)) for dataset in rows)
+    print(f"Tamaño SQLite: {db_size / 1024:.1f} KB | Tamaño columnar: {columnar_size / 1024:.1f} KB")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta bases de datos de resultados a Parquet particionado por experimento.")
+    parser.add_argument('databases', nargs='*', help="Bases de datos a exportar (por defecto data/results_exp*.db)")
+    parser.add_argument('--output', default=settings.COLUMNAR_DIR, help="Directorio raíz del dataset columnar")
+    parser.add_argument('--datasets', nargs='+', choices=list(DATASETS), default=list(DATASETS),
+                        help="Datasets a exportar")
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print(" "*20 + "EXPORTACIÓN COLUMNAR")
+    print(" "*10 + "Sistema de Análisis Yahoo! Answers")
+    print("="*70)
+
+    db_paths = args.databases or find_result_databases()
+    if not db_paths:
+        print("No se encontraron bases de datos de resultados.")
+        return False
+
+    results = {}
+    for db_path in db_paths:
+        try:
+            results[db_path] = export_database(db_path, args.output, args.datasets)
+        except Exception as e:
+            print(f"✗ Error exportando {db_path}: {e}")
+            results[db_path] = None
+
+    print_header("RESUMEN")
+    for db_path, rows in results.items():
+        if rows is None:
+            print(f"  ✗ {db_path}")
+        else:
+            print(f"  ✓ {db_path}: " + ", ".join(f"{dataset}={count}" for dataset, count in rows.items()))
+    print(f"\nDataset columnar en: {args.output}")
+    print(f"Compara experimentos con: python scripts/compare_experiments.py --columnar {args.output}")
+    return all(rows is not None for rows in results.values())
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -11,7 +11,7 @@ def load_experiment_data(db_path, experiment_name):
     
     try:
         conn = sqlite3.connect(db_path)
-        df = pd.read_sql_query("SELECT * FROM query_results", conn)
+        df = pd.read_sql_query("SELECT request_count, quality_score FROM query_results", conn)
         conn.close()
         
         if df.empty:
@@ -124,6 +124,27 @@ def create_env_from_experiment(experiment_id, config_path='config/experiments.ya
         f"TRAFFIC_MAX_DELAY_SECONDS={exp_config['traffic']['max_delay_seconds']}",
     ])
     
+    # Modelo de popularidad, traza a repetir y perfil de carga opcionales; sin ellos se muestrea de forma uniforme
+    popularity_settings = {
+        'popularity': 'TRAFFIC_POPULARITY_MODEL',
+        'zipf_s': 'TRAFFIC_ZIPF_S',
+        'hot_set_fraction': 'TRAFFIC_HOT_SET_FRACTION',
+        'hot_set_probability': 'TRAFFIC_HOT_SET_PROBABILITY',
+        'category_weights': 'TRAFFIC_CATEGORY_WEIGHTS',
+        'seed': 'TRAFFIC_SEED',
+        'replay_trace': 'TRAFFIC_TRACE_REPLAY_PATH',
+        'replay_speed': 'TRAFFIC_REPLAY_SPEED',
+        'load_profile': 'TRAFFIC_LOAD_PROFILE',
+        'profile_min_lambda': 'TRAFFIC_PROFILE_MIN_LAMBDA',
+        'profile_period_seconds': 'TRAFFIC_PROFILE_PERIOD_SECONDS',
+        'profile_steps': 'TRAFFIC_PROFILE_STEPS',
+        'burst_on_seconds': 'TRAFFIC_BURST_ON_SECONDS',
+        'burst_off_seconds': 'TRAFFIC_BURST_OFF_SECONDS'
+    }
+    for field, env_name in popularity_settings.items():
+        if field in exp_config['traffic']:
+            env_lines.append(f"{env_name}={exp_config['traffic'][field]}")
+    
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write('\n'.join(env_lines))
     
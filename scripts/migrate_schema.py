@@ -0,0 +1,79 @@
+import sys
+import os
+import shutil
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_store import DataStore
+from src.storage_backends import is_legacy_database
+
+def print_header(title):
+    print("\n" + "="*70)
+    print(f" {title}")
+    print("="*70)
+
+def find_result_databases(data_dir='data'):
+    db_files = [f for f in os.listdir(data_dir) if f.startswith('results') and f.endswith('.db')]
+    return [os.path.join(data_dir, f) for f in sorted(db_files)]
+
+def summarize(db_path):
+    conn = sqlite3.connect(db_path)
+    summary = conn.execute("""
+        SELECT COUNT(*), SUM(request_count), ROUND(AVG(quality_score), 6) FROM query_results;
+    """).fetchone()
+    conn.close()
+    return summary
+
+def migrate_database(db_path, backup=True):
+    print_header(f"MIGRANDO {db_path}")
+    if not is_legacy_database(db_path):
+        print("Ya usa el esquema normalizado. Nada que migrar.")
+        return True
+
+    before = summarize(db_path)
+    if backup:
+        backup_path = db_path + '.bak'
+        shutil.copy2(db_path, backup_path)
+        print(f"Respaldo creado: {backup_path}")
+
+    # DataStore solo migra el esquema anterior cuando se le pide explícitamente
+    store = DataStore(db_path, write_behind=False, db_type="SQLITE", migrate_legacy=True)
+    store.close()
+
+    after = summarize(db_path)
+    print(f"Antes:   {before[0]} filas, {before[1]} requests, score medio {before[2]}")
+    print(f"Después: {after[0]} filas, {after[1]} requests, score medio {after[2]}")
+    if before != after:
+        print("✗ La migración no conserva los totales de query_results")
+        return False
+    print("✓ Totales de query_results conservados")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra bases de datos de resultados al esquema normalizado.")
+    parser.add_argument('databases', nargs='*', help="Bases de datos a migrar (por defecto data/results*.db)")
+    parser.add_argument('--no-backup', action='store_true', help="No crear una copia .bak antes de migrar")
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print(" "*20 + "MIGRACIÓN DE ESQUEMA")
+    print(" "*10 + "Sistema de Análisis Yahoo! Answers")
+    print("="*70)
+
+    db_paths = args.databases or find_result_databases()
+    if not db_paths:
+        print("No se encontraron bases de datos de resultados.")
+        return False
+
+    results = {db_path: migrate_database(db_path, backup=not args.no_backup) for db_path in db_paths}
+
+    print_header("RESUMEN")
+    for db_path, success in results.items():
+        print(f"  {'✓' if success else '✗'} {db_path}")
+    return all(results.values())
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
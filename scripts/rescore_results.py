@@ -0,0 +1,163 @@
+import sys
+import os
+import re
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from src.data_store import DataStore
+from src.storage_backends import is_legacy_database
+from src.score_calculator import ScoreCalculator, FITTED_MODES
+from src.utils import load_dataset
+
+SCORE_COLUMNS = ['question_id', 'original_best_answer', 'llm_generated_answer']
+
+_worker_scorer = None
+
+def _init_worker(mode, fitted_path):
+    global _worker_scorer
+    if mode in FITTED_MODES:
+        _worker_scorer = ScoreCalculator(mode=mode, fitted_path=fitted_path)
+    else:
+        _worker_scorer = ScoreCalculator(mode=mode)
+
+def _score_chunk(row_ids, question_ids, originals, answers):
+    scores = _worker_scorer.calculate_scores_batch(originals, answers, question_ids)
+    return list(zip(row_ids, scores.tolist()))
+
+def print_header(title):
+    print("\n" + "="*70)
+    print(f" {title}")
+    print("="*70)
+
+def find_result_databases(data_dir='data'):
+    db_files = [f for f in os.listdir(data_dir) if f.startswith('results_exp') and f.endswith('.db')]
+    return [os.path.join(data_dir, f) for f in sorted(db_files)]
+
+def load_corpus(db_paths):
+    if os.path.exists(settings.DATA_PATH):
+        dataset = load_dataset()
+        if dataset is not None and not dataset.empty:
+            return dataset['best_answer']
+
+    print(f"Dataset no disponible en {settings.DATA_PATH}. Usando las respuestas originales de las bases de datos como corpus.")
+    originals = []
+    for db_path in db_paths:
+        for chunk in DataStore(db_path, db_type="SQLITE").iter_results(['original_best_answer']):
+            originals.append(chunk['original_best_answer'])
+    return pd.concat(originals).dropna().drop_duplicates()
+
+def score_column_for(scorer_version):
+    return 'quality_score_' + re.sub(r'[^a-z0-9_]', '_', scorer_version.lower())
+
+def rescore_database(db_path, executor, scorer_version, in_place, chunk_size, commit_rows, max_in_flight):
+    print_header(f"RE-EVALUANDO {db_path}")
+    store = DataStore(db_path, db_type="SQLITE")
+
+    if in_place:
+        column = 'quality_score'
+        store.ensure_column('scorer_version', 'TEXT')
+    else:
+        column = score_column_for(scorer_version)
+        store.ensure_column(column, 'REAL')
+    print(f"Columna destino: {column}")
+
+    start_time = time.time()
+    rows_done = 0
+    pending_writes = []
+    in_flight = set()
+
+    def flush_writes():
+        # Los scores se escriben en transacciones grandes en lugar de fila por fila
+        if pending_writes:
+            store.update_scores(pending_writes, column, scorer_version if in_place else None)
+            pending_writes.clear()
+
+    def collect(done):
+        nonlocal rows_done
+        for future in done:
+            scored = future.result()
+            pending_writes.extend(scored)
+            rows_done += len(scored)
+        if len(pending_writes) >= commit_rows:
+            flush_writes()
+        elapsed = time.time() - start_time
+        print(f"  {rows_done} filas re-evaluadas ({rows_done / max(elapsed, 1e-9):.1f} filas/s)")
+
+    for chunk in store.iter_results(SCORE_COLUMNS, chunk_size):
+        if len(in_flight) >= max_in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+        in_flight.add(executor.submit(
+            _score_chunk,
+            chunk['id'].tolist(),
+            chunk['question_id'].tolist(),
+            chunk['original_best_answer'].tolist(),
+            chunk['llm_generated_answer'].tolist()
+        ))
+
+    if in_flight:
+        done, _ = wait(in_flight)
+        collect(done)
+    flush_writes()
+
+    elapsed = time.time() - start_time
+    print(f"✓ {rows_done} filas en {elapsed:.2f}s ({rows_done / max(elapsed, 1e-9):.1f} filas/s)")
+    return rows_done, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-evalúa los quality_score de bases de datos de resultados existentes.")
+    parser.add_argument('databases', nargs='*', help="Bases de datos a re-evaluar (por defecto data/results_exp*.db)")
+    parser.add_argument('--mode', default=settings.SCORER_MODE, help="Modo de scoring: PAIR, CORPUS o HASHING")
+    parser.add_argument('--in-place', action='store_true', help="Sobrescribe quality_score en lugar de crear una columna nueva")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="Filas por bloque de scoring")
+    parser.add_argument('--commit-rows', type=int, default=20000, help="Filas por transacción de escritura")
+    parser.add_argument('--workers', type=int, default=settings.SCORING_WORKERS, help="Procesos de scoring")
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print(" "*18 + "RE-EVALUACIÓN DE RESULTADOS")
+    print(" "*10 + "Sistema de Análisis Yahoo! Answers")
+    print("="*70)
+
+    db_paths = args.databases or find_result_databases()
+    if not db_paths:
+        print("No se encontraron bases de datos de resultados.")
+        return False
+
+    legacy_paths = [db_path for db_path in db_paths if is_legacy_database(db_path)]
+    if legacy_paths:
+        print("Estas bases de datos usan el esquema anterior y hay que migrarlas (con respaldo .bak) antes de re-evaluarlas:")
+        print(f"  python scripts/migrate_schema.py {' '.join(legacy_paths)}")
+        return False
+
+    mode = args.mode.upper()
+    if mode in FITTED_MODES:
+        scorer = ScoreCalculator(mode=mode, corpus=load_corpus(db_paths))
+    else:
+        scorer = ScoreCalculator(mode=mode)
+    print(f"\nVersión del scorer: {scorer.version}")
+
+    total_rows = 0
+    total_time = 0.0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(mode, scorer.cache_path)) as executor:
+        for db_path in db_paths:
+            rows, elapsed = rescore_database(db_path, executor, scorer.version, args.in_place,
+                                             args.chunk_size, args.commit_rows, args.workers * 2)
+            total_rows += rows
+            total_time += elapsed
+
+    print_header("RESUMEN")
+    print(f"\nBases de datos: {len(db_paths)}")
+    print(f"Filas re-evaluadas: {total_rows}")
+    print(f"Throughput: {total_rows / max(total_time, 1e-9):.1f} filas/s")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,208 @@
+import sys
+import os
+import time
+import queue
+import random
+import threading
+import traceback
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from src.latency_histogram import (merge_latency_histograms, latency_histograms_from_dict, latency_histograms_to_dict,
+                                   print_latency_table, end_to_end_histogram)
+from src.utils import start_process_with_env
+
+LOG_DIR = "data/logs"
+REPORT_INTERVAL_SECONDS = 1.0
+LIVE_INTERVAL_SECONDS = 5.0
+# Bordes del histograma final, en segundos
+DISTRIBUTION_EDGES = [0, 0.001, 0.01, 0.1, 1, 10, 60, float('inf')]
+DISTRIBUTION_LABELS = ['< 1ms', '1-10ms', '10-100ms', '100ms-1s', '1-10s', '10-60s', '>= 60s']
+
+def print_header(title):
+    print("\n" + "="*70)
+    print(f" {title}")
+    print("="*70)
+
+def process_overrides(index, processes, base_seed):
+    # Cada proceso genera su parte de los requests con su propia semilla y una fracción de la tasa de llegada
+    num_requests = settings.TRAFFIC_NUM_REQUESTS // processes + (1 if index < settings.TRAFFIC_NUM_REQUESTS % processes else 0)
+    return {
+        'TRAFFIC_PROCESS_INDEX': str(index),
+        'TRAFFIC_SEED': str(base_seed + index),
+        'TRAFFIC_NUM_REQUESTS': str(num_requests),
+        'TRAFFIC_LAMBDA': str(settings.TRAFFIC_LAMBDA / processes),
+        'TRAFFIC_PROFILE_MIN_LAMBDA': str(settings.TRAFFIC_PROFILE_MIN_LAMBDA / processes)
+    }
+
+def report_loop(generator, index, channel, stop):
+    while not stop.wait(REPORT_INTERVAL_SECONDS):
+        channel.put(('progress', index, generator.snapshot()))
+
+def run_generator(index, log_path, channel):
+    # Proceso hijo: la configuración llega en las variables de entorno heredadas al lanzarlo y la salida va a su log
+    log_file = open(log_path, 'w', buffering=1, encoding='utf-8')
+    sys.stdout = sys.stderr = log_file
+    try:
+        from src.traffic_generator import TrafficGenerator
+        generator = TrafficGenerator()
+        stop = threading.Event()
+        reporter = threading.Thread(target=report_loop, args=(generator, index, channel, stop), name="StatsReporter", daemon=True)
+        reporter.start()
+        generator.run()
+        stop.set()
+        reporter.join()
+        channel.put(('final', index, generator.snapshot()))
+    except Exception as e:
+        traceback.print_exc()
+        channel.put(('error', index, str(e)))
+    finally:
+        log_file.close()
+
+def merge_snapshots(snapshots):
+    merged = {'stats': {}, 'completed': 0, 'run_seconds': 0.0, 'simulated': False}
+    latency_histograms = {}
+    for snapshot in snapshots:
+        for name, value in snapshot['stats'].items():
+            merged['stats'][name] = merged['stats'].get(name, 0) + value
+        merged['completed'] += snapshot['completed']
+        # Los procesos corren en paralelo: el total dura lo que el más lento
+        merged['run_seconds'] = max(merged['run_seconds'], snapshot['run_seconds'])
+        merged['simulated'] = merged['simulated'] or snapshot['simulated']
+        merge_latency_histograms(latency_histograms, latency_histograms_from_dict(snapshot['latency_histograms']))
+    merged['latency_histograms'] = latency_histograms
+    merged['latency_histogram'] = end_to_end_histogram(latency_histograms)
+    return merged
+
+def clock_label(merged):
+    return "s simulados" if merged['simulated'] else "s"
+
+def format_ms(seconds):
+    return "N/A" if seconds is None else f"{seconds * 1000:.1f}ms"
+
+def print_live(snapshots, processes, elapsed):
+    merged = merge_snapshots(snapshots.values())
+    stats = merged['stats']
+    histogram = merged['latency_histogram']
+    throughput = merged['completed'] / merged['run_seconds'] if merged['run_seconds'] > 0 else 0.0
+    print(f"[{elapsed:7.1f}s] {len(snapshots)}/{processes} procesos | requests: {merged['completed']}/{settings.TRAFFIC_NUM_REQUESTS} | "
+          f"hits: {stats.get('cache_hits', 0) / max(1, stats.get('total_requests', 0)) * 100:.1f}% | errores: {stats.get('llm_errors', 0)} | "
+          f"{throughput:.2f} req/s | p50 {format_ms(histogram.percentile(50))} p99 {format_ms(histogram.percentile(99))}")
+
+def print_report(finals, errors, processes):
+    print_header("RESULTADOS POR PROCESO")
+    print(f"\n{'Proceso':<9} {'Requests':>9} {'Hits (%)':>9} {'Errores':>8} {'req/s':>9} {'p50':>10} {'p99':>10}")
+    for index in range(processes):
+        if index in errors:
+            print(f"{index:<9} {'falló: ' + errors[index]}")
+            continue
+        snapshot = finals[index]
+        histogram = end_to_end_histogram(latency_histograms_from_dict(snapshot['latency_histograms']))
+        throughput = snapshot['completed'] / snapshot['run_seconds'] if snapshot['run_seconds'] > 0 else 0.0
+        print(f"{index:<9} {snapshot['completed']:>9} {snapshot['stats']['cache_hits'] / max(1, snapshot['stats']['total_requests']) * 100:>9.2f} "
+              f"{snapshot['stats']['llm_errors']:>8} {throughput:>9.2f} {format_ms(histogram.percentile(50)):>10} {format_ms(histogram.percentile(99)):>10}")
+
+    merged = merge_snapshots(finals.values())
+    stats = merged['stats']
+    histogram = merged['latency_histogram']
+    print_header("TOTAL COMBINADO")
+    print(f"\nRequests: {merged['completed']} en {merged['run_seconds']:.2f}{clock_label(merged)} "
+          f"({merged['completed'] / merged['run_seconds'] if merged['run_seconds'] > 0 else 0:.2f} req/s)")
+    print(f"Cache hits: {stats['cache_hits']} ({stats['cache_hits'] / max(1, stats['total_requests']) * 100:.2f}%)")
+    print(f"Errores del LLM: {stats['llm_errors']} | Tiempo en el LLM: {stats['llm_seconds']:.2f}s")
+    print(f"Latencia: " + ", ".join(f"p{percentile} {format_ms(value)}" for percentile, value in histogram.percentiles().items()) +
+          f" (media {format_ms(histogram.mean)}, máximo {format_ms(histogram.max)})")
+    print("\nHistograma de latencia:")
+    for label, count in zip(DISTRIBUTION_LABELS, histogram.distribution(DISTRIBUTION_EDGES)):
+        percentage = count / max(1, histogram.count) * 100
+        print(f"  {label:>10}: {'█' * int(percentage / 2)} {count} ({percentage:.1f}%)")
+    print_latency_table(merged['latency_histograms'])
+    return merged
+
+def save_launcher_metadata(merged, processes, base_seed):
+    from src.data_store import DataStore
+    store = DataStore(write_behind=False)
+    metadata = store.get_metadata()
+    traffic = metadata.get('traffic', {})
+    # Cada proceso guardó su propia fracción; el experimento queda con los totales
+    traffic.update({'lambda': settings.TRAFFIC_LAMBDA, 'num_requests': settings.TRAFFIC_NUM_REQUESTS})
+    store.save_metadata({
+        'traffic': traffic,
+        'latency_histograms': latency_histograms_to_dict(merged['latency_histograms']),
+        'launcher': {
+            'processes': processes,
+            'seeds': [base_seed + index for index in range(processes)],
+            'throughput_rps': merged['completed'] / merged['run_seconds'] if merged['run_seconds'] > 0 else 0.0,
+            'clock': 'simulated' if merged['simulated'] else 'wall'
+        }
+    })
+    store.close()
+
+def main():
+    print("\n" + "="*70)
+    print(" "*17 + "GENERACIÓN DE TRÁFICO MULTIPROCESO")
+    print(" "*10 + "Sistema de Análisis Yahoo! Answers")
+    print("="*70)
+
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    base_seed = settings.TRAFFIC_SEED if settings.TRAFFIC_SEED is not None else random.randrange(2**31)
+    run_name = os.path.splitext(os.path.basename(settings.SQLITE_DB_PATH))[0]
+    os.makedirs(LOG_DIR, exist_ok=True)
+    print(f"\nProcesos: {processes} | Requests: {settings.TRAFFIC_NUM_REQUESTS} | Lambda total: {settings.TRAFFIC_LAMBDA} "
+          f"({settings.TRAFFIC_LAMBDA / processes:.4f} por proceso) | Modo: {settings.TRAFFIC_MODE} | Semilla base: {base_seed}")
+    if settings.TRAFFIC_DISTRIBUTION_TYPE.upper() == 'UNIFORM':
+        print("Advertencia: con distribución UNIFORM los intervalos no dependen de lambda y la carga crece con los procesos.")
+    if settings.TRAFFIC_LOAD_PROFILE == 'BURST':
+        print("Nota: cada proceso sigue sus propias ráfagas; la carga combinada es menos concentrada que un solo generador.")
+    if settings.TRAFFIC_MODE == "SIMULATION":
+        print("Advertencia: en SIMULATION cada proceso tiene su propia caché simulada; el hit rate combinado no es el de una caché "
+              "compartida. El throughput se mide en tiempo simulado.")
+    if settings.DB_TYPE.upper() == 'SQLITE':
+        print("Nota: con SQLITE los procesos comparten un solo escritor; para más carga use DB_TYPE=POSTGRESQL.")
+    print(f"Logs de cada proceso en {LOG_DIR}/{run_name}_p<N>.log")
+
+    # spawn: cada hijo importa config.settings de cero con sus variables de entorno
+    context = multiprocessing.get_context('spawn')
+    channel = context.Queue()
+    workers = []
+    for index in range(processes):
+        worker = start_process_with_env(context, process_overrides(index, processes, base_seed), run_generator, f"TrafficGenerator-{index}",
+                                        (index, os.path.join(LOG_DIR, f"{run_name}_p{index}.log"), channel))
+        workers.append(worker)
+
+    snapshots, finals, errors = {}, {}, {}
+    start = time.time()
+    last_live = start
+    while len(finals) + len(errors) < processes:
+        try:
+            kind, index, payload = channel.get(timeout=REPORT_INTERVAL_SECONDS)
+            if kind == 'error':
+                errors[index] = payload
+            else:
+                snapshots[index] = payload
+                if kind == 'final':
+                    finals[index] = payload
+        except queue.Empty:
+            # Un proceso que murió sin avisar (p. ej. un error al importar) no va a mandar su resultado
+            for index, worker in enumerate(workers):
+                if not worker.is_alive() and worker.exitcode not in (0, None) and index not in finals and index not in errors:
+                    errors[index] = f"terminó con código {worker.exitcode}"
+        if snapshots and time.time() - last_live >= LIVE_INTERVAL_SECONDS:
+            last_live = time.time()
+            print_live(snapshots, processes, last_live - start)
+    for worker in workers:
+        worker.join()
+
+    if not finals:
+        print("\n✗ Ningún proceso terminó correctamente. Revisa los logs.")
+        return False
+    merged = print_report(finals, errors, processes)
+    save_launcher_metadata(merged, processes, base_seed)
+    print(f"\nResultados en {settings.SQLITE_DB_PATH if settings.DB_TYPE.upper() == 'SQLITE' else 'PostgreSQL'}")
+    return not errors
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
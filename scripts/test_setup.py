@@ -82,7 +82,7 @@ def test_database():
     try:
         from src.data_store import DataStore
         store = DataStore()
-        print(f"   ✓ Base de datos inicializada: {store.db_path}")
+        print(f"   ✓ Base de datos {store.backend.name} inicializada: {store.backend.description}")
         return True
     except Exception as e:
         print(f"   ✗ Error al inicializar base de datos: {e}")
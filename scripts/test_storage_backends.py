@@ -0,0 +1,245 @@
+import sys
+import os
+import io
+import argparse
+import tempfile
+import multiprocessing
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from src.data_store import DataStore
+from src.storage_backends import PostgresBackend
+
+CONCURRENT_PROCESSES = 4
+EVENTS_PER_PROCESS = 500
+CONCURRENT_QUESTIONS = 20
+
+def make_result(question_id, quality_score, title=None):
+    return {
+        'question_id': question_id,
+        'question_title': title or f"Pregunta {question_id}",
+        'question_content': "Contenido de la pregunta",
+        'original_best_answer': "Respuesta original",
+        'llm_generated_answer': "Respuesta generada",
+        'quality_score': quality_score,
+        'prompt_tokens': 30,
+        'completion_tokens': 10
+    }
+
+def open_store(target, write_behind=False):
+    # Los prints por escritura del DataStore no aportan nada en las pruebas
+    with redirect_stdout(io.StringIO()):
+        if target['db_type'] == 'SQLITE':
+            return DataStore(target['db_path'], write_behind=write_behind, db_type='SQLITE')
+        return DataStore(write_behind=write_behind, backend=PostgresBackend(**target['params']))
+
+def reset_target(target):
+    if target['db_type'] == 'SQLITE':
+        for suffix in ['', '-wal', '-shm']:
+            if os.path.exists(target['db_path'] + suffix):
+                os.remove(target['db_path'] + suffix)
+        return
+    import psycopg2
+    conn = psycopg2.connect(**target['params'])
+    conn.autocommit = True
+    conn.cursor().execute("""
+        DROP VIEW IF EXISTS query_results;
+        DROP TABLE IF EXISTS request_events, answers, questions, store_stats, experiment_metadata CASCADE;
+    """)
+    conn.close()
+
+def run_quietly(function, *args):
+    with redirect_stdout(io.StringIO()):
+        return function(*args)
+
+def check_upsert(target):
+    store = open_store(target)
+    run_quietly(store.save_query_result, make_result('q_1', 0.9))
+    first_id = store.get_result_by_question_id('q_1')['id']
+    run_quietly(store.save_query_result, make_result('q_1', 0.7, title="Pregunta actualizada"))
+    run_quietly(store.save_query_result, make_result('q_2', 0.4))
+    row = store.get_result_by_question_id('q_1')
+    answers = store.stats()['answers']
+    store.close()
+
+    assert answers == 2, f"Debería haber 2 respuestas, hay {answers}"
+    assert row['id'] == first_id, "El UPSERT no debería cambiar el id de una fila existente"
+    assert row['question_title'] == "Pregunta actualizada" and row['quality_score'] == 0.7, "El UPSERT no actualizó la fila"
+    return "UPSERT de preguntas y respuestas"
+
+def check_request_events(target):
+    store = open_store(target)
+    run_quietly(store.save_query_result, make_result('q_1', 0.9))
+    store.record_request_event('q_1', hit=False, latency_seconds=1.5, stage_seconds={'llm': 1.2}, ts=960.0)
+    store.record_request_event('q_1', hit=True, cache_tier='redis', latency_seconds=0.01, ts=970.0)
+    store.record_request_event('q_1', hit=True, cache_tier='redis', latency_seconds=0.02, ts=1030.0)
+    store.record_request_event('q_2', hit=False, error=True, ts=1040.0)
+    row = store.get_result_by_question_id('q_1')
+    hit_rate = store.hit_rate_over_time(bucket_seconds=60)
+    percentiles = store.latency_percentiles((50, 100))
+    hit_percentiles = store.latency_percentiles((100,), hit=True)
+    llm_percentiles = store.latency_percentiles((50,), column='llm_seconds')
+    store_stats = store.stats()
+    store.save_metadata({'popularity': {'model': 'ZIPF', 'zipf_s': 1.0}})
+    store.save_metadata({'popularity': {'model': 'ZIPF', 'zipf_s': 1.2}, 'traffic': {'mode': 'OPEN_LOOP'}})
+    metadata = store.get_metadata()
+    store.close()
+
+    assert metadata == {'popularity': {'model': 'ZIPF', 'zipf_s': 1.2}, 'traffic': {'mode': 'OPEN_LOOP'}}, "Los metadatos del experimento no coinciden"
+    assert row['request_count'] == 3, f"request_count debería ser 3, es {row['request_count']}"
+    assert hit_rate['requests'].tolist() == [2, 2] and hit_rate['hits'].tolist() == [1, 1], "El hit rate por minuto no coincide"
+    assert percentiles == {50: 0.02, 100: 1.5} and hit_percentiles == {100: 0.02}, "Los percentiles de latencia no coinciden"
+    assert llm_percentiles == {50: 1.2}, "El percentil de la etapa llm no coincide"
+    assert (store_stats['request_count'], store_stats['cache_hits'], store_stats['errors']) == (4, 2, 1), "Los totales de eventos no coinciden"
+    return "Eventos de request, hit rate, percentiles y metadatos"
+
+def check_scores(target):
+    store = open_store(target)
+    run_quietly(store.save_query_result, make_result('q_1', 0.9))
+    run_quietly(store.save_query_result, make_result('q_2', None))
+    store.update_quality_score('q_2', 0.5, {'tfidf_cosine': 0.5})
+    store_stats = store.stats()
+    assert store_stats['scored_answers'] == 2 and abs(store_stats['avg_quality_score'] - 0.7) < 1e-9, "stats() no sigue a update_quality_score"
+
+    store.ensure_column('quality_score_v2', 'REAL')
+    store.ensure_column('quality_score_v2', 'REAL')
+    ids = [int(row_id) for chunk in store.iter_results(['quality_score'], chunk_size=1) for row_id in chunk['id']]
+    store.update_scores([(row_id, 0.25) for row_id in ids], 'quality_score_v2')
+    rescored = [value for chunk in store.iter_results(['quality_score_v2']) for value in chunk['quality_score_v2']]
+    column_types = store.get_column_types('query_results')
+    store.close()
+
+    assert len(ids) == 2 and rescored == [0.25, 0.25], "update_scores no escribió la columna nueva"
+    assert 'quality_score_v2' in column_types and 'request_count' in column_types, "La vista no incluye la columna agregada"
+    return "Scores, columnas agregadas e iteración por bloques"
+
+def check_write_behind_reads(target):
+    store = open_store(target, write_behind=True)
+    run_quietly(store.save_query_result, make_result('q_1', 0.9))
+    store.record_request_event('q_1', hit=False)
+    # Una lectura de una pregunta con escrituras encoladas debe verlas
+    row = store.get_result_by_question_id('q_1')
+    write_stats = store.get_write_stats()
+    store.close()
+
+    assert row is not None and row['request_count'] == 1, "La lectura no vio las escrituras encoladas"
+    assert write_stats['errors'] == 0, "El escritor diferido registró errores"
+    return "Escritura diferida y lecturas consistentes"
+
+def _concurrent_writer(target, worker_id):
+    with redirect_stdout(io.StringIO()):
+        store = open_store(target, write_behind=True)
+        for i in range(EVENTS_PER_PROCESS):
+            question_id = f"q_{i % CONCURRENT_QUESTIONS}"
+            if i < CONCURRENT_QUESTIONS:
+                store.save_query_result(make_result(question_id, (worker_id + 1) / 10))
+            store.record_request_event(question_id, hit=i >= CONCURRENT_QUESTIONS, latency_seconds=0.01)
+        errors = store.get_write_stats()['errors']
+        store.close()
+    if errors:
+        sys.exit(1)
+
+def check_concurrent_writers(target):
+    # Varios procesos generadores escriben a la vez en la misma base de datos
+    processes = [multiprocessing.Process(target=_concurrent_writer, args=(target, worker_id))
+                 for worker_id in range(CONCURRENT_PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    store = open_store(target)
+    store_stats = store.stats()
+    request_counts = [value for chunk in store.iter_results(['request_count']) for value in chunk['request_count']]
+    store.close()
+
+    assert all(process.exitcode == 0 for process in processes), "Algún proceso escritor terminó con errores"
+    expected_requests = CONCURRENT_PROCESSES * EVENTS_PER_PROCESS
+    assert store_stats['questions'] == CONCURRENT_QUESTIONS and store_stats['answers'] == CONCURRENT_QUESTIONS, "Faltan preguntas o respuestas"
+    assert store_stats['request_count'] == expected_requests == sum(request_counts), "Se perdieron eventos entre procesos"
+    return f"{CONCURRENT_PROCESSES} procesos escribiendo a la vez ({expected_requests} eventos)"
+
+CHECKS = [
+    check_upsert,
+    check_request_events,
+    check_scores,
+    check_write_behind_reads,
+    check_concurrent_writers
+]
+
+def run_contract(name, target):
+    print(f"\n{name}")
+    results = []
+    for number, check in enumerate(CHECKS, start=1):
+        reset_target(target)
+        try:
+            description = check(target)
+            print(f"   ✓ {number}. {description}")
+            results.append(True)
+        except Exception as e:
+            print(f"   ✗ {number}. {check.__name__}: {e}")
+            results.append(False)
+    reset_target(target)
+    return results
+
+def postgres_target(embedded):
+    if embedded:
+        # Instancia local sin Docker: pip install pgserver
+        try:
+            import pgserver
+        except ImportError:
+            raise ImportError("La librería 'pgserver' no está instalada. Ejecuta: pip install pgserver")
+        data_dir = os.path.join(tempfile.gettempdir(), 'yahoo_pgserver')
+        server = pgserver.get_server(data_dir)
+        return {'db_type': 'POSTGRESQL', 'params': {'host': data_dir, 'user': 'postgres', 'dbname': 'postgres'}}, server
+    params = {
+        'host': settings.POSTGRES_DB_HOST,
+        'port': settings.POSTGRES_DB_PORT,
+        'dbname': settings.POSTGRES_DB_NAME,
+        'user': settings.POSTGRES_DB_USER,
+        'password': settings.POSTGRES_DB_PASSWORD
+    }
+    return {'db_type': 'POSTGRESQL', 'params': params}, None
+
+def main():
+    parser = argparse.ArgumentParser(description="Pruebas de contrato de los backends de almacenamiento.")
+    parser.add_argument('--skip-postgres', action='store_true', help="Probar solo SQLite")
+    parser.add_argument('--embedded', action='store_true', help="Levantar PostgreSQL embebido con pgserver en lugar de usar POSTGRES_DB_*")
+    args = parser.parse_args()
+
+    print("="*70)
+    print(" "*15 + "PRUEBAS DE CONTRATO DE ALMACENAMIENTO")
+    print("="*70)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results += run_contract("SQLite", {'db_type': 'SQLITE', 'db_path': os.path.join(tmp_dir, 'contract.db')})
+
+    if args.skip_postgres:
+        print("\nPostgreSQL omitido (--skip-postgres)")
+    else:
+        try:
+            target, server = postgres_target(args.embedded)
+            open_store(target).close()
+        except Exception as e:
+            print(f"\nPostgreSQL\n   ✗ No se pudo conectar: {e}")
+            print("   → Levanta el servicio con: docker-compose --profile postgres up -d postgres")
+            print("   → O usa una instancia embebida con: python scripts/test_storage_backends.py --embedded")
+            results.append(False)
+        else:
+            results += run_contract(f"PostgreSQL ({target['params']['host']})", target)
+
+    print("\n" + "="*70)
+    print("RESUMEN DE PRUEBAS")
+    print("="*70)
+    passed = sum(results)
+    total = len(results)
+    print(f"Pruebas pasadas: {passed}/{total}")
+    print("="*70 + "\n")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,54 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.request_trace import read_trace, write_trace, question_label
+
+def show_trace(path):
+    labels, offsets, metadata = read_trace(path)
+    print(f"\nTraza: {path} ({os.path.getsize(path) / 1024:.1f} KB)")
+    print(f"  - Requests: {len(labels)}")
+    print(f"  - Preguntas distintas: {len(np.unique(labels))}")
+    if len(offsets) > 1:
+        duration = offsets[-1] - offsets[0]
+        print(f"  - Duración a 1x: {duration:.2f}s ({(len(offsets) - 1) / duration if duration > 0 else float('inf'):.2f} req/s)")
+    for key, value in metadata.items():
+        print(f"  - {key}: {value}")
+
+def import_csv(csv_path, output_path):
+    # Captura externa con columnas question_id (q_<n>) y timestamp (segundos o fecha ISO) por request
+    capture = pd.read_csv(csv_path)
+    missing = {'question_id', 'timestamp'} - set(capture.columns)
+    if missing:
+        raise ValueError(f"Columnas faltantes en {csv_path}: {', '.join(sorted(missing))}")
+    if pd.api.types.is_numeric_dtype(capture['timestamp']):
+        timestamps = capture['timestamp'].to_numpy(dtype=float)
+    else:
+        timestamps = pd.to_datetime(capture['timestamp']).astype('int64').to_numpy() / 1e9
+    order = np.argsort(timestamps, kind='stable')
+    labels = np.array([question_label(question_id) for question_id in capture['question_id']], dtype=np.int64)[order]
+    offsets = timestamps[order] - timestamps[order][0]
+    write_trace(output_path, labels, offsets, {'source': os.path.abspath(csv_path), 'created_at': datetime.now().isoformat()})
+    print(f"Traza creada: {output_path} ({len(labels)} requests)")
+
+def export_csv(path, csv_path):
+    labels, offsets, _ = read_trace(path)
+    pd.DataFrame({'question_id': [f"q_{label}" for label in labels], 'timestamp': offsets}).to_csv(csv_path, index=False)
+    print(f"Traza exportada: {csv_path} ({len(labels)} requests)")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == 'show':
+        show_trace(sys.argv[2])
+    elif len(sys.argv) > 3 and sys.argv[1] == 'import-csv':
+        import_csv(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) > 3 and sys.argv[1] == 'export-csv':
+        export_csv(sys.argv[2], sys.argv[3])
+    else:
+        print("Uso:")
+        print("  python scripts/trace_tool.py show <traza>")
+        print("  python scripts/trace_tool.py import-csv <captura.csv> <traza>")
+        print("  python scripts/trace_tool.py export-csv <traza> <salida.csv>")
@@ -32,6 +32,14 @@ class CacheSystem:
         print(f"[{datetime.now().strftime('%H:%M:%S')}] CACHE MISS para key: {key}")
         return None
 
+    def contains(self, key: str) -> bool:
+        # EXISTS no cuenta como acceso: no cambia el orden de LRU ni la frecuencia de LFU
+        try:
+            return bool(self.client.exists(key))
+        except Exception as e:
+            print(f"Error al consultar caché para key {key}: {e}")
+            return False
+
     def set(self, key: str, value: dict):
         try:
             json_value = json.dumps(value)
@@ -40,6 +48,19 @@ class CacheSystem:
         except Exception as e:
             print(f"Error al guardar en caché para key {key}: {e}")
 
+    def update(self, key: str, fields: dict) -> bool:
+        # Actualiza campos de una entrada existente sin reiniciar su TTL
+        try:
+            value = self.client.get(key)
+            if not value:
+                return False
+            updated_value = json.loads(value)
+            updated_value.update(fields)
+            return bool(self.client.set(key, json.dumps(updated_value), xx=True, keepttl=True))
+        except Exception as e:
+            print(f"Error al actualizar caché para key {key}: {e}")
+            return False
+
     def invalidate(self, key: str):
         self.client.delete(key)
         print(f"Elemento invalidado de caché para key: {key}")
@@ -0,0 +1,204 @@
+from config import settings
+from src.storage_backends import EVENT_COLUMNS
+import pandas as pd
+import threading
+import shutil
+import glob
+import time
+import os
+
+DATASETS = {
+    'results': 'query_results',
+    'request_events': 'request_events'
+}
+
+EVENT_COLUMN_TYPES = dict({column: 'REAL' for column in EVENT_COLUMNS},
+                          question_id='TEXT', model='TEXT', cache_tier='TEXT', hit='INTEGER', error='INTEGER')
+
+# request_count es una subconsulta de la vista y SQLite no le asigna tipo
+INTEGER_COLUMNS = {'request_count'}
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("La librería 'pyarrow' no está instalada. Ejecuta: pip install pyarrow")
+    return pa, ds, pq
+
+def experiment_name_from_db_path(db_path: str) -> str:
+    # Mismo nombre de experimento que usan compare_experiments.py y generate_latex_tables.py
+    return os.path.basename(db_path).replace('results_', '').replace('.db', '')
+
+def partition_path(root: str, dataset: str, experiment: str) -> str:
+    return os.path.join(root, dataset, f"experiment={experiment}")
+
+def _arrow_type(pa, column: str, declared_type: str):
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type or column in INTEGER_COLUMNS:
+        return pa.int64()
+    if any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB')):
+        return pa.float64()
+    return pa.string()
+
+def _arrow_schema(pa, column_types: dict):
+    # Esquema fijo a partir de los tipos declarados en SQLite, para que todos los bloques coincidan
+    return pa.schema([(column, _arrow_type(pa, column, declared_type)) for column, declared_type in column_types.items()])
+
+def export_store(store, root: str = settings.COLUMNAR_DIR, experiment: str = None, datasets=None,
+                 chunk_size: int = 50000, compression: str = settings.COLUMNAR_COMPRESSION) -> dict:
+    pa, ds, pq = _import_pyarrow()
+    experiment = experiment or experiment_name_from_db_path(store.db_path)
+    rows_written = {}
+
+    for dataset in datasets or list(DATASETS):
+        relation = DATASETS[dataset]
+        schema = _arrow_schema(pa, store.get_column_types(relation))
+        path = partition_path(root, dataset, experiment)
+        # La exportación reemplaza la partición completa del experimento
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+
+        rows = 0
+        with pq.ParquetWriter(os.path.join(path, 'part-0.parquet'), schema, compression=compression) as writer:
+            for chunk in store._iter_relation(relation, None, chunk_size):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+        rows_written[dataset] = rows
+        print(f"Exportadas {rows} filas de {relation} a {path}")
+    return rows_written
+
+class ColumnarSink:
+    def __init__(self, root: str = settings.COLUMNAR_DIR, experiment: str = None,
+                 flush_rows: int = settings.COLUMNAR_SINK_FLUSH_ROWS, compression: str = settings.COLUMNAR_COMPRESSION):
+        self.pa, _, self.pq = _import_pyarrow()
+        self.experiment = experiment or experiment_name_from_db_path(settings.SQLITE_DB_PATH)
+        self.path = partition_path(root, 'request_events', self.experiment)
+        self.flush_rows = flush_rows
+        self.compression = compression
+        self.schema = _arrow_schema(self.pa, EVENT_COLUMN_TYPES)
+        self.buffer = []
+        self.files_written = 0
+        self.rows_written = 0
+        self.lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        print(f"ColumnarSink inicializado: {self.path} (archivo cada {flush_rows} eventos)")
+
+    def write_events(self, events: list):
+        # Recibe tuplas en el orden de EVENT_COLUMNS, ya confirmadas en SQLite
+        with self.lock:
+            self.buffer.extend(events)
+            if len(self.buffer) >= self.flush_rows:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.buffer:
+            return
+        columns = list(zip(*self.buffer))
+        table = self.pa.table({name: self.pa.array(values, type=self.schema.field(name).type)
+                               for name, values in zip(EVENT_COLUMNS, columns)}, schema=self.schema)
+        # Nombre único por proceso para que varios generadores puedan escribir en la misma partición
+        filename = f"part-{int(time.time() * 1000)}-{os.getpid()}-{self.files_written}.parquet"
+        self.pq.write_table(table, os.path.join(self.path, filename), compression=self.compression)
+        self.files_written += 1
+        self.rows_written += len(self.buffer)
+        self.buffer = []
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+        print(f"ColumnarSink cerrado: {self.rows_written} eventos en {self.files_written} archivos")
+
+def _open_dataset(root: str, dataset: str):
+    pa, ds, pq = _import_pyarrow()
+    files = sorted(glob.glob(os.path.join(root, dataset, '*', '*.parquet')))
+    if not files:
+        return None
+    # Experimentos de distintas versiones del esquema pueden tener columnas distintas
+    partition_schema = pa.schema([('experiment', pa.string())])
+    schema = pa.unify_schemas([pq.read_schema(file) for file in files] + [partition_schema])
+    return ds.dataset(files, schema=schema, format='parquet', partition_base_dir=os.path.join(root, dataset),
+                      partitioning=ds.partitioning(partition_schema, flavor='hive'))
+
+def read_columnar(dataset: str = 'results', root: str = settings.COLUMNAR_DIR, columns: list = None,
+                  filters: list = None, experiments: list = None) -> pd.DataFrame:
+    _, ds, pq = _import_pyarrow()
+    parquet_dataset = _open_dataset(root, dataset)
+    if parquet_dataset is None:
+        return pd.DataFrame(columns=(columns or []) + ['experiment'])
+
+    # Solo se leen las columnas pedidas; las que no existen en ningún experimento quedan vacías
+    available = set(parquet_dataset.schema.names)
+    requested = None if columns is None else [column for column in columns if column in available]
+    if requested is not None and 'experiment' not in requested:
+        requested.append('experiment')
+
+    # Los filtros se evalúan en el escaneo: descartan particiones y grupos de filas sin cargarlos
+    expression = pq.filters_to_expression(filters) if filters else None
+    if experiments:
+        experiment_filter = ds.field('experiment').isin(experiments)
+        expression = experiment_filter if expression is None else expression & experiment_filter
+
+    df = parquet_dataset.to_table(columns=requested, filter=expression).to_pandas()
+    if columns is not None:
+        df = df.reindex(columns=list(dict.fromkeys(columns + ['experiment'])))
+    return df
+
+def summarize_request_events(root: str = settings.COLUMNAR_DIR, experiments: list = None) -> pd.DataFrame:
+    _, ds, _ = _import_pyarrow()
+    parquet_dataset = _open_dataset(root, 'request_events')
+    if parquet_dataset is None:
+        return pd.DataFrame(columns=['experiment', 'total_requests', 'cache_hits', 'errors'])
+
+    expression = ds.field('experiment').isin(experiments) if experiments else None
+    # La agregación corre en Arrow sobre dos columnas enteras, sin pasar los eventos a pandas
+    table = parquet_dataset.to_table(columns=['experiment', 'hit', 'error'], filter=expression)
+    summary = table.group_by('experiment').aggregate([('hit', 'count'), ('hit', 'sum'), ('error', 'sum')]).to_pandas()
+    return summary.rename(columns={'hit_count': 'total_requests', 'hit_sum': 'cache_hits', 'error_sum': 'errors'})
+
+
+if __name__ == "__main__":
+    print("--- Probando src/columnar_store.py ---")
+    import tempfile
+    from src.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = os.path.join(tmp_dir, 'columnar')
+        for experiment, hits in [('exp_a', 1), ('exp_b', 3)]:
+            sink = ColumnarSink(root=os.path.join(tmp_dir, 'sink'), experiment=experiment, flush_rows=2)
+            store = DataStore(os.path.join(tmp_dir, f"results_{experiment}.db"), sink=sink, db_type="SQLITE")
+            store.save_query_result({
+                "question_id": "q_1",
+                "question_title": "What is the capital of France?",
+                "original_best_answer": "Paris is the capital of France.",
+                "llm_generated_answer": "The capital of France is Paris.",
+                "quality_score": 0.9,
+                "prompt_tokens": 30
+            })
+            store.record_request_event("q_1", hit=False, latency_seconds=1.5)
+            for _ in range(hits):
+                store.record_request_event("q_1", hit=True, cache_tier="redis", latency_seconds=0.01)
+            store.flush()
+            print(f"Filas exportadas: {store.export_columnar(root=root)}")
+            store.close()
+
+        results = read_columnar('results', root=root, columns=['quality_score', 'request_count', 'missing_column'])
+        print(f"Resultados:\n{results}")
+        assert sorted(results['request_count'].tolist()) == [2, 4], "request_count por experimento no coincide."
+        assert results['missing_column'].isna().all(), "Una columna inexistente debería quedar vacía."
+        assert 'llm_generated_answer' not in results, "Solo se deberían leer las columnas pedidas."
+
+        hits = read_columnar('request_events', root=root, columns=['latency_seconds'], filters=[('hit', '=', 1)], experiments=['exp_b'])
+        assert len(hits) == 3 and (hits['experiment'] == 'exp_b').all(), "El filtro por hit y experimento no funciona."
+
+        for events_root in [root, os.path.join(tmp_dir, 'sink')]:
+            summary = summarize_request_events(root=events_root).sort_values('experiment')
+            print(f"Resumen de eventos ({events_root}):\n{summary}")
+            assert summary['total_requests'].tolist() == [2, 4] and summary['cache_hits'].tolist() == [1, 3], "El resumen de eventos no coincide."
+
+    print("Pruebas de columnar_store completadas exitosamente.")
@@ -1,115 +1,358 @@
-import sqlite3
 import pandas as pd
 from config import settings
+from src.storage_backends import create_backend, REQUEST_STAGES, EVENT_LATENCY_COLUMNS, DEFAULT_MODEL
+from collections import Counter
+import threading
+import atexit
+import queue
+import math
+import time
 import os
+import json
 from datetime import datetime
 
+WRITE_OPS = ('save', 'score', 'event')
+
 class DataStore:
-    def __init__(self, db_path=settings.SQLITE_DB_PATH):
+    def __init__(self, db_path=settings.SQLITE_DB_PATH, write_behind=settings.DB_WRITE_BEHIND,
+                 batch_size=settings.DB_WRITE_BATCH_SIZE, flush_interval=settings.DB_WRITE_FLUSH_INTERVAL, sink=None,
+                 db_type=settings.DB_TYPE, backend=None, migrate_legacy=False):
         self.db_path = db_path
-        self._ensure_data_directory_exists()
-        self._create_table_if_not_exists()
-        print(f"DataStore inicializado con base de datos: {self.db_path}")
-
-    def _ensure_data_directory_exists(self):
-        data_dir = os.path.dirname(self.db_path)
-        if data_dir and not os.path.exists(data_dir):
-            os.makedirs(data_dir)
-
-    def _get_connection(self):
-        return sqlite3.connect(self.db_path)
-
-    def _create_table_if_not_exists(self):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS query_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                question_id TEXT NOT NULL,
-                question_title TEXT,
-                question_content TEXT,
-                original_best_answer TEXT,
-                llm_generated_answer TEXT,
-                quality_score REAL,
-                request_count INTEGER DEFAULT 1,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(question_id) ON CONFLICT REPLACE
-            );
-        """)
-        conn.commit()
-        conn.close()
+        # SQLite o PostgreSQL; el DataStore solo usa SQL común a ambos y lo específico queda en el backend
+        self.backend = backend or create_backend(db_type, db_path, migrate_legacy=migrate_legacy)
+        # Sink columnar opcional que recibe los eventos ya confirmados en la base de datos
+        self.sink = sink
 
-    def save_query_result(self, result: dict):
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.closed = False
+        self.stats_lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+        self.pending_question_ids = Counter()
+        self.write_stats = {'writes': 0, 'batches': 0, 'max_batch_size': 0, 'commit_seconds': 0.0, 'errors': 0}
+        self.write_queue = None
+        self.writer = None
+        if write_behind:
+            self.write_queue = queue.Queue()
+            self.writer = threading.Thread(target=self._writer_loop, name="DataStoreWriter", daemon=True)
+            self.writer.start()
+            atexit.register(self.close)
+        print(f"DataStore inicializado con base de datos {self.backend.name}: {self.backend.description}")
 
+    def save_query_result(self, result: dict, ts: float = None):
         question_id = result.get('question_id')
-        current_timestamp = datetime.now().isoformat()
-
-        # Primero, intenta ver si ya existe esta question_id
-        cursor.execute("SELECT request_count FROM query_results WHERE question_id = ?", (question_id,))
-        existing_record = cursor.fetchone()
-
-        if existing_record:
-            # Si existe, actualiza el request_count y los otros campos
-            new_request_count = existing_record[0] + 1
-            cursor.execute("""
-                UPDATE query_results
-                SET
-                    question_title = ?,
-                    question_content = ?,
-                    original_best_answer = ?,
-                    llm_generated_answer = ?,
-                    quality_score = ?,
-                    request_count = ?,
-                    timestamp = ?
-                WHERE question_id = ?;
-            """, (
-                result.get('question_title'),
-                result.get('question_content'),
-                result.get('original_best_answer'),
-                result.get('llm_generated_answer'),
-                result.get('quality_score'),
-                new_request_count,
-                current_timestamp,
-                question_id
-            ))
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Resultado actualizado para Q_ID: {question_id}. Contador: {new_request_count}")
+        # ts permite fechar la respuesta en otro reloj (el virtual de la simulación)
+        current_timestamp = (datetime.fromtimestamp(ts) if ts is not None else datetime.now()).isoformat()
+        self._write(('save', question_id, (dict(result), current_timestamp)))
+
+    def _apply_save(self, cursor, result: dict, current_timestamp: str):
+        question_id = result.get('question_id')
+        model = result.get('model') or DEFAULT_MODEL
+
+        self._execute(cursor, """
+            INSERT INTO questions (question_id, question_title, question_content, original_best_answer)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(question_id) DO UPDATE SET
+                question_title = excluded.question_title,
+                question_content = excluded.question_content,
+                original_best_answer = excluded.original_best_answer;
+        """, (
+            question_id,
+            result.get('question_title'),
+            result.get('question_content'),
+            result.get('original_best_answer')
+        ))
+
+        # Una respuesta por pregunta y modelo; volver a generarla la reemplaza sin cambiar su id
+        self._execute(cursor, """
+            INSERT INTO answers (
+                question_id, model, llm_generated_answer, quality_score, timestamp,
+                prompt_tokens, completion_tokens, llm_latency_seconds,
+                llm_retries, rate_limit_wait_seconds, metric_scores
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(question_id, model) DO UPDATE SET
+                llm_generated_answer = excluded.llm_generated_answer,
+                quality_score = excluded.quality_score,
+                timestamp = excluded.timestamp,
+                prompt_tokens = excluded.prompt_tokens,
+                completion_tokens = excluded.completion_tokens,
+                llm_latency_seconds = excluded.llm_latency_seconds,
+                llm_retries = excluded.llm_retries,
+                rate_limit_wait_seconds = excluded.rate_limit_wait_seconds,
+                metric_scores = excluded.metric_scores;
+        """, (
+            question_id,
+            model,
+            result.get('llm_generated_answer'),
+            result.get('quality_score'),
+            current_timestamp,
+            result.get('prompt_tokens'),
+            result.get('completion_tokens'),
+            result.get('llm_latency_seconds'),
+            result.get('llm_retries'),
+            result.get('rate_limit_wait_seconds'),
+            self._serialize_metric_scores(result.get('metric_scores'))
+        ))
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Resultado guardado para Q_ID: {question_id} (modelo: {model})")
+
+    def _execute(self, cursor, statement: str, params=()):
+        # Las consultas se escriben con '?' y el backend las adapta a su estilo de parámetros
+        cursor.execute(self.backend.sql(statement), params)
+        return cursor
+
+    def _read_dataframe(self, statement: str, params=()) -> pd.DataFrame:
+        with self.backend.connection() as conn:
+            cursor = self._execute(conn.cursor(), statement, params)
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+    def _serialize_metric_scores(self, metric_scores):
+        # Al releer una fila de la DB las métricas ya vienen serializadas
+        if metric_scores is None or isinstance(metric_scores, str):
+            return metric_scores
+        return json.dumps(metric_scores)
+
+    def update_quality_score(self, question_id: str, quality_score: float, metric_scores: dict = None, model: str = None):
+        self._write(('score', question_id, (quality_score, self._serialize_metric_scores(metric_scores), model)))
+
+    def record_request_event(self, question_id: str, hit: bool, model: str = None, cache_tier: str = None,
+                             error: bool = False, latency_seconds: float = None, stage_seconds: dict = None,
+                             ts: float = None):
+        stage_seconds = stage_seconds or {}
+        event = (
+            ts if ts is not None else time.time(),
+            question_id,
+            model,
+            int(hit),
+            cache_tier,
+            int(error),
+            latency_seconds
+        ) + tuple(stage_seconds.get(stage) for stage in REQUEST_STAGES)
+        self._write(('event', question_id, event))
+
+    def increment_request_count(self, question_id: str, model: str = None):
+        # request_count ya no es un contador mutable: cada hit es un evento más en request_events
+        self.record_request_event(question_id, hit=True, model=model)
+
+    def _apply_operation(self, cursor, operation: tuple):
+        kind, question_id, payload = operation
+        if kind == 'save':
+            self._apply_save(cursor, *payload)
         else:
-            # Si no existe, inserta un nuevo registro
-            cursor.execute("""
-                INSERT INTO query_results (
-                    question_id, question_title, question_content,
-                    original_best_answer, llm_generated_answer,
-                    quality_score, request_count, timestamp
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?);
-            """, (
-                question_id,
-                result.get('question_title'),
-                result.get('question_content'),
-                result.get('original_best_answer'),
-                result.get('llm_generated_answer'),
-                result.get('quality_score'),
-                1, 
-                current_timestamp
-            ))
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Nuevo resultado guardado para Q_ID: {question_id}")
+            quality_score, metric_scores, model = payload
+            self._execute(cursor, """
+                UPDATE answers SET quality_score = ?, metric_scores = COALESCE(?, metric_scores)
+                WHERE question_id = ? AND (? IS NULL OR model = ?);
+            """, (quality_score, metric_scores, question_id, model, model))
 
-        conn.commit()
-        conn.close()
+    def _write(self, operation: tuple):
+        if not self.write_behind:
+            self._commit_batch([operation])
+            return
+        if self.closed:
+            raise RuntimeError(f"El DataStore de {self.backend.description} ya fue cerrado.")
+        with self.pending_lock:
+            self.pending_question_ids[operation[1]] += 1
+        self.write_queue.put(operation)
 
-    def get_all_results(self) -> pd.DataFrame:
-        conn = self._get_connection()
-        df = pd.read_sql_query("SELECT * FROM query_results;", conn)
-        conn.close()
-        return df
+    def _writer_loop(self):
+        running = True
+        while running:
+            batch = [self.write_queue.get()]
+            deadline = time.time() + self.flush_interval
+            # Agrupa escrituras hasta llenar el lote o cumplir el intervalo; un flush o cierre corta la espera
+            while batch[-1][0] in WRITE_OPS and len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.write_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            writes = [operation for operation in batch if operation[0] in WRITE_OPS]
+            if writes:
+                self._commit_batch(writes)
+                with self.pending_lock:
+                    for operation in writes:
+                        self.pending_question_ids[operation[1]] -= 1
+                        if self.pending_question_ids[operation[1]] <= 0:
+                            del self.pending_question_ids[operation[1]]
+
+            for kind, _, event in (operation for operation in batch if operation[0] not in WRITE_OPS):
+                event.set()
+                if kind == 'stop':
+                    running = False
+
+    def _commit_batch(self, operations: list):
+        start_time = time.time()
+        with self.backend.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self.backend.lock_for_write(cursor)
+                # Orden estable por question_id: las filas se bloquean siempre en el mismo orden entre procesos
+                for operation in sorted((operation for operation in operations if operation[0] != 'event'),
+                                        key=lambda operation: operation[1] or ''):
+                    self._apply_operation(cursor, operation)
+                # Los eventos del lote se insertan juntos (executemany en SQLite, COPY en PostgreSQL)
+                events = [operation[2] for operation in operations if operation[0] == 'event']
+                if events:
+                    self.backend.insert_events(cursor, events)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                with self.stats_lock:
+                    self.write_stats['errors'] += 1
+                print(f"Error guardando un lote de {len(operations)} escrituras en la DB: {e}")
+                return
+        if events and self.sink is not None:
+            self.sink.write_events(events)
+        with self.stats_lock:
+            self.write_stats['writes'] += len(operations)
+            self.write_stats['batches'] += 1
+            self.write_stats['max_batch_size'] = max(self.write_stats['max_batch_size'], len(operations))
+            self.write_stats['commit_seconds'] += time.time() - start_time
+
+    def flush(self):
+        # Espera a que el escritor confirme todo lo encolado hasta ahora
+        if not self.write_behind or self.closed:
+            return
+        done = threading.Event()
+        self.write_queue.put(('flush', None, done))
+        done.wait()
+
+    def _flush_if_pending(self, question_id: str):
+        with self.pending_lock:
+            pending = question_id in self.pending_question_ids
+        if pending:
+            self.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        if self.write_behind:
+            self.flush()
+            self.closed = True
+            done = threading.Event()
+            self.write_queue.put(('stop', None, done))
+            done.wait()
+            self.writer.join()
+            atexit.unregister(self.close)
+        self.closed = True
+        if self.sink is not None:
+            self.sink.close()
+        self.backend.close()
+
+    def export_columnar(self, root: str = settings.COLUMNAR_DIR, experiment: str = None, datasets=None) -> dict:
+        from src.columnar_store import export_store
+        return export_store(self, root=root, experiment=experiment, datasets=datasets)
+
+    def get_write_stats(self) -> dict:
+        with self.stats_lock:
+            stats = dict(self.write_stats)
+        stats['queue_depth'] = self.write_queue.qsize() if self.write_queue is not None else 0
+        stats['avg_batch_size'] = stats['writes'] / max(1, stats['batches'])
+        return stats
+
+    def ensure_column(self, column: str, column_type: str = 'REAL'):
+        self.flush()
+        self.backend.add_column(column, column_type)
+
+    def _iter_relation(self, relation: str, columns: list, chunk_size: int):
+        self.flush()
+        # Paginación por id: cada bloque es una consulta corta y estable aunque se escriba entre bloques
+        if columns is None:
+            select_columns = '*'
+        else:
+            select_columns = ', '.join(['id'] + [column for column in columns if column != 'id'])
+        last_id = -1
+        while True:
+            chunk = self._read_dataframe(
+                f"SELECT {select_columns} FROM {relation} WHERE id > ? ORDER BY id LIMIT ?;",
+                (last_id, chunk_size)
+            )
+            if chunk.empty:
+                return
+            last_id = int(chunk['id'].iloc[-1])
+            yield chunk
+
+    def iter_results(self, columns: list = None, chunk_size: int = 10000):
+        return self._iter_relation('query_results', columns, chunk_size)
+
+    def iter_request_events(self, columns: list = None, chunk_size: int = 10000):
+        return self._iter_relation('request_events', columns, chunk_size)
+
+    def get_column_types(self, relation: str) -> dict:
+        return self.backend.get_column_types(relation)
+
+    def update_scores(self, scores: list, column: str = 'quality_score', scorer_version: str = None):
+        self.flush()
+        # Escribe muchos scores (id, score) en una sola transacción
+        with self.backend.connection() as conn:
+            cursor = conn.cursor()
+            if scorer_version is None:
+                self.backend.executemany(cursor, f"UPDATE answers SET {column} = ? WHERE id = ?;",
+                                         [(score, row_id) for row_id, score in scores])
+            else:
+                self.backend.executemany(cursor, f"UPDATE answers SET {column} = ?, scorer_version = ? WHERE id = ?;",
+                                         [(score, scorer_version, row_id) for row_id, score in scores])
+            conn.commit()
+
+    def get_all_results(self, columns: list = None, chunk_size: int = 10000):
+        # Iterador de DataFrames por bloques; pedir solo las columnas necesarias evita cargar los textos largos
+        return self.iter_results(columns, chunk_size)
+
+    def stats(self) -> dict:
+        self.flush()
+        with self.backend.connection() as conn:
+            cursor = conn.cursor()
+            # store_stats tiene una fila en SQLite y una por shard en PostgreSQL
+            questions, answers, scored_answers, quality_score_sum, requests, cache_hits, errors = self._execute(cursor, """
+                SELECT CAST(SUM(questions) AS BIGINT), CAST(SUM(answers) AS BIGINT), CAST(SUM(scored_answers) AS BIGINT),
+                       SUM(quality_score_sum), CAST(SUM(requests) AS BIGINT), CAST(SUM(cache_hits) AS BIGINT),
+                       CAST(SUM(errors) AS BIGINT)
+                FROM store_stats;
+            """).fetchone()
+            # MIN y MAX por separado para que cada uno sea una sola búsqueda en idx_answers_quality_score
+            min_quality_score = self._execute(cursor, "SELECT MIN(quality_score) FROM answers;").fetchone()[0]
+            max_quality_score = self._execute(cursor, "SELECT MAX(quality_score) FROM answers;").fetchone()[0]
+        return {
+            'questions': questions,
+            'answers': answers,
+            'scored_answers': scored_answers,
+            'request_count': requests,
+            'cache_hits': cache_hits,
+            'cache_misses': requests - cache_hits,
+            'errors': errors,
+            'hit_rate': cache_hits / requests * 100 if requests else 0.0,
+            'avg_quality_score': quality_score_sum / scored_answers if scored_answers else None,
+            'min_quality_score': min_quality_score,
+            'max_quality_score': max_quality_score
+        }
+
+    def save_metadata(self, metadata: dict):
+        # Se escribe de inmediato (fuera de la cola): son pocas filas al inicio del experimento
+        with self.backend.connection() as conn:
+            cursor = conn.cursor()
+            self.backend.executemany(cursor, """
+                INSERT INTO experiment_metadata (name, value) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET value = excluded.value;
+            """, [(name, json.dumps(value)) for name, value in metadata.items()])
+            conn.commit()
+
+    def get_metadata(self) -> dict:
+        with self.backend.connection() as conn:
+            rows = self._execute(conn.cursor(), "SELECT name, value FROM experiment_metadata;").fetchall()
+        return {name: json.loads(value) for name, value in rows}
 
     def get_result_by_question_id(self, question_id: str) -> dict:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM query_results WHERE question_id = ?", (question_id,))
-        row = cursor.fetchone()
-        conn.close()
+        # Solo hace falta esperar al escritor si esta pregunta tiene escrituras encoladas
+        self._flush_if_pending(question_id)
+        with self.backend.connection() as conn:
+            cursor = self._execute(conn.cursor(), "SELECT * FROM query_results WHERE question_id = ? ORDER BY timestamp DESC LIMIT 1;", (question_id,))
+            row = cursor.fetchone()
 
         if row:
             # Obtener nombres de columnas para crear un diccionario
@@ -117,15 +360,54 @@ class DataStore:
             return dict(zip(col_names, row))
         return None
 
+    def hit_rate_over_time(self, bucket_seconds: float = 60) -> pd.DataFrame:
+        self.flush()
+        # Se resuelve solo con el índice (ts, hit), sin leer las filas de request_events
+        df = self._read_dataframe(f"""
+            SELECT {self.backend.TIME_BUCKET_SQL} AS bucket_start, COUNT(*) AS requests, SUM(hit) AS hits
+            FROM request_events
+            WHERE ts IS NOT NULL
+            GROUP BY 1
+            ORDER BY 1;
+        """, (bucket_seconds, bucket_seconds))
+        df['bucket_start'] = pd.to_datetime(df['bucket_start'], unit='s')
+        df['hit_rate'] = df['hits'] / df['requests'] * 100
+        return df
+
+    def latency_percentiles(self, percentiles=(50, 90, 99), column: str = 'latency_seconds', hit: bool = None) -> dict:
+        if column not in EVENT_LATENCY_COLUMNS:
+            raise ValueError(f"Columna de latencia no soportada: {column}. Disponibles: {', '.join(EVENT_LATENCY_COLUMNS)}")
+        self.flush()
+        where = f"{column} IS NOT NULL" + (" AND hit = ?" if hit is not None else "")
+        params = (int(hit),) if hit is not None else ()
+        with self.backend.connection() as conn:
+            cursor = conn.cursor()
+            count = self._execute(cursor, f"SELECT COUNT(*) FROM request_events WHERE {where};", params).fetchone()[0]
+            if count == 0:
+                return {percentile: None for percentile in percentiles}
+            # Percentil por rango más cercano, leído en orden desde el índice de latencia
+            values = {}
+            for percentile in percentiles:
+                offset = min(count - 1, max(0, math.ceil(percentile / 100 * count) - 1))
+                values[percentile] = self._execute(
+                    cursor,
+                    f"SELECT {column} FROM request_events WHERE {where} ORDER BY {column} LIMIT 1 OFFSET ?;",
+                    params + (offset,)
+                ).fetchone()[0]
+        return values
+
 if __name__ == "__main__":
     print("--- Probando src/data_store.py ---")
-    store = DataStore()
+    store = DataStore(db_type="SQLITE")
 
-    # Eliminar el archivo de la DB para un test limpio
+    # Eliminar el archivo de la DB (y los archivos del WAL) para un test limpio
     if os.path.exists(settings.SQLITE_DB_PATH):
-        os.remove(settings.SQLITE_DB_PATH)
+        store.close()
+        for suffix in ['', '-wal', '-shm']:
+            if os.path.exists(settings.SQLITE_DB_PATH + suffix):
+                os.remove(settings.SQLITE_DB_PATH + suffix)
         print(f"Archivo de DB '{settings.SQLITE_DB_PATH}' eliminado para una prueba limpia.")
-        store = DataStore() # Reiniciar para crear la tabla de nuevo
+        store = DataStore(db_type="SQLITE") # Reiniciar para crear la tabla de nuevo
 
     # Prueba de guardar un nuevo resultado
     new_result = {
@@ -134,9 +416,15 @@ if __name__ == "__main__":
         "question_content": "I need to know for my geography class.",
         "original_best_answer": "Paris is the capital of France.",
         "llm_generated_answer": "The capital of France is Paris.",
-        "quality_score": 0.95
+        "quality_score": 0.95,
+        "prompt_tokens": 32,
+        "completion_tokens": 9,
+        "llm_latency_seconds": 1.25,
+        "llm_retries": 0,
+        "rate_limit_wait_seconds": 0.0
     }
     store.save_query_result(new_result)
+    store.record_request_event("q_test_001", hit=False, latency_seconds=1.4, stage_seconds={'llm': 1.25, 'scoring': 0.01}, ts=960.0)
 
     # Prueba de actualizar un resultado existente 
     updated_result = {
@@ -148,6 +436,7 @@ if __name__ == "__main__":
         "quality_score": 0.98 # Mejor score
     }
     store.save_query_result(updated_result)
+    store.record_request_event("q_test_001", hit=False, latency_seconds=1.2, ts=970.0)
 
     # Prueba de guardar otro nuevo resultado
     new_result_2 = {
@@ -159,12 +448,72 @@ if __name__ == "__main__":
         "quality_score": 0.88
     }
     store.save_query_result(new_result_2)
+    store.record_request_event("q_test_002", hit=False, latency_seconds=0.9, ts=980.0)
+    store.record_request_event("q_test_002", hit=True, cache_tier="redis", latency_seconds=0.002, ts=1030.0)
+    store.increment_request_count("q_test_002")
 
     print("\nTodos los resultados almacenados:")
-    all_results_df = store.get_all_results()
+    all_results_df = pd.concat(store.get_all_results(chunk_size=1), ignore_index=True)
     print(all_results_df)
 
     print(f"\nNúmero de registros en la DB: {len(all_results_df)}")
     assert len(all_results_df) == 2, "Debería haber 2 registros únicos."
     assert all_results_df[all_results_df['question_id'] == 'q_test_001']['request_count'].iloc[0] == 2, "request_count debería ser 2."
+    assert all_results_df[all_results_df['question_id'] == 'q_test_002']['request_count'].iloc[0] == 3, "request_count debería ser 3 tras dos hits."
+    assert all_results_df[all_results_df['question_id'] == 'q_test_001']['id'].iloc[0] == 1, "El UPSERT no debería cambiar el id de una fila existente."
+    assert all_results_df[all_results_df['question_id'] == 'q_test_001']['question_title'].iloc[0].endswith("(Updated)"), "La pregunta debería actualizarse."
+
+    hit_rate = store.hit_rate_over_time(bucket_seconds=60)
+    print(f"\nHit rate por minuto:\n{hit_rate}")
+    # El hit de increment_request_count cae en el minuto actual
+    assert hit_rate['requests'].tolist() == [3, 1, 1] and hit_rate['hits'].tolist() == [0, 1, 1], "El hit rate por minuto no es el esperado."
+
+    percentiles = store.latency_percentiles((50, 100))
+    print(f"Percentiles de latencia: {percentiles}")
+    assert percentiles == {50: 0.9, 100: 1.4}, "Los percentiles de latencia no son los esperados."
+    assert store.latency_percentiles((50,), hit=True) == {50: 0.002}, "El percentil de los hits no es el esperado."
+    assert store.latency_percentiles((50,), column='llm_seconds') == {50: 1.25}, "El percentil de la etapa llm no es el esperado."
+
+    # Una lectura de una pregunta con escrituras encoladas debe ver el último valor
+    store.update_quality_score("q_test_002", 0.5, {"tfidf_cosine": 0.5})
+    assert store.get_result_by_question_id("q_test_002")['quality_score'] == 0.5, "La lectura debería ver el score encolado."
+
+    store_stats = store.stats()
+    print(f"Estadísticas: {store_stats}")
+    assert store_stats['answers'] == 2 and store_stats['request_count'] == all_results_df['request_count'].sum(), "Los conteos de stats() no coinciden."
+    assert store_stats['cache_hits'] == 2 and store_stats['max_quality_score'] == 0.98, "Los agregados de stats() no coinciden."
+    assert abs(store_stats['avg_quality_score'] - (0.98 + 0.5) / 2) < 1e-9, "El score medio debería seguir a update_quality_score."
+
+    write_stats = store.get_write_stats()
+    print(f"Escrituras: {write_stats['writes']} en {write_stats['batches']} lotes")
+    assert write_stats['writes'] == 9 and write_stats['queue_depth'] == 0, "Todas las escrituras deberían estar confirmadas."
+    store.close()
+
+    # Una base con el esquema anterior se rechaza sin tocar el archivo; solo se migra si se pide explícitamente
+    import sqlite3
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = os.path.join(tmp_dir, 'results_legacy.db')
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("""
+            CREATE TABLE query_results (id INTEGER PRIMARY KEY AUTOINCREMENT, question_id TEXT NOT NULL, question_title TEXT,
+                question_content TEXT, original_best_answer TEXT, llm_generated_answer TEXT, quality_score REAL,
+                request_count INTEGER DEFAULT 1, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP);
+        """)
+        conn.execute("INSERT INTO query_results (question_id, question_title, quality_score, request_count) VALUES ('q_1', 'Título', 0.7, 3);")
+        conn.commit()
+        conn.close()
+        with open(legacy_path, 'rb') as f:
+            legacy_bytes = f.read()
+        try:
+            DataStore(legacy_path, write_behind=False, db_type="SQLITE")
+            raise AssertionError("Una base con el esquema anterior debería rechazarse al abrirla.")
+        except ValueError as e:
+            print(f"\nEsquema anterior rechazado: {e}")
+            assert 'migrate_schema.py' in str(e), "El error debería indicar cómo migrar."
+        with open(legacy_path, 'rb') as f:
+            assert f.read() == legacy_bytes and not os.path.exists(legacy_path + '-wal'), "Rechazar la base no debería modificarla."
+        legacy_store = DataStore(legacy_path, write_behind=False, db_type="SQLITE", migrate_legacy=True)
+        assert legacy_store.get_result_by_question_id('q_1')['request_count'] == 3, "La migración explícita debería conservar request_count."
+        legacy_store.close()
     print("Pruebas de DataStore pasadas exitosamente.")
@@ -0,0 +1,226 @@
+from config import settings
+import pandas as pd
+import numpy as np
+import hashlib
+import shutil
+import json
+import os
+from datetime import datetime
+
+TEXT_COLUMNS = ['title', 'content', 'best_answer']
+OFFSET_DTYPE = np.int64
+LABEL_DTYPE = np.int64
+CLASS_DTYPE = np.int16
+FORMAT_VERSION = 2
+
+def _memmap(path: str, dtype, length: int) -> np.ndarray:
+    if length == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(length,))
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def text_digest(values: pd.Series) -> str:
+    # Huella del contenido de una columna de texto: la misma para el CSV leído con pandas y para el caché columnar
+    digest = hashlib.sha1()
+    digest.update(str(len(values)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(values, index=False).values.tobytes())
+    return digest.hexdigest()
+
+class TextColumn:
+    # Columna de texto como offsets + blob UTF-8; cada fila se decodifica solo cuando se pide
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray, fingerprint: str = None):
+        self.offsets = offsets
+        self.blob = blob
+        # Identifica el contenido sin leer el blob: text_digest calculado al construir el caché
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return self.blob[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+class _RowIndexer:
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __getitem__(self, position: int) -> pd.Series:
+        return self.dataset.row(position)
+
+class ColumnarDataset:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.n_rows = self.meta['n_rows']
+
+        # Todo queda mapeado en disco: el sistema operativo pagina solo las filas que se muestrean
+        self.index = _memmap(os.path.join(path, 'labels.bin'), LABEL_DTYPE, self.n_rows)
+        self.class_index = _memmap(os.path.join(path, 'class_index.bin'), CLASS_DTYPE, self.n_rows)
+        self.text_columns = {
+            column: TextColumn(
+                _memmap(os.path.join(path, f"{column}.offsets.bin"), OFFSET_DTYPE, self.n_rows + 1),
+                _memmap(os.path.join(path, f"{column}.blob.bin"), np.uint8, self.meta['blob_sizes'][column]),
+                fingerprint=self.meta['text_digests'][column]
+            )
+            for column in TEXT_COLUMNS
+        }
+        self.columns = ['class_index'] + TEXT_COLUMNS
+        self.iloc = _RowIndexer(self)
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    @property
+    def empty(self) -> bool:
+        return self.n_rows == 0
+
+    def __getitem__(self, column: str):
+        if column == 'class_index':
+            return pd.Series(self.class_index, copy=False)
+        return self.text_columns[column]
+
+    def row(self, position: int) -> pd.Series:
+        values = {'class_index': int(self.class_index[position])}
+        values.update({column: self.text_columns[column][position] for column in TEXT_COLUMNS})
+        return pd.Series(values, name=int(self.index[position]))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        data = {'class_index': np.asarray(self.class_index, dtype=int)}
+        data.update({column: list(self.text_columns[column]) for column in TEXT_COLUMNS})
+        return pd.DataFrame(data, index=np.asarray(self.index))
+
+def cache_path_for(source_path: str, cache_dir: str = settings.DATASET_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(source_path))[0])
+
+def build_dataset_cache(dataset: pd.DataFrame, source_path: str, path: str, chunk_size: int = 100000) -> str:
+    # Se escribe en un directorio temporal y se renombra al final: otro proceso nunca ve un caché a medias
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    np.asarray(dataset.index, dtype=LABEL_DTYPE).tofile(os.path.join(tmp_path, 'labels.bin'))
+    dataset['class_index'].to_numpy(dtype=CLASS_DTYPE).tofile(os.path.join(tmp_path, 'class_index.bin'))
+    blob_sizes = {}
+    text_digests = {}
+    for column in TEXT_COLUMNS:
+        size = 0
+        values = dataset[column].astype(str)
+        with open(os.path.join(tmp_path, f"{column}.blob.bin"), 'wb') as blob_file, \
+             open(os.path.join(tmp_path, f"{column}.offsets.bin"), 'wb') as offsets_file:
+            offsets_file.write(np.zeros(1, dtype=OFFSET_DTYPE).tobytes())
+            for start in range(0, len(values), chunk_size):
+                encoded = [value.encode('utf-8') for value in values.iloc[start:start + chunk_size]]
+                lengths = np.fromiter((len(value) for value in encoded), dtype=OFFSET_DTYPE, count=len(encoded))
+                offsets_file.write((np.cumsum(lengths) + size).tobytes())
+                blob_file.write(b''.join(encoded))
+                size += int(lengths.sum())
+        blob_sizes[column] = size
+        text_digests[column] = text_digest(values)
+
+    source_stat = os.stat(source_path)
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'source_path': os.path.abspath(source_path),
+        'source_size': source_stat.st_size,
+        'source_mtime_ns': source_stat.st_mtime_ns,
+        'source_sha256': file_sha256(source_path),
+        'n_rows': len(dataset),
+        'blob_sizes': blob_sizes,
+        'text_digests': text_digests,
+        'created_at': datetime.now().isoformat()
+    }
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Otro proceso terminó primero con el mismo CSV
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+def is_cache_valid(path: str, source_path: str) -> bool:
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    source_stat = os.stat(source_path)
+    if meta.get('format_version') != FORMAT_VERSION or meta['source_size'] != source_stat.st_size:
+        return False
+    if meta['source_mtime_ns'] == source_stat.st_mtime_ns:
+        return True
+    # Mismo tamaño pero otra fecha (copia, checkout): el hash decide si el contenido cambió
+    if file_sha256(source_path) != meta['source_sha256']:
+        return False
+    meta['source_mtime_ns'] = source_stat.st_mtime_ns
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return True
+
+def load_cached_dataset(source_path: str, read_csv, cache_dir: str = settings.DATASET_CACHE_DIR) -> ColumnarDataset:
+    path = cache_path_for(source_path, cache_dir)
+    if not is_cache_valid(path, source_path):
+        print(f"Construyendo caché columnar del dataset en {path}...")
+        dataset = read_csv(source_path)
+        if dataset is None:
+            return None
+        os.makedirs(cache_dir, exist_ok=True)
+        build_dataset_cache(dataset, source_path, path)
+    dataset = ColumnarDataset(path)
+    print(f"Dataset cargado desde caché columnar {path}. Filas: {len(dataset)}")
+    return dataset
+
+
+if __name__ == "__main__":
+    print("--- Probando src/dataset_cache.py ---")
+    import tempfile
+    import time
+    from src.utils import read_dataset_csv
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'test.csv')
+        pd.DataFrame([
+            [1, "¿Cuál es la capital de Francia?", "Pregunta de geografía", "París es la capital."],
+            [2, "Sin respuesta", "Contenido", None],
+            [4, "What is Python?", "Language question, with a comma", "A programming language 🐍"]
+        ]).to_csv(csv_path, header=False, index=False)
+        cache_dir = os.path.join(tmp_dir, 'cache')
+
+        expected = read_dataset_csv(csv_path)
+        dataset = load_cached_dataset(csv_path, read_dataset_csv, cache_dir)
+        assert len(dataset) == 2 and dataset.index.tolist() == [0, 2], "El caché debe respetar el dropna y las etiquetas."
+        row = dataset.iloc[1]
+        print(f"Fila materializada:\n{row}")
+        assert row.name == 2 and row['best_answer'] == "A programming language 🐍" and row['class_index'] == 4, "La fila no coincide con el CSV."
+        assert dataset.to_dataframe().equals(expected), "El caché no reproduce el DataFrame del CSV."
+        assert list(dataset['title']) == expected['title'].tolist(), "La columna de texto no coincide."
+        fingerprint = dataset['best_answer'].fingerprint
+        assert fingerprint == text_digest(expected['best_answer']) and fingerprint != dataset['title'].fingerprint, \
+            "La huella de la columna debe coincidir con la del CSV leído con pandas y distinguir columnas."
+
+        # Fecha de modificación distinta pero mismo contenido: se valida por hash sin reconstruir
+        os.utime(csv_path, (time.time() + 10, time.time() + 10))
+        assert is_cache_valid(cache_path_for(csv_path, cache_dir), csv_path), "Un touch no debería invalidar el caché."
+
+        with open(csv_path, 'a', encoding='utf-8') as f:
+            f.write('3,"Nueva pregunta","Contenido","Respuesta"\n')
+        assert not is_cache_valid(cache_path_for(csv_path, cache_dir), csv_path), "Un CSV modificado debe invalidar el caché."
+        rebuilt = load_cached_dataset(csv_path, read_dataset_csv, cache_dir)
+        assert len(rebuilt) == 3, "El caché debería reconstruirse."
+        assert rebuilt['best_answer'].fingerprint != fingerprint, "Un CSV modificado debe cambiar la huella de la columna."
+
+    print("Pruebas de dataset_cache completadas exitosamente.")
@@ -0,0 +1,195 @@
+import numpy as np
+import math
+
+# Rango y precisión por defecto: de 1µs a 1h con un error relativo máximo del 1% en cada percentil
+MIN_VALUE_SECONDS = 1e-6
+MAX_VALUE_SECONDS = 3600.0
+PRECISION = 0.01
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+# Histogramas por resultado (hit/miss) y por etapa, más la latencia de punta a punta
+LATENCY_OUTCOMES = ('hit', 'miss')
+END_TO_END = 'end_to_end'
+
+class LatencyHistogram:
+    # Buckets logarítmicos como en HDR: registrar es O(1), la memoria no depende del número de muestras y dos
+    # histogramas con los mismos parámetros se combinan sumando conteos (entre hilos, procesos o experimentos)
+    def __init__(self, min_value: float = MIN_VALUE_SECONDS, max_value: float = MAX_VALUE_SECONDS, precision: float = PRECISION):
+        self.min_value = min_value
+        self.max_value = max_value
+        self.precision = precision
+        # Cada bucket cubre [L, L * (1 + 2p)); su punto medio está a lo sumo a p de cualquier valor del bucket
+        self.log_growth = math.log1p(2 * precision)
+        # Bucket 0: valores <= min_value; el último junta los que superan max_value
+        self.num_buckets = int(math.ceil(math.log(max_value / min_value) / self.log_growth)) + 2
+        # Lista de Python: incrementar un entero es más barato que escribir en un array de numpy
+        self.counts = [0] * self.num_buckets
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return min(self.num_buckets - 1, int(math.log(value / self.min_value) / self.log_growth) + 1)
+
+    def _bucket_value(self, index: int) -> float:
+        if index == 0:
+            return self.min_value
+        lower = self.min_value * math.exp((index - 1) * self.log_growth)
+        return lower * (1 + self.precision)
+
+    def record(self, value: float):
+        if value is None:
+            return
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        if (other.min_value, other.max_value, other.precision) != (self.min_value, self.max_value, self.precision):
+            raise ValueError("Solo se pueden combinar histogramas con el mismo rango y precisión.")
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percentile: float) -> float:
+        if not self.count:
+            return None
+        # Rango más cercano, igual que DataStore.latency_percentiles
+        rank = min(self.count, max(1, math.ceil(percentile / 100 * self.count)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self.max, max(self.min, self._bucket_value(index)))
+
+    def percentiles(self, percentiles=DEFAULT_PERCENTILES) -> dict:
+        return {percentile: self.percentile(percentile) for percentile in percentiles}
+
+    def distribution(self, edges: list) -> list:
+        # Conteo de muestras entre bordes consecutivos (cada bucket cuenta por su valor representativo)
+        counts = [0] * (len(edges) - 1)
+        for index, count in enumerate(self.counts):
+            if count:
+                value = self._bucket_value(index)
+                for position in range(len(edges) - 1):
+                    if edges[position] <= value < edges[position + 1]:
+                        counts[position] += count
+                        break
+        return counts
+
+    def to_dict(self) -> dict:
+        # Formato JSON compacto: solo los buckets con muestras
+        nonzero = [index for index, count in enumerate(self.counts) if count]
+        return {
+            'min_value': self.min_value,
+            'max_value': self.max_value,
+            'precision': self.precision,
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max,
+            'buckets': {str(index): self.counts[index] for index in nonzero}
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LatencyHistogram':
+        histogram = cls(data['min_value'], data['max_value'], data['precision'])
+        for index, count in data['buckets'].items():
+            histogram.counts[int(index)] = count
+        histogram.count = data['count']
+        histogram.total = data['sum']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+def new_latency_histograms(stages) -> dict:
+    return {outcome: {name: LatencyHistogram() for name in (END_TO_END,) + tuple(stages)} for outcome in LATENCY_OUTCOMES}
+
+def merge_latency_histograms(target: dict, source: dict) -> dict:
+    for outcome, histograms in source.items():
+        for name, histogram in histograms.items():
+            target.setdefault(outcome, {}).setdefault(name, LatencyHistogram()).merge(histogram)
+    return target
+
+def end_to_end_histogram(histograms: dict) -> LatencyHistogram:
+    # Hits y misses juntos
+    histogram = LatencyHistogram()
+    for by_name in histograms.values():
+        if END_TO_END in by_name:
+            histogram.merge(by_name[END_TO_END])
+    return histogram
+
+def latency_histograms_to_dict(histograms: dict) -> dict:
+    return {outcome: {name: histogram.to_dict() for name, histogram in by_name.items() if histogram.count}
+            for outcome, by_name in histograms.items()}
+
+def latency_histograms_from_dict(data: dict) -> dict:
+    return {outcome: {name: LatencyHistogram.from_dict(histogram) for name, histogram in by_name.items()}
+            for outcome, by_name in data.items()}
+
+def print_latency_table(histograms: dict, percentiles=DEFAULT_PERCENTILES):
+    print("Latencia por etapa (ms):")
+    print(f"  {'Etapa':<14} {'Tipo':<5} {'n':>8} {'media':>9} " + " ".join(f"{f'p{percentile:g}':>9}" for percentile in percentiles))
+    names = list(dict.fromkeys(name for by_name in histograms.values() for name in by_name))
+    for name in names:
+        for outcome in LATENCY_OUTCOMES:
+            histogram = histograms.get(outcome, {}).get(name)
+            if histogram is None or not histogram.count:
+                continue
+            values = " ".join(f"{histogram.percentile(percentile) * 1000:>9.2f}" for percentile in percentiles)
+            print(f"  {name:<14} {outcome:<5} {histogram.count:>8} {histogram.mean * 1000:>9.2f} {values}")
+
+
+if __name__ == "__main__":
+    print("--- Probando src/latency_histogram.py ---")
+    import json
+    import time
+
+    rng = np.random.default_rng(42)
+    values = rng.lognormal(mean=np.log(0.2), sigma=1.0, size=200000)
+    histogram = LatencyHistogram()
+    start = time.perf_counter()
+    for value in values.tolist():
+        histogram.record(value)
+    elapsed = time.perf_counter() - start
+    print(f"{len(values)} muestras en {elapsed:.3f}s ({elapsed / len(values) * 1e9:.0f}ns por muestra), {histogram.num_buckets} buckets")
+
+    for percentile, value in histogram.percentiles().items():
+        exact = np.sort(values)[math.ceil(percentile / 100 * len(values)) - 1]
+        print(f"p{percentile}: {value * 1000:.3f}ms (exacto: {exact * 1000:.3f}ms)")
+        assert abs(value - exact) / exact <= PRECISION * 1.01, f"p{percentile} fuera de la precisión configurada."
+
+    # Combinar histogramas parciales equivale a registrar todas las muestras en uno
+    parts = [LatencyHistogram() for _ in range(4)]
+    for index, value in enumerate(values.tolist()):
+        parts[index % 4].record(value)
+    merged = LatencyHistogram()
+    for part in parts:
+        merged.merge(LatencyHistogram.from_dict(json.loads(json.dumps(part.to_dict()))))
+    assert merged.counts == histogram.counts and merged.count == histogram.count, "La combinación no coincide."
+    assert merged.percentiles() == histogram.percentiles() and merged.max == histogram.max, "Los percentiles combinados no coinciden."
+    assert sum(histogram.distribution([0, 0.1, 1, float('inf')])) == histogram.count, "La distribución debe cubrir todas las muestras."
+    by_stage = new_latency_histograms(['llm'])
+    by_stage['miss']['llm'].merge(histogram)
+    restored = merge_latency_histograms(new_latency_histograms(['llm']),
+                                        latency_histograms_from_dict(json.loads(json.dumps(latency_histograms_to_dict(by_stage)))))
+    assert restored['miss']['llm'].counts == histogram.counts and restored['hit'][END_TO_END].count == 0, "Los histogramas por etapa no coinciden."
+    print_latency_table(restored)
+    restored['hit'][END_TO_END].record(0.001)
+    restored['miss'][END_TO_END].record(2.0)
+    combined = end_to_end_histogram(restored)
+    assert combined.count == 2 and combined.min == 0.001 and combined.max == 2.0, "La latencia de punta a punta debe juntar hits y misses."
+    assert LatencyHistogram().percentile(99) is None, "Un histograma vacío no tiene percentiles."
+    print(f"Serializado: {len(json.dumps(histogram.to_dict()))} bytes")
+    print("Pruebas de latency_histogram completadas exitosamente.")
@@ -2,13 +2,19 @@ import google.generativeai as genai
 import ollama
 from config import settings
 import os
+import threading
 import time
 import random
 
+CALIBRATION_PROMPT = "Question: What is the capital of France?\n\nDetails: \n\nPlease provide a concise and helpful answer:"
+
 class LLMConnector:
-    def __init__(self):
+    def __init__(self, warmup=settings.LLM_WARMUP_ENABLED, warmup_prompts=settings.LLM_WARMUP_PROMPTS):
         self.provider = settings.LLM_PROVIDER.upper()
         self.model = None
+        model_names = {"GEMINI": settings.GEMINI_MODEL_NAME, "OLLAMA": settings.OLLAMA_MODEL_NAME, "GROQ": settings.GROQ_MODEL_NAME}
+        # Identifica las respuestas de este proveedor y modelo en la tabla answers
+        self.model_id = f"{self.provider.lower()}:{model_names.get(self.provider)}"
         self.max_retries = 5
         self.base_delay = 1
         self.max_delay = 30
@@ -16,8 +22,13 @@ class LLMConnector:
         self.min_request_interval = 3.0
         self.consecutive_errors = 0
         self.max_consecutive_errors = 3
+        # Con varios workers el intervalo mínimo entre requests se respeta entre todos ellos
+        self.rate_limit_lock = threading.Lock()
         self.groq_client = None
         self.ollama_client = None
+        self.warmup_seconds = 0.0
+        self.calibration_latencies = []
+        self.baseline_latency_seconds = None
 
         if self.provider == "GEMINI":
             api_key = settings.GEMINI_API_KEY
@@ -32,6 +43,7 @@ class LLMConnector:
             self.min_request_interval = 0 
             self.ollama_host = settings.OLLAMA_HOST
             self.ollama_model_name = settings.OLLAMA_MODEL_NAME
+            self.ollama_keep_alive = settings.OLLAMA_KEEP_ALIVE
             self.ollama_client = ollama.Client(host=self.ollama_host)
             try:
                 models = self.ollama_client.list()
@@ -63,24 +75,63 @@ class LLMConnector:
         else:
             raise ValueError(f"Proveedor de LLM '{self.provider}' no soportado. Usa 'GEMINI', 'OLLAMA' o 'GROQ'.")
 
-    def _wait_for_rate_limit(self):
+        if warmup:
+            self.warmup(warmup_prompts)
+
+    def warmup(self, num_prompts: int = 1):
+        # El tiempo de warm-up se registra aparte y no cuenta en las estadísticas de requests
+        warmup_start = time.time()
+        print(f"[Warm-up] Iniciando warm-up de {self.provider} con {num_prompts} prompt(s) de calibración...")
+
+        if self.provider == "OLLAMA":
+            try:
+                # Un prompt vacío carga el modelo en memoria sin generar texto
+                self.ollama_client.generate(model=self.ollama_model_name, prompt='', keep_alive=self.ollama_keep_alive)
+                print(f"[Warm-up] Modelo '{self.ollama_model_name}' precargado (keep_alive={self.ollama_keep_alive})")
+            except Exception as e:
+                print(f"[Warm-up] No se pudo precargar el modelo: {e}")
+
+        for i in range(num_prompts):
+            try:
+                self._wait_for_rate_limit()
+                call_start = time.time()
+                self._call_provider(CALIBRATION_PROMPT)
+                latency = time.time() - call_start
+                self.calibration_latencies.append(latency)
+                print(f"[Warm-up] Prompt de calibración {i + 1}/{num_prompts}: {latency:.2f}s")
+            except Exception as e:
+                print(f"[Warm-up] Error en prompt de calibración {i + 1}/{num_prompts}: {e}")
+
+        if self.calibration_latencies:
+            ordered = sorted(self.calibration_latencies)
+            self.baseline_latency_seconds = ordered[len(ordered) // 2]
+
+        self.warmup_seconds = time.time() - warmup_start
+        baseline = f"{self.baseline_latency_seconds:.2f}s" if self.baseline_latency_seconds is not None else "N/A"
+        print(f"[Warm-up] Completado en {self.warmup_seconds:.2f}s. Latencia base: {baseline}")
+        return self.baseline_latency_seconds
+
+    def _wait_for_rate_limit(self) -> float:
         if self.min_request_interval == 0:
-            return
+            return 0.0
+
+        wait_start = time.time()
+        with self.rate_limit_lock:
+            if self.consecutive_errors >= self.max_consecutive_errors:
+                extra_wait = 30
+                print(f"[Rate Limit] Detectados {self.consecutive_errors} errores consecutivos. Pausa extendida de {extra_wait}s...")
+                time.sleep(extra_wait)
+                self.consecutive_errors = 0
             
-        if self.consecutive_errors >= self.max_consecutive_errors:
-            extra_wait = 30
-            print(f"[Rate Limit] Detectados {self.consecutive_errors} errores consecutivos. Pausa extendida de {extra_wait}s...")
-            time.sleep(extra_wait)
-            self.consecutive_errors = 0
-        
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        
-        if time_since_last_request < self.min_request_interval:
-            sleep_time = self.min_request_interval - time_since_last_request
-            time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
+            current_time = time.time()
+            time_since_last_request = current_time - self.last_request_time
+            
+            if time_since_last_request < self.min_request_interval:
+                sleep_time = self.min_request_interval - time_since_last_request
+                time.sleep(sleep_time)
+            
+            self.last_request_time = time.time()
+        return self.last_request_time - wait_start
 
     def _handle_retry_with_backoff(self, attempt: int) -> float:
         delay = min(self.base_delay * (2.5 ** attempt), self.max_delay)
@@ -90,36 +141,101 @@ class LLMConnector:
         print(f"[Retry {attempt + 1}/{self.max_retries}] Esperando {final_delay:.2f}s antes de reintentar...")
         return final_delay
 
-    def generate_answer(self, question_title: str, question_content: str) -> str:
+    def _call_provider(self, prompt: str, cancel: threading.Event = None) -> tuple:
+        if self.provider == "OLLAMA" and cancel is not None:
+            # En streaming la generación se puede cortar entre fragmentos: cerrar la conexión detiene el modelo en Ollama
+            stream = self.ollama_client.chat(
+                model=self.ollama_model_name,
+                messages=[{'role': 'user', 'content': prompt}],
+                keep_alive=self.ollama_keep_alive,
+                stream=True
+            )
+            parts = []
+            response = None
+            for chunk in stream:
+                if cancel.is_set():
+                    stream.close()
+                    return None, None
+                parts.append(chunk['message']['content'])
+                response = chunk
+            # El último fragmento trae los conteos de tokens
+            return ''.join(parts).strip(), response
+
+        if self.provider == "GEMINI":
+            response = self.model.generate_content(prompt)
+            return response.text.strip(), response
+            
+        elif self.provider == "OLLAMA":
+            response = self.ollama_client.chat(
+                model=self.ollama_model_name,
+                messages=[{'role': 'user', 'content': prompt}],
+                keep_alive=self.ollama_keep_alive
+            )
+            return response['message']['content'].strip(), response
+            
+        elif self.provider == "GROQ":
+            response = self.groq_client.chat.completions.create(
+                model=self.groq_model_name,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                max_tokens=1024
+            )
+            return response.choices[0].message.content.strip(), response
+
+    def _extract_usage(self, response) -> tuple:
+        # Cada proveedor reporta el uso de tokens con nombres distintos
+        try:
+            if self.provider == "GEMINI":
+                usage = response.usage_metadata
+                return usage.prompt_token_count, usage.candidates_token_count
+            elif self.provider == "OLLAMA":
+                return response.get('prompt_eval_count'), response.get('eval_count')
+            elif self.provider == "GROQ":
+                return response.usage.prompt_tokens, response.usage.completion_tokens
+        except Exception as e:
+            print(f"Advertencia: No se pudo leer el uso de tokens de {self.provider}: {e}")
+        return None, None
+
+    def _build_result(self, answer: str, usage: tuple, llm_latency: float, retries: int, rate_limit_wait: float) -> dict:
+        prompt_tokens, completion_tokens = usage
+        return {
+            'answer': answer,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'llm_latency_seconds': round(llm_latency, 4),
+            'llm_retries': retries,
+            'rate_limit_wait_seconds': round(rate_limit_wait, 4)
+        }
+
+    def generate_answer(self, question_title: str, question_content: str, cancel: threading.Event = None) -> dict:
+        # cancel: llamadas de baja prioridad (prefetch) que se abandonan si llega un request real
         prompt = f"Question: {question_title}\n\nDetails: {question_content}\n\nPlease provide a concise and helpful answer:"
+        llm_latency = 0.0
+        rate_limit_wait = 0.0
+
+        def error_result(message: str, attempt: int) -> dict:
+            return self._build_result(message, (None, None), llm_latency, attempt, rate_limit_wait)
+
+        def cancelled_result(attempt: int) -> dict:
+            return dict(error_result("[Error: Llamada cancelada]", attempt), cancelled=True)
 
         for attempt in range(self.max_retries):
+            if cancel is not None and cancel.is_set():
+                return cancelled_result(attempt)
             try:
                 if self.provider in ["GEMINI", "GROQ"]:
-                    self._wait_for_rate_limit()
+                    rate_limit_wait += self._wait_for_rate_limit()
                 
-                if self.provider == "GEMINI":
-                    response = self.model.generate_content(prompt)
-                    self.consecutive_errors = 0
-                    return response.text.strip()
-                    
-                elif self.provider == "OLLAMA":
-                    response = self.ollama_client.chat(
-                        model=self.ollama_model_name,
-                        messages=[{'role': 'user', 'content': prompt}]
-                    )
-                    self.consecutive_errors = 0
-                    return response['message']['content'].strip()
-                    
-                elif self.provider == "GROQ":
-                    response = self.groq_client.chat.completions.create(
-                        model=self.groq_model_name,
-                        messages=[{"role": "user", "content": prompt}],
-                        temperature=0.7,
-                        max_tokens=1024
-                    )
-                    self.consecutive_errors = 0
-                    return response.choices[0].message.content.strip()
+                call_start = time.time()
+                try:
+                    answer, response = self._call_provider(prompt, cancel)
+                finally:
+                    llm_latency += time.time() - call_start
+                if answer is None:
+                    return cancelled_result(attempt)
+
+                self.consecutive_errors = 0
+                return self._build_result(answer, self._extract_usage(response), llm_latency, attempt, rate_limit_wait)
                     
             except Exception as e:
                 self.consecutive_errors += 1
@@ -132,7 +248,7 @@ class LLMConnector:
                         continue
                     else:
                         print(f"Error 429: Se alcanzó el límite de rate limit después de {self.max_retries} intentos.")
-                        return "[Error: Rate limit excedido - Por favor espera unos minutos e intenta de nuevo]"
+                        return error_result("[Error: Rate limit excedido - Por favor espera unos minutos e intenta de nuevo]", attempt)
                 
                 elif '500' in error_str or 'internal server error' in error_str:
                     if attempt < self.max_retries - 1:
@@ -140,7 +256,7 @@ class LLMConnector:
                         time.sleep(self.base_delay * (attempt + 1))
                         continue
                     else:
-                        return "[Error: Error del servidor - No se pudo generar respuesta]"
+                        return error_result("[Error: Error del servidor - No se pudo generar respuesta]", attempt)
                 
                 elif 'connection' in error_str or 'timeout' in error_str:
                     if attempt < self.max_retries - 1:
@@ -148,13 +264,13 @@ class LLMConnector:
                         time.sleep(self.base_delay)
                         continue
                     else:
-                        return "[Error: Error de conexión - Verifica tu conexión a internet]"
+                        return error_result("[Error: Error de conexión - Verifica tu conexión a internet]", attempt)
                 
                 else:
                     print(f"Error al generar respuesta con {self.provider}: {e}")
-                    return f"[Error: No se pudo generar respuesta - {str(e)}]"
+                    return error_result(f"[Error: No se pudo generar respuesta - {str(e)}]", attempt)
         
-        return "[Error: No se pudo generar respuesta después de múltiples intentos]"
+        return error_result("[Error: No se pudo generar respuesta después de múltiples intentos]", self.max_retries - 1)
 
 if __name__ == "__main__":
     print("--- Probando src/llm_connector.py ---")
@@ -166,10 +282,12 @@ if __name__ == "__main__":
         test_question_content = "I need to know for my geography class."
         
         print(f"\nGenerando respuesta para: '{test_question_title}'")
-        answer = llm.generate_answer(test_question_title, test_question_content)
-        print(f"Respuesta del LLM: {answer}")
+        result = llm.generate_answer(test_question_title, test_question_content)
+        print(f"Respuesta del LLM: {result['answer']}")
+        print(f"Tokens: prompt={result['prompt_tokens']}, completion={result['completion_tokens']}")
+        print(f"Latencia del modelo: {result['llm_latency_seconds']}s, Reintentos: {result['llm_retries']}, Espera rate limit: {result['rate_limit_wait_seconds']}s")
         
-        assert len(answer) > 0, "La respuesta no debería estar vacía."
+        assert len(result['answer']) > 0, "La respuesta no debería estar vacía."
         print("\nPrueba de LLMConnector completada exitosamente.")
     except Exception as e:
         print(f"\nError en la prueba: {e}")
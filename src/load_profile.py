@@ -0,0 +1,142 @@
+from config import settings
+import numpy as np
+
+LOAD_PROFILES = ('CONSTANT', 'RAMP', 'STEP', 'BURST', 'DIURNAL')
+
+class LoadProfile:
+    # Tasa de llegada lambda(t) en req/s; TRAFFIC_LAMBDA es la tasa pico y TRAFFIC_PROFILE_MIN_LAMBDA la mínima
+    def __init__(self, profile: str = settings.TRAFFIC_LOAD_PROFILE, peak_lambda: float = settings.TRAFFIC_LAMBDA,
+                 min_lambda: float = settings.TRAFFIC_PROFILE_MIN_LAMBDA, period_seconds: float = settings.TRAFFIC_PROFILE_PERIOD_SECONDS,
+                 steps: int = settings.TRAFFIC_PROFILE_STEPS, burst_on_seconds: float = settings.TRAFFIC_BURST_ON_SECONDS,
+                 burst_off_seconds: float = settings.TRAFFIC_BURST_OFF_SECONDS):
+        self.profile = profile.upper()
+        if self.profile not in LOAD_PROFILES:
+            raise ValueError(f"Perfil de carga '{profile}' no soportado. Usa uno de: {', '.join(LOAD_PROFILES)}")
+        if peak_lambda <= 0 or not 0 <= min_lambda <= peak_lambda:
+            raise ValueError(f"El perfil necesita 0 <= lambda mínima ({min_lambda}) <= lambda pico ({peak_lambda}) y una lambda pico positiva.")
+        if period_seconds <= 0 or steps < 1 or burst_on_seconds <= 0 or burst_off_seconds <= 0:
+            raise ValueError("El período, los escalones y las duraciones de las ráfagas deben ser positivos.")
+        self.peak_lambda = peak_lambda
+        self.min_lambda = min_lambda
+        self.period_seconds = period_seconds
+        self.steps = steps
+        self.burst_on_seconds = burst_on_seconds
+        self.burst_off_seconds = burst_off_seconds
+
+    def rate(self, t: np.ndarray, switches: np.ndarray = None, starts_on: bool = True) -> np.ndarray:
+        t = np.asarray(t, dtype=float)
+        span = self.peak_lambda - self.min_lambda
+        if self.profile == 'RAMP':
+            return self.min_lambda + span * np.clip(t / self.period_seconds, 0.0, 1.0)
+        if self.profile == 'STEP':
+            # Escalones iguales desde la mínima hasta la pico; después del último se mantiene la pico
+            step = np.minimum(np.floor(t / self.period_seconds), self.steps - 1)
+            return self.min_lambda + span * (step / (self.steps - 1) if self.steps > 1 else 1.0)
+        if self.profile == 'DIURNAL':
+            # Empieza en el valle y llega a la pico a mitad del período
+            return self.min_lambda + span * (1 - np.cos(2 * np.pi * t / self.period_seconds)) / 2
+        if self.profile == 'BURST':
+            # switches son los instantes de cambio de estado; un número par de cambios deja el estado inicial
+            on = (np.searchsorted(switches, t, side='right') % 2 == 0) == starts_on
+            return np.where(on, self.peak_lambda, self.min_lambda)
+        return np.full(t.shape, self.peak_lambda)
+
+    def arrival_offsets(self, size: int, rng: np.random.Generator) -> np.ndarray:
+        # Poisson no homogéneo por thinning: candidatos a la tasa pico, cada uno aceptado con probabilidad lambda(t) / pico.
+        # Sin los límites de calculate_delay, que recortarían la tasa a 10 req/s y deformarían el perfil
+        offsets = np.empty(size)
+        count = 0
+        clock = 0.0
+        # BURST es un MMPP de dos estados: duraciones exponenciales on/off, empezando en el estado estacionario
+        starts_on = bool(rng.random() < self.burst_on_seconds / (self.burst_on_seconds + self.burst_off_seconds))
+        switches = np.empty(0)
+        while count < size:
+            batch = max(1024, 2 * (size - count))
+            candidates = clock + np.cumsum(rng.exponential(1.0 / self.peak_lambda, batch))
+            clock = float(candidates[-1])
+            if self.profile == 'BURST':
+                switches = self._extend_switches(switches, clock, starts_on, rng)
+            accepted = candidates[rng.random(batch) * self.peak_lambda < self.rate(candidates, switches, starts_on)]
+            taken = min(len(accepted), size - count)
+            offsets[count:count + taken] = accepted[:taken]
+            count += taken
+        # El stream empieza con el primer request; lo que sigue conserva la forma del perfil
+        return offsets - offsets[0] if size else offsets
+
+    def _extend_switches(self, switches: np.ndarray, until: float, starts_on: bool, rng: np.random.Generator) -> np.ndarray:
+        durations = []
+        last = float(switches[-1]) if len(switches) else 0.0
+        on = (len(switches) % 2 == 0) == starts_on
+        while last <= until:
+            last += rng.exponential(self.burst_on_seconds if on else self.burst_off_seconds)
+            durations.append(last)
+            on = not on
+        return np.concatenate([switches, durations])
+
+    def mean_rate(self) -> float:
+        # Tasa media a largo plazo (para RAMP y STEP, la del tramo final)
+        if self.profile == 'DIURNAL':
+            return (self.peak_lambda + self.min_lambda) / 2
+        if self.profile == 'BURST':
+            on_fraction = self.burst_on_seconds / (self.burst_on_seconds + self.burst_off_seconds)
+            return on_fraction * self.peak_lambda + (1 - on_fraction) * self.min_lambda
+        return self.peak_lambda
+
+    def describe(self) -> dict:
+        description = {'profile': self.profile, 'peak_lambda': self.peak_lambda}
+        if self.profile != 'CONSTANT':
+            description['min_lambda'] = self.min_lambda
+        if self.profile in ('RAMP', 'STEP', 'DIURNAL'):
+            description['period_seconds'] = self.period_seconds
+        if self.profile == 'STEP':
+            description['steps'] = self.steps
+        if self.profile == 'BURST':
+            description['burst_on_seconds'] = self.burst_on_seconds
+            description['burst_off_seconds'] = self.burst_off_seconds
+        return description
+
+
+if __name__ == "__main__":
+    print("--- Probando src/load_profile.py ---")
+
+    def window_rates(offsets, width):
+        return np.bincount((offsets // width).astype(int)) / width
+
+    rng = np.random.default_rng(42)
+    constant = LoadProfile('CONSTANT', peak_lambda=50.0).arrival_offsets(100000, rng)
+    print(f"CONSTANT: {(len(constant) - 1) / constant[-1]:.2f} req/s (esperado 50)")
+    assert abs((len(constant) - 1) / constant[-1] - 50) < 1, "La tasa constante no coincide."
+    assert np.all(np.diff(constant) >= 0), "Las llegadas deben estar ordenadas."
+
+    ramp = LoadProfile('RAMP', peak_lambda=100.0, min_lambda=10.0, period_seconds=100).arrival_offsets(20000, rng)
+    rates = window_rates(ramp, 10)
+    print(f"RAMP: {np.round(rates[:10], 1).tolist()}")
+    assert rates[0] < 30 and 80 < rates[9] < 110, "La rampa debería subir de 10 a 100 req/s."
+
+    step = LoadProfile('STEP', peak_lambda=40.0, min_lambda=10.0, period_seconds=50, steps=4).arrival_offsets(8000, rng)
+    rates = window_rates(step, 50)
+    print(f"STEP: {np.round(rates[:4], 1).tolist()}")
+    assert all(abs(rate - expected) < 3 for rate, expected in zip(rates[:4], [10, 20, 30, 40])), "Los escalones no coinciden."
+
+    diurnal = LoadProfile('DIURNAL', peak_lambda=20.0, min_lambda=2.0, period_seconds=1000).arrival_offsets(50000, rng)
+    rates = window_rates(diurnal, 100)
+    print(f"DIURNAL: {np.round(rates[:10], 1).tolist()}")
+    assert rates[:10].argmax() in (4, 5) and rates[0] < rates[4], "El pico diurno debería caer a mitad del período."
+
+    burst_profile = LoadProfile('BURST', peak_lambda=100.0, min_lambda=1.0, burst_on_seconds=5, burst_off_seconds=20)
+    burst = burst_profile.arrival_offsets(200000, rng)
+    rates = window_rates(burst, 1)
+    print(f"BURST: {(len(burst) - 1) / burst[-1]:.2f} req/s (esperado {burst_profile.mean_rate():.2f}), "
+          f"ventanas de 1s sobre 50 req/s: {(rates > 50).mean():.1%}")
+    assert abs((len(burst) - 1) / burst[-1] - burst_profile.mean_rate()) < 3, "La tasa media de las ráfagas no coincide."
+    assert 0.1 < (rates > 50).mean() < 0.3, "Las ráfagas deberían ocupar cerca del 20% del tiempo."
+
+    repeated = LoadProfile('BURST', peak_lambda=100.0, min_lambda=1.0, burst_on_seconds=5, burst_off_seconds=20)
+    assert np.array_equal(repeated.arrival_offsets(1000, np.random.default_rng(7)), repeated.arrival_offsets(1000, np.random.default_rng(7))), \
+        "La misma semilla debería repetir las llegadas."
+    try:
+        LoadProfile('SAWTOOTH')
+        raise AssertionError("Un perfil desconocido debería fallar.")
+    except ValueError as e:
+        print(f"Perfil inválido detectado: {e}")
+    print("Pruebas de load_profile completadas exitosamente.")
@@ -25,6 +25,12 @@ def print_configuration():
     elif settings.LLM_PROVIDER.upper() == "OLLAMA":
         print(f"  - Host: {settings.OLLAMA_HOST}")
         print(f"  - Modelo: {settings.OLLAMA_MODEL_NAME}")
+        print(f"  - Keep-alive: {settings.OLLAMA_KEEP_ALIVE}")
+    print(f"  - Warm-up: {'Sí' if settings.LLM_WARMUP_ENABLED else 'No'} ({settings.LLM_WARMUP_PROMPTS} prompt(s) de calibración)")
+    print(f"\nScoring:")
+    print(f"  - Modo TF-IDF: {settings.SCORER_MODE}")
+    print(f"  - Métricas: {settings.SCORING_METRICS}")
+    print(f"  - Asíncrono: {'Sí' if settings.SCORING_ASYNC else 'No'}")
     print(f"\nCaché:")
     print(f"  - Host: {settings.CACHE_HOST}:{settings.CACHE_PORT}")
     print(f"  - Política: {settings.CACHE_POLICY}")
@@ -32,12 +38,26 @@ def print_configuration():
     print(f"  - TTL: {settings.CACHE_TTL_SECONDS}s")
     print(f"\nAlmacenamiento:")
     print(f"  - Tipo: {settings.DB_TYPE}")
-    print(f"  - Path: {settings.SQLITE_DB_PATH}")
+    if settings.DB_TYPE.upper() == "SQLITE":
+        print(f"  - Path: {settings.SQLITE_DB_PATH}")
+    else:
+        print(f"  - Servidor: {settings.POSTGRES_DB_HOST}:{settings.POSTGRES_DB_PORT}/{settings.POSTGRES_DB_NAME} (pool de hasta {settings.POSTGRES_POOL_MAX_CONN} conexiones)")
+    print(f"  - Escritura diferida: {'Sí' if settings.DB_WRITE_BEHIND else 'No'} (lotes de {settings.DB_WRITE_BATCH_SIZE}, cada {settings.DB_WRITE_FLUSH_INTERVAL}s)")
+    if settings.COLUMNAR_SINK_ENABLED:
+        print(f"  - Exportación columnar: {settings.COLUMNAR_DIR} ({settings.COLUMNAR_COMPRESSION})")
     print(f"\nGenerador de Tráfico:")
     print(f"  - Distribución: {settings.TRAFFIC_DISTRIBUTION_TYPE}")
     print(f"  - Lambda: {settings.TRAFFIC_LAMBDA}")
     print(f"  - Número de requests: {settings.TRAFFIC_NUM_REQUESTS}")
     print(f"  - Delay máximo: {settings.TRAFFIC_MAX_DELAY_SECONDS}s")
+    print(f"  - Popularidad: {settings.TRAFFIC_POPULARITY_MODEL}" + (f" (semilla {settings.TRAFFIC_SEED})" if settings.TRAFFIC_SEED is not None else ""))
+    print(f"  - Modo: {settings.TRAFFIC_MODE}" + (f" ({settings.TRAFFIC_WORKERS} workers)" if settings.TRAFFIC_MODE in ("OPEN_LOOP", "SIMULATION") else ""))
+    if settings.TRAFFIC_MODE == "SIMULATION":
+        print(f"  - Latencia simulada del LLM: {settings.SIMULATION_LATENCY_MODEL}" +
+              (f" ({settings.SIMULATION_LATENCY_SAMPLES_PATH})" if settings.SIMULATION_LATENCY_MODEL == "SAMPLES" else
+               f" (mediana {settings.SIMULATION_LLM_LATENCY_MEDIAN_SECONDS}s, sigma {settings.SIMULATION_LLM_LATENCY_SIGMA})"))
+    if settings.TRAFFIC_TRACE_REPLAY_PATH:
+        print(f"  - Traza a repetir: {settings.TRAFFIC_TRACE_REPLAY_PATH} (velocidad {settings.TRAFFIC_REPLAY_SPEED})")
     print("-" * 70 + "\n")
 
 def main():
@@ -0,0 +1,233 @@
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from collections import Counter, OrderedDict
+from config import settings
+import numpy as np
+import threading
+import hashlib
+import re
+import time
+import zlib
+
+# Mismo patrón de tokens que usa TfidfVectorizer por defecto
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+MINHASH_PERMUTATIONS = 64
+MINHASH_PRIME = (1 << 31) - 1
+_minhash_rng = np.random.default_rng(2024)
+MINHASH_A = _minhash_rng.integers(1, MINHASH_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.int64)
+MINHASH_B = _minhash_rng.integers(0, MINHASH_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.int64)
+
+def normalize_text(text: str) -> str:
+    return WHITESPACE_PATTERN.sub(" ", text.lower()).strip()
+
+class TokenizedText:
+    # Los derivados (conjunto, conteos, firma MinHash) se calculan una vez y los comparten todas las métricas
+    __slots__ = ('tokens', '_token_set', '_counts', '_minhash')
+
+    def __init__(self, text: str):
+        self.tokens = tuple(token for token in TOKEN_PATTERN.findall(normalize_text(text))
+                            if token not in ENGLISH_STOP_WORDS)
+        self._token_set = None
+        self._counts = None
+        self._minhash = None
+
+    @property
+    def token_set(self) -> frozenset:
+        if self._token_set is None:
+            self._token_set = frozenset(self.tokens)
+        return self._token_set
+
+    @property
+    def counts(self) -> Counter:
+        if self._counts is None:
+            self._counts = Counter(self.tokens)
+        return self._counts
+
+    @property
+    def minhash(self) -> np.ndarray:
+        if self._minhash is None:
+            if not self.tokens:
+                self._minhash = np.full(MINHASH_PERMUTATIONS, MINHASH_PRIME, dtype=np.int64)
+            else:
+                hashes = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in self.token_set),
+                                     dtype=np.int64) % MINHASH_PRIME
+                self._minhash = ((np.outer(hashes, MINHASH_A) + MINHASH_B) % MINHASH_PRIME).min(axis=0)
+        return self._minhash
+
+def token_f1(reference: TokenizedText, answer: TokenizedText) -> float:
+    overlap = sum((reference.counts & answer.counts).values())
+    if overlap == 0:
+        return 0.0
+    precision = overlap / len(answer.tokens)
+    recall = overlap / len(reference.tokens)
+    return 2 * precision * recall / (precision + recall)
+
+def jaccard(reference: TokenizedText, answer: TokenizedText) -> float:
+    union = reference.token_set | answer.token_set
+    if not union:
+        return 0.0
+    return len(reference.token_set & answer.token_set) / len(union)
+
+def minhash_jaccard(reference: TokenizedText, answer: TokenizedText) -> float:
+    if not reference.tokens or not answer.tokens:
+        return 0.0
+    return float(np.mean(reference.minhash == answer.minhash))
+
+def rouge_l(reference: TokenizedText, answer: TokenizedText) -> float:
+    if not reference.tokens or not answer.tokens:
+        return 0.0
+    # Longitud de la subsecuencia común más larga, guardando solo una fila de la tabla
+    previous = [0] * (len(answer.tokens) + 1)
+    for reference_token in reference.tokens:
+        current = [0]
+        for j, answer_token in enumerate(answer.tokens):
+            if reference_token == answer_token:
+                current.append(previous[j] + 1)
+            else:
+                current.append(max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if lcs == 0:
+        return 0.0
+    precision = lcs / len(answer.tokens)
+    recall = lcs / len(reference.tokens)
+    return 2 * precision * recall / (precision + recall)
+
+TOKEN_METRICS = {
+    'token_f1': token_f1,
+    'jaccard': jaccard,
+    'minhash': minhash_jaccard,
+    'rouge_l': rouge_l
+}
+# tfidf_cosine usa el TF-IDF del ScoreCalculator configurado sobre los mismos tokens
+AVAILABLE_METRICS = ['tfidf_cosine'] + list(TOKEN_METRICS)
+
+def parse_metric_names(metrics) -> list:
+    if isinstance(metrics, str):
+        metrics = [name.strip() for name in metrics.split(',') if name.strip()]
+    unknown = [name for name in metrics if name not in AVAILABLE_METRICS]
+    if unknown:
+        raise ValueError(f"Métricas no soportadas: {', '.join(unknown)}. Disponibles: {', '.join(AVAILABLE_METRICS)}")
+    if not metrics:
+        raise ValueError("Se necesita al menos una métrica de scoring.")
+    return list(metrics)
+
+class MetricEngine:
+    def __init__(self, metrics=settings.SCORING_METRICS, scorer=None, cache_size=settings.TOKEN_CACHE_SIZE):
+        self.metric_names = parse_metric_names(metrics)
+        if 'tfidf_cosine' in self.metric_names and scorer is None:
+            raise ValueError("La métrica tfidf_cosine necesita un ScoreCalculator.")
+        self.scorer = scorer
+        # La métrica principal es la que se guarda como quality_score
+        self.primary_metric = 'tfidf_cosine' if 'tfidf_cosine' in self.metric_names else self.metric_names[0]
+        self.cache_size = cache_size
+        self.token_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.timings = {name: 0.0 for name in ['tokenize'] + self.metric_names}
+        self.calls = {name: 0 for name in ['tokenize'] + self.metric_names}
+        # El generador en lazo abierto puntúa desde varios hilos a la vez
+        self.lock = threading.Lock()
+        print(f"MetricEngine inicializado: métricas={', '.join(self.metric_names)}, principal={self.primary_metric}")
+
+    def tokenize(self, text: str) -> TokenizedText:
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self.lock:
+            cached = self.token_cache.get(key)
+            if cached is not None:
+                self.token_cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+
+        start = time.perf_counter()
+        tokenized = TokenizedText(text)
+        self._record('tokenize', start)
+
+        with self.lock:
+            self.token_cache[key] = tokenized
+            if len(self.token_cache) > self.cache_size:
+                self.token_cache.popitem(last=False)
+        return tokenized
+
+    def _record(self, name: str, start: float):
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.timings[name] += elapsed
+            self.calls[name] += 1
+
+    def score(self, original_answer: str, llm_answer: str, question_id: str = None) -> dict:
+        scores = {}
+        token_metric_names = [name for name in self.metric_names if name in TOKEN_METRICS]
+        # Un solo paso de normalización y tokenización por texto, compartido por todas las métricas (tfidf_cosine incluida).
+        # Con un vector de referencia precalculado, tfidf_cosine no necesita la respuesta original
+        needs_reference = bool(token_metric_names) or not (self.scorer is not None and self.scorer.has_reference(question_id))
+        reference = self.tokenize(original_answer) if original_answer and needs_reference else None
+        answer = self.tokenize(llm_answer) if llm_answer else None
+
+        if 'tfidf_cosine' in self.metric_names:
+            start = time.perf_counter()
+            scores['tfidf_cosine'] = self.scorer.calculate_similarity_tokens(
+                reference.tokens if reference is not None else None,
+                answer.tokens if answer is not None else None,
+                question_id
+            )
+            self._record('tfidf_cosine', start)
+
+        if token_metric_names:
+            if reference is None or answer is None:
+                scores.update({name: 0.0 for name in token_metric_names})
+                return scores
+            for name in token_metric_names:
+                start = time.perf_counter()
+                scores[name] = round(TOKEN_METRICS[name](reference, answer), 4)
+                self._record(name, start)
+        return scores
+
+    def primary_score(self, scores: dict) -> float:
+        return scores.get(self.primary_metric)
+
+    def get_timings(self) -> dict:
+        return {
+            name: {
+                'calls': self.calls[name],
+                'total_seconds': self.timings[name],
+                'avg_ms': self.timings[name] / self.calls[name] * 1000 if self.calls[name] else 0.0
+            }
+            for name in self.timings
+        }
+
+
+if __name__ == "__main__":
+    print("--- Probando src/metric_engine.py ---")
+    from src.score_calculator import ScoreCalculator
+
+    engine = MetricEngine(metrics=AVAILABLE_METRICS, scorer=ScoreCalculator(mode="PAIR"), cache_size=2)
+
+    original = "Paris is the capital of France."
+    similar = "The capital of France is Paris."
+    different = "The sun is a star in our solar system."
+
+    # tfidf_cosine usa los tokens compartidos: el analizador de sklearn no vuelve a tokenizar los textos
+    sklearn_tokenizations = []
+    build_analyzer = engine.scorer.vectorizer.build_analyzer
+    engine.scorer.vectorizer.build_analyzer = lambda: sklearn_tokenizations.append(1) or build_analyzer()
+    scores_similar = engine.score(original, similar)
+    scores_different = engine.score(original, different)
+    print(f"Respuestas similares: {scores_similar}")
+    print(f"Respuestas diferentes: {scores_different}")
+    for name in AVAILABLE_METRICS:
+        assert scores_similar[name] > scores_different[name], f"La métrica {name} debería preferir la respuesta similar."
+    assert scores_similar['jaccard'] == 1.0 and scores_similar['minhash'] == 1.0, "Los mismos tokens deberían tener Jaccard 1."
+
+    assert engine.cache_hits == 1, "El texto original debería tokenizarse una sola vez."
+    assert engine.calls['tokenize'] == 3 and not sklearn_tokenizations, "Con tfidf_cosine cada texto debería tokenizarse una sola vez."
+    assert scores_similar['tfidf_cosine'] == engine.scorer.calculate_score(original, similar), "El TF-IDF sobre tokens debería dar el mismo score."
+    engine.score(similar, different)
+    assert len(engine.token_cache) == 2, "El caché LRU no debería superar su tamaño máximo."
+
+    print("\nTiempos por métrica:")
+    for name, timing in engine.get_timings().items():
+        print(f"  - {name}: {timing['avg_ms']:.3f}ms ({timing['calls']} llamadas)")
+    print("Pruebas de MetricEngine completadas exitosamente.")
@@ -0,0 +1,156 @@
+from config import settings
+import pandas as pd
+import numpy as np
+import random
+
+POPULARITY_MODELS = ('UNIFORM', 'ZIPF', 'HOTSET')
+
+def parse_category_weights(spec: str) -> dict:
+    # "1:5,4:2" -> {1: 5.0, 4: 2.0}
+    weights = {}
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        category, weight = item.split(':')
+        weights[int(category)] = float(weight)
+    return weights
+
+class AliasTable:
+    # Método alias de Vose: O(n) para construir la tabla y O(1) por muestra
+    def __init__(self, weights, seed=None):
+        weights = np.asarray(weights, dtype=float)
+        if len(weights) == 0 or weights.sum() <= 0:
+            raise ValueError("La tabla alias necesita al menos un peso positivo.")
+        size = len(weights)
+        scaled = weights / weights.sum() * size
+        probability = np.ones(size)
+        alias = np.arange(size)
+
+        small = list(np.flatnonzero(scaled < 1.0))
+        large = list(np.flatnonzero(scaled >= 1.0))
+        while small and large:
+            less, more = small.pop(), large.pop()
+            probability[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Lo que queda tiene probabilidad 1 salvo errores de redondeo
+
+        # Listas de Python para sample(): indexar un array de NumPy elemento a elemento es más lento
+        self.probability = probability.tolist()
+        self.alias = alias.tolist()
+        self.probability_array = probability
+        self.alias_array = alias
+        self.size = size
+        self.rng = random.Random(seed)
+
+    def sample(self) -> int:
+        column = int(self.rng.random() * self.size)
+        return column if self.rng.random() < self.probability[column] else self.alias[column]
+
+    def sample_batch(self, size: int, rng: np.random.Generator) -> np.ndarray:
+        # Misma tabla, muestreada en bloque con NumPy
+        columns = rng.integers(0, self.size, size)
+        return np.where(rng.random(size) < self.probability_array[columns], columns, self.alias_array[columns])
+
+class PopularityModel:
+    def __init__(self, dataset: pd.DataFrame, model: str = settings.TRAFFIC_POPULARITY_MODEL,
+                 zipf_s: float = settings.TRAFFIC_ZIPF_S, hot_fraction: float = settings.TRAFFIC_HOT_SET_FRACTION,
+                 hot_probability: float = settings.TRAFFIC_HOT_SET_PROBABILITY,
+                 category_weights: dict = None, seed: int = settings.TRAFFIC_SEED):
+        self.model = model.upper()
+        if self.model not in POPULARITY_MODELS:
+            raise ValueError(f"Modelo de popularidad '{model}' no soportado. Usa uno de: {', '.join(POPULARITY_MODELS)}")
+        self.zipf_s = zipf_s
+        self.hot_fraction = hot_fraction
+        self.hot_probability = hot_probability
+        if category_weights is None:
+            category_weights = parse_category_weights(settings.TRAFFIC_CATEGORY_WEIGHTS)
+        self.category_weights = category_weights
+        self.seed = seed
+        self.size = len(dataset)
+
+        weights = self._base_weights(np.random.default_rng(seed))
+        if category_weights:
+            weights = self._apply_category_weights(weights, dataset['class_index'].to_numpy())
+        self.weights = weights / weights.sum()
+        self.table = AliasTable(self.weights, seed=seed)
+
+    def _base_weights(self, rng) -> np.ndarray:
+        if self.model == 'ZIPF':
+            # El rango de cada pregunta es una permutación aleatoria: la popularidad no depende del orden del CSV
+            ranks = rng.permutation(self.size) + 1
+            return 1.0 / np.power(ranks, self.zipf_s)
+        if self.model == 'HOTSET':
+            hot_count = min(self.size, max(1, int(round(self.size * self.hot_fraction))))
+            weights = np.full(self.size, (1.0 - self.hot_probability) / max(1, self.size - hot_count))
+            weights[rng.choice(self.size, hot_count, replace=False)] = self.hot_probability / hot_count
+            return weights
+        return np.ones(self.size)
+
+    def _apply_category_weights(self, weights: np.ndarray, categories: np.ndarray) -> np.ndarray:
+        # Cada categoría recibe una fracción del tráfico proporcional a su peso; dentro de ella se mantiene el modelo base
+        weights = weights.copy()
+        present = np.unique(categories)
+        total_weight = sum(self.category_weights.get(int(category), 1.0) for category in present)
+        for category in present:
+            mask = categories == category
+            weights[mask] *= self.category_weights.get(int(category), 1.0) / total_weight / weights[mask].sum()
+        return weights
+
+    def sample(self) -> int:
+        # Posición (iloc) de la fila en el dataset
+        return self.table.sample()
+
+    def sample_batch(self, size: int, rng: np.random.Generator) -> np.ndarray:
+        return self.table.sample_batch(size, rng)
+
+    def describe(self) -> dict:
+        # Parámetros que se guardan con los resultados de cada experimento
+        description = {'model': self.model, 'rows': self.size, 'seed': self.seed}
+        if self.model == 'ZIPF':
+            description['zipf_s'] = self.zipf_s
+        elif self.model == 'HOTSET':
+            description['hot_fraction'] = self.hot_fraction
+            description['hot_probability'] = self.hot_probability
+        if self.category_weights:
+            description['category_weights'] = {str(category): weight for category, weight in self.category_weights.items()}
+        # Masa de probabilidad del 1% de preguntas más populares: cota del hit rate con una caché de ese tamaño
+        top_count = max(1, self.size // 100)
+        description['top_1pct_share'] = round(float(np.sort(self.weights)[-top_count:].sum()), 6)
+        return description
+
+
+if __name__ == "__main__":
+    print("--- Probando src/popularity.py ---")
+    from collections import Counter
+
+    table = AliasTable([1, 2, 3, 4], seed=7)
+    counts = Counter(table.sample() for _ in range(200000))
+    frequencies = [counts[i] / 200000 for i in range(4)]
+    print(f"Frecuencias de la tabla alias: {[round(f, 3) for f in frequencies]}")
+    assert all(abs(frequency - expected) < 0.01 for frequency, expected in zip(frequencies, [0.1, 0.2, 0.3, 0.4])), "La tabla alias no respeta los pesos."
+
+    dataset = pd.DataFrame({'class_index': [1] * 5000 + [2] * 5000, 'title': 't', 'content': 'c', 'best_answer': 'b'})
+    for model in POPULARITY_MODELS:
+        popularity = PopularityModel(dataset, model=model, zipf_s=1.0, hot_fraction=0.01, hot_probability=0.9,
+                                     category_weights={}, seed=42)
+        samples = [popularity.sample() for _ in range(20000)]
+        print(f"{model}: {len(set(samples))} preguntas distintas en 20000 requests, {popularity.describe()}")
+        if model == 'HOTSET':
+            hot_share = sum(popularity.weights[sample] > 1.0 / len(dataset) for sample in samples) / len(samples)
+            assert abs(hot_share - 0.9) < 0.02, "El hot set debería recibir ~90% de los requests."
+
+    batch_counts = np.bincount(table.sample_batch(200000, np.random.default_rng(7)), minlength=4) / 200000
+    print(f"Frecuencias de la tabla alias en bloque: {np.round(batch_counts, 3).tolist()}")
+    assert np.allclose(batch_counts, [0.1, 0.2, 0.3, 0.4], atol=0.01), "El muestreo en bloque no respeta los pesos."
+
+    first, second = [PopularityModel(dataset, model='ZIPF', category_weights={}, seed=42) for _ in range(2)]
+    assert [first.sample() for _ in range(100)] == [second.sample() for _ in range(100)], "La misma semilla debería repetir la secuencia."
+
+    skewed = PopularityModel(dataset, model='UNIFORM', category_weights={1: 3.0}, seed=1)
+    category_share = sum(dataset['class_index'].iat[skewed.sample()] == 1 for _ in range(20000)) / 20000
+    print(f"Fracción de la categoría 1 con peso 3: {category_share:.3f}")
+    assert abs(category_share - 0.75) < 0.02, "El peso por categoría no se respeta."
+
+    print("Pruebas de popularity completadas exitosamente.")
@@ -0,0 +1,426 @@
+from config import settings
+import threading
+import traceback
+import heapq
+import numpy as np
+
+# El ranking de candidatos se recalcula cada tantos requests (antes, a medida que se duplican los vistos)
+RANK_INTERVAL_REQUESTS = 100
+IDLE_POLL_SECONDS = 0.5
+RESCALE_LIMIT = 1e100
+
+class DemandTracker:
+    # Frecuencia de cada pregunta y de cada categoría con decaimiento exponencial, en O(1) por request: en lugar de
+    # decaer todos los contadores, cada request suma un incremento que crece al ritmo inverso del decaimiento
+    def __init__(self, half_life_requests: float = settings.PREFETCH_HALF_LIFE_REQUESTS,
+                 category_weight: float = settings.PREFETCH_CATEGORY_WEIGHT, candidates: int = settings.PREFETCH_CANDIDATES,
+                 catalog=None):
+        self.growth = 2.0 ** (1.0 / half_life_requests)
+        self.half_life_requests = half_life_requests
+        self.category_weight = category_weight
+        self.candidates = candidates
+        self.increment = 1.0
+        self.total = 0.0
+        self.question_counts = {}
+        self.category_counts = {}
+        # Requests a preguntas vistas por primera vez, por categoría: la demanda de las que todavía no se vieron
+        self.new_counts = {}
+        # Preguntas distintas vistas por categoría, para la demanda media por pregunta de cada una
+        self.category_sizes = {}
+        # Preguntas vistas o ya precargadas, por question_id
+        self.questions = {}
+        self.requests = 0
+        self.ranking = []
+        self.ranked_at = 0
+        # catalog (un RequestStream) da las preguntas del dataset que nadie pidió todavía, por categoría
+        self.catalog = catalog
+        self.category_rows = {}
+        self.cursors = {}
+        self.unseen_rows = {}
+        if catalog is not None:
+            categories = np.asarray(catalog.categories)
+            for category in np.unique(categories).tolist():
+                self.category_rows[category] = np.flatnonzero(categories == category)
+                self.cursors[category] = 0
+
+    def record(self, question: dict):
+        question_id = question['question_id']
+        category = question.get('category')
+        self.increment *= self.growth
+        if self.increment > RESCALE_LIMIT:
+            self._rescale()
+        if question_id not in self.question_counts:
+            self.question_counts[question_id] = 0.0
+            self.questions[question_id] = question
+            self.category_sizes[category] = self.category_sizes.get(category, 0) + 1
+            self.new_counts[category] = self.new_counts.get(category, 0.0) + self.increment
+        self.question_counts[question_id] += self.increment
+        self.category_counts[category] = self.category_counts.get(category, 0.0) + self.increment
+        self.total += self.increment
+        self.requests += 1
+
+    def remember(self, question: dict):
+        # Una pregunta no vista que se precargó no vuelve a ofrecerse como candidata
+        self.questions.setdefault(question['question_id'], question)
+
+    def _rescale(self):
+        # Mismas proporciones con números representables
+        scale = 1.0 / self.increment
+        for counts in (self.question_counts, self.category_counts, self.new_counts):
+            for key in counts:
+                counts[key] *= scale
+        self.total *= scale
+        self.increment = 1.0
+
+    def novelty(self) -> float:
+        # Fracción reciente de requests a preguntas que no se habían visto
+        return sum(self.new_counts.values()) / self.total if self.total else 1.0
+
+    def probability(self, question_id: str) -> float:
+        # Frecuencia propia suavizada con la demanda media por pregunta de su categoría: una pregunta vista una vez en una
+        # categoría con mucho tráfico es mejor apuesta que una en una categoría fría. Las vistas se reparten la fracción de
+        # requests que no es novedad
+        category = self.questions[question_id].get('category')
+        prior = self.category_counts[category] / self.category_sizes[category]
+        share = (self.question_counts[question_id] + self.category_weight * prior) / ((1 + self.category_weight) * self.total)
+        return (1 - self.novelty()) * share
+
+    def unseen_probability(self, category) -> float:
+        # Las preguntas que nadie pidió se reparten por igual la novedad de su categoría
+        unseen = len(self.category_rows.get(category, ())) - self.category_sizes.get(category, 0)
+        if unseen <= 0 or not self.total:
+            return 0.0
+        return self.new_counts.get(category, 0.0) / (self.total * unseen)
+
+    def _unseen_candidates(self, category):
+        # Las próximas preguntas no vistas ni precargadas de la categoría, en el orden del dataset
+        rows = self.category_rows[category]
+        cursor = self.cursors[category]
+        while cursor < len(rows) and self.catalog.question_id(rows[cursor]) in self.questions:
+            cursor += 1
+        self.cursors[category] = cursor
+        found = []
+        for row in rows[cursor:].tolist():
+            if len(found) == self.candidates:
+                break
+            question_id = self.catalog.question_id(row)
+            if question_id not in self.questions:
+                found.append((question_id, row))
+        return found
+
+    def ranked(self) -> list:
+        # (probabilidad, question_id) de las más probables, de mayor a menor, vistas o no
+        if self.requests - self.ranked_at >= min(RANK_INTERVAL_REQUESTS, max(1, self.ranked_at)):
+            candidates = [(self.probability(question_id), question_id) for question_id in self.question_counts]
+            self.unseen_rows = {}
+            for category in self.category_rows:
+                probability = self.unseen_probability(category)
+                if probability <= 0:
+                    continue
+                for question_id, row in self._unseen_candidates(category):
+                    self.unseen_rows[question_id] = row
+                    candidates.append((probability, question_id))
+            self.ranking = heapq.nlargest(self.candidates, candidates)
+            self.ranked_at = self.requests
+        return self.ranking
+
+    def question(self, question_id: str) -> dict:
+        question = self.questions.get(question_id)
+        return question if question is not None else self.catalog.question(self.unseen_rows[question_id])
+
+class Prefetcher:
+    # Precarga de baja prioridad: en los modos reales, hilos que solo lanzan prefetches mientras no hay requests en curso;
+    # en simulación el generador usa la misma contabilidad con sus propios eventos
+    def __init__(self, contains, max_in_flight: int = settings.PREFETCH_MAX_IN_FLIGHT,
+                 min_probability: float = settings.PREFETCH_MIN_PROBABILITY, tracker: DemandTracker = None, catalog=None):
+        self.contains = contains
+        self.max_in_flight = max_in_flight
+        self.min_probability = min_probability
+        self.tracker = tracker or DemandTracker(catalog=catalog)
+        self.condition = threading.Condition()
+        # question_id -> {'cancel': Event, 'done': Event} de cada prefetch en curso
+        self.in_flight = {}
+        # Segundos de LLM de las respuestas precargadas que todavía no pidió nadie
+        self.prefetched = {}
+        # question_id -> misses reales cuya llamada al LLM está en curso o en cola; esa llamada ya va a llenar la caché
+        self.misses = {}
+        self.active_requests = 0
+        self.closed = False
+        self.threads = []
+        self.stats = {
+            'issued': 0,
+            'completed': 0,
+            'abandoned': 0,
+            'errors': 0,
+            'duplicates': 0,
+            'used': 0,
+            'adopted': 0,
+            'llm_seconds': 0.0,
+            'useful_llm_seconds': 0.0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0
+        }
+
+    def start(self, fetch):
+        # fetch(question, cancel) genera y guarda la respuesta y devuelve el resultado del LLM
+        for index in range(self.max_in_flight):
+            thread = threading.Thread(target=self._worker, args=(fetch,), name=f"Prefetcher-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            for entry in self.in_flight.values():
+                entry['cancel'].set()
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def record_request(self, question: dict):
+        with self.condition:
+            self.tracker.record(question)
+
+    def request_started(self, question: dict):
+        # Un request real tiene prioridad: los prefetches en curso se cancelan, salvo el de su misma pregunta
+        with self.condition:
+            self.tracker.record(question)
+            self.active_requests += 1
+            for question_id, entry in self.in_flight.items():
+                if question_id != question['question_id']:
+                    entry['cancel'].set()
+
+    def request_finished(self):
+        with self.condition:
+            self.active_requests -= 1
+            self.condition.notify_all()
+
+    def adopt(self, question_id: str) -> dict:
+        # Un request de una pregunta que se está precargando usa ese resultado en lugar de llamar otra vez al LLM
+        with self.condition:
+            entry = self.in_flight.get(question_id)
+            if entry is not None:
+                self.stats['adopted'] += 1
+            return entry
+
+    def wait_for(self, question_id: str) -> bool:
+        entry = self.adopt(question_id)
+        if entry is None:
+            return False
+        entry['done'].wait()
+        return True
+
+    def on_hit(self, question_id: str):
+        with self.condition:
+            llm_seconds = self.prefetched.pop(question_id, None)
+            if llm_seconds is not None:
+                self.stats['used'] += 1
+                self.stats['useful_llm_seconds'] += llm_seconds
+
+    def on_miss(self, question_id: str):
+        # Una respuesta precargada que salió de la caché sin que nadie la pidiera ya no puede usarse
+        with self.condition:
+            self.prefetched.pop(question_id, None)
+            self.misses[question_id] = self.misses.get(question_id, 0) + 1
+
+    def miss_finished(self, question_id: str):
+        with self.condition:
+            self.misses[question_id] -= 1
+            if not self.misses[question_id]:
+                del self.misses[question_id]
+
+    def next_candidate(self):
+        # La pregunta más probable que no está en caché, ni precargándose, ni esperando la respuesta de un miss real
+        for probability, question_id in self.tracker.ranked():
+            if probability < self.min_probability:
+                break
+            if question_id in self.in_flight or question_id in self.misses or self.contains(question_id):
+                continue
+            return self.tracker.question(question_id)
+        return None
+
+    def begin(self, question: dict) -> dict:
+        entry = {'cancel': threading.Event(), 'done': threading.Event()}
+        self.in_flight[question['question_id']] = entry
+        self.tracker.remember(question)
+        self.stats['issued'] += 1
+        return entry
+
+    def finish(self, question_id: str, llm_result: dict):
+        entry = self.in_flight.pop(question_id)
+        llm_seconds = llm_result['llm_latency_seconds'] if llm_result else 0.0
+        self.stats['llm_seconds'] += llm_seconds
+        if llm_result is None or llm_result.get('cancelled'):
+            self.stats['abandoned'] += 1
+        elif llm_result['answer'].startswith("[Error:"):
+            self.stats['errors'] += 1
+        elif llm_result.get('duplicate'):
+            # Otra llamada llenó la caché antes: esta respuesta no se guardó y no cuenta como usada
+            self.stats['duplicates'] += 1
+        else:
+            self.stats['completed'] += 1
+            self.stats['prompt_tokens'] += llm_result['prompt_tokens'] or 0
+            self.stats['completion_tokens'] += llm_result['completion_tokens'] or 0
+            self.prefetched[question_id] = llm_seconds
+        entry['done'].set()
+
+    def _worker(self, fetch):
+        while True:
+            with self.condition:
+                question = None
+                while not self.closed:
+                    if self.active_requests == 0:
+                        question = self.next_candidate()
+                        if question is not None:
+                            break
+                    self.condition.wait(IDLE_POLL_SECONDS)
+                if self.closed:
+                    return
+                entry = self.begin(question)
+            llm_result = None
+            try:
+                llm_result = fetch(question, entry['cancel'])
+            except Exception as e:
+                print(f"Error en prefetch de {question['question_id']}: {e}")
+                traceback.print_exc()
+            with self.condition:
+                self.finish(question['question_id'], llm_result)
+
+    def get_stats(self) -> dict:
+        with self.condition:
+            stats = dict(self.stats)
+            pending = len(self.in_flight)
+        # Cada llamada lanzada termina usada una vez o desperdiciada (abandonada, con error o nunca pedida)
+        stats['pending'] = pending
+        stats['wasted'] = stats['issued'] - stats['used'] - pending
+        stats['wasted_llm_seconds'] = stats['llm_seconds'] - stats['useful_llm_seconds']
+        stats['usefulness'] = stats['used'] / stats['issued'] if stats['issued'] else 0.0
+        return stats
+
+    def describe(self) -> dict:
+        return {
+            'half_life_requests': self.tracker.half_life_requests,
+            'category_weight': self.tracker.category_weight,
+            'candidates': self.tracker.candidates,
+            'min_probability': self.min_probability,
+            'max_in_flight': self.max_in_flight
+        }
+
+
+if __name__ == "__main__":
+    print("--- Probando src/prefetcher.py ---")
+    import time
+    import random
+
+    class Catalog:
+        # Dataset mínimo con la interfaz de RequestStream: 20 preguntas alternando entre dos categorías
+        categories = np.arange(20) % 2
+
+        def question_id(self, row):
+            return f"q_{row}"
+
+        def question(self, row):
+            return {'question_id': self.question_id(row), 'category': int(self.categories[row])}
+
+    def total_probability(tracker):
+        # Las vistas más la novedad repartida entre las no vistas de cada categoría
+        seen = sum(tracker.probability(question_id) for question_id in tracker.question_counts)
+        unseen = sum(tracker.unseen_probability(category) * (len(rows) - tracker.category_sizes.get(category, 0))
+                     for category, rows in tracker.category_rows.items())
+        return seen + unseen
+
+    catalog = Catalog()
+    tracker = DemandTracker(half_life_requests=100, category_weight=1.0, candidates=10, catalog=catalog)
+    questions = {f"q_{i}": catalog.question(i) for i in range(20)}
+    for question_id in ['q_0'] * 30 + ['q_2'] * 10 + ['q_1'] * 10 + ['q_3']:
+        tracker.record(questions[question_id])
+    ranking = tracker.ranked()
+    print(f"Ranking: {[(question_id, round(probability, 3)) for probability, question_id in ranking]}")
+    assert ranking[0][1] == 'q_0', "La pregunta más pedida debería encabezar el ranking."
+    assert abs(total_probability(tracker) - 1) < 1e-9, "Las probabilidades deben sumar 1."
+    # q_1 y q_2 se pidieron las mismas veces, pero la categoría de q_2 (la de q_0) tiene más tráfico
+    assert tracker.probability('q_2') > tracker.probability('q_1'), "Con igual frecuencia debería pesar la categoría."
+
+    # Con vida media de 100 requests, una pregunta que deja de pedirse pierde la mitad de su peso cada 100 requests
+    before = tracker.question_counts['q_0'] / tracker.increment
+    for _ in range(100):
+        tracker.record(questions['q_5'])
+    after = tracker.question_counts['q_0'] / tracker.increment
+    print(f"Peso de q_0 en requests actuales: {before:.2f} -> {after:.2f}")
+    assert abs(after / before - 0.5) < 1e-9, "El peso debería caer a la mitad en una vida media."
+    tracker.increment = RESCALE_LIMIT
+    tracker.record(questions['q_5'])
+    assert tracker.increment < 2 and abs(total_probability(tracker) - 1) < 1e-9, "El reescalado no debe cambiar las proporciones."
+
+    # Hilos reales: se precarga solo sin requests en curso, y un request cancela los prefetches de otras preguntas
+    cache = {}
+    def fetch(question, cancel):
+        deadline = time.time() + 0.2
+        while time.time() < deadline:
+            if cancel.is_set():
+                return {'answer': "[Error: Llamada cancelada]", 'llm_latency_seconds': 0.05, 'cancelled': True,
+                        'prompt_tokens': None, 'completion_tokens': None}
+            time.sleep(0.01)
+        cache[question['question_id']] = True
+        return {'answer': "ok", 'llm_latency_seconds': 0.2, 'prompt_tokens': 5, 'completion_tokens': 5}
+
+    prefetcher = Prefetcher(lambda key: key in cache, max_in_flight=1, min_probability=0.01,
+                            tracker=DemandTracker(half_life_requests=1000, candidates=10))
+    rng = random.Random(1)
+    for _ in range(50):
+        prefetcher.record_request(questions[f"q_{rng.choice([0, 0, 0, 1, 1, 2])}"])
+    prefetcher.start(fetch)
+    time.sleep(0.1)
+    prefetcher.request_started(questions['q_9'])
+    time.sleep(0.05)
+    assert not prefetcher.in_flight, "El request debería cancelar el prefetch en curso."
+    prefetcher.request_finished()
+    time.sleep(1.5)
+    prefetcher.on_hit('q_0')
+    prefetcher.close()
+    stats = prefetcher.get_stats()
+    print(f"Prefetch: {stats}")
+    assert stats['abandoned'] == 1 and stats['completed'] >= 3 and stats['used'] == 1, "Contabilidad de prefetch inesperada."
+    assert stats['wasted'] == stats['issued'] - 1 and 'q_9' not in cache, "Solo se usó una respuesta precargada."
+
+    # Un miss real en curso ya va a llenar la caché: esa pregunta no se precarga, y una respuesta que no llenó la caché no cuenta como usada
+    prefetcher = Prefetcher(lambda key: False, min_probability=0.01, tracker=DemandTracker(candidates=10))
+    for question_id in ['q_0'] * 5 + ['q_1']:
+        prefetcher.record_request(questions[question_id])
+    prefetcher.on_miss('q_0')
+    assert prefetcher.next_candidate()['question_id'] == 'q_1', "No se debe precargar una pregunta con un miss en curso."
+    prefetcher.miss_finished('q_0')
+    assert prefetcher.next_candidate()['question_id'] == 'q_0', "Terminado el miss, la pregunta vuelve a ser candidata."
+    prefetcher.begin(questions['q_0'])
+    prefetcher.finish('q_0', {'answer': "ok", 'llm_latency_seconds': 1.0, 'duplicate': True, 'prompt_tokens': 5, 'completion_tokens': 5})
+    prefetcher.on_hit('q_0')
+    stats = prefetcher.get_stats()
+    assert stats['duplicates'] == 1 and stats['used'] == 0 and stats['wasted'] == 1, "Un prefetch duplicado no debería contar como usado."
+
+    # Sin desalojos ni vencimientos: con tráfico solo en la categoría 0, se precargan sus preguntas todavía no vistas y
+    # algunas se piden después
+    cache = {}
+    prefetcher = Prefetcher(lambda key: key in cache, min_probability=0.01,
+                            tracker=DemandTracker(half_life_requests=1000, candidates=10, catalog=catalog))
+    rng = random.Random(2)
+    for _ in range(30):
+        question = questions[f"q_{rng.choice(range(0, 20, 2))}"]
+        prefetcher.record_request(question)
+        if question['question_id'] in cache:
+            prefetcher.on_hit(question['question_id'])
+        else:
+            prefetcher.on_miss(question['question_id'])
+            cache[question['question_id']] = True
+            prefetcher.miss_finished(question['question_id'])
+        # Tiempo ocioso hasta el siguiente request: un prefetch
+        candidate = prefetcher.next_candidate()
+        if candidate is not None:
+            prefetcher.begin(candidate)
+            cache[candidate['question_id']] = True
+            prefetcher.finish(candidate['question_id'], {'answer': "ok", 'llm_latency_seconds': 1.0, 'prompt_tokens': 5, 'completion_tokens': 5})
+    stats = prefetcher.get_stats()
+    print(f"Prefetch de preguntas no vistas: {stats['issued']} lanzados, {stats['used']} usados")
+    assert stats['used'] > 0, "Alguna pregunta precargada sin haberse visto debería pedirse después."
+    assert all(questions[question_id]['category'] == 0 for question_id in cache), "Solo debería precargarse la categoría con tráfico."
+    print("Pruebas de prefetcher completadas exitosamente.")
@@ -0,0 +1,176 @@
+import numpy as np
+import scipy.sparse as sp
+import json
+import os
+from datetime import datetime
+
+DATA_DTYPE = np.float64
+INDEX_DTYPE = np.int32
+INDPTR_DTYPE = np.int64
+ID_DTYPE = np.int64
+
+def question_id_to_label(question_id: str) -> int:
+    # Los question_id se generan como f"q_{indice_del_dataset}"
+    try:
+        return int(question_id[2:])
+    except (TypeError, ValueError):
+        return None
+
+class ReferenceVectors:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+        self.n_rows = self.meta['n_rows']
+        self.n_features = self.meta['n_features']
+        self.scorer_key = self.meta['scorer_key']
+
+        # Los arreglos CSR quedan en disco y el sistema operativo pagina solo lo que se lee
+        self.data = self._memmap('data.bin', DATA_DTYPE, self.meta['nnz'])
+        self.indices = self._memmap('indices.bin', INDEX_DTYPE, self.meta['nnz'])
+        self.indptr = self._memmap('indptr.bin', INDPTR_DTYPE, self.n_rows + 1)
+        self.ids = self._memmap('ids.bin', ID_DTYPE, self.n_rows)
+        self.id_rows = self._memmap('id_rows.bin', ID_DTYPE, self.n_rows)
+        print(f"ReferenceVectors cargados desde {path}: {self.n_rows} respuestas, {self.meta['nnz']} valores no nulos")
+
+    def _memmap(self, filename: str, dtype, length: int) -> np.ndarray:
+        if length == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, filename), dtype=dtype, mode='r', shape=(length,))
+
+    def find_row(self, question_id: str) -> int:
+        label = question_id_to_label(question_id)
+        if label is None or self.n_rows == 0:
+            return None
+        position = np.searchsorted(self.ids, label)
+        if position < self.n_rows and self.ids[position] == label:
+            return int(self.id_rows[position])
+        return None
+
+    def __contains__(self, question_id: str) -> bool:
+        return self.find_row(question_id) is not None
+
+    def get_row(self, question_id: str) -> tuple:
+        row = self.find_row(question_id)
+        if row is None:
+            return None
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def get_matrix(self, question_ids) -> tuple:
+        rows = [self.find_row(question_id) for question_id in question_ids]
+        found = np.array([row is not None for row in rows], dtype=bool)
+
+        indptr = [0]
+        indices = []
+        data = []
+        for row in rows:
+            if row is not None:
+                start, end = self.indptr[row], self.indptr[row + 1]
+                indices.append(self.indices[start:end])
+                data.append(self.data[start:end])
+                indptr.append(indptr[-1] + (end - start))
+
+        if not indices:
+            return sp.csr_matrix((0, self.n_features), dtype=DATA_DTYPE), found
+        matrix = sp.csr_matrix(
+            (np.concatenate(data), np.concatenate(indices), np.array(indptr, dtype=INDPTR_DTYPE)),
+            shape=(len(indptr) - 1, self.n_features)
+        )
+        return matrix, found
+
+    @staticmethod
+    def build(dataset, scorer, path: str, chunk_size: int = 10000):
+        if scorer.cache_key is None:
+            raise ValueError("Los vectores de referencia necesitan un ScoreCalculator ajustado al corpus (modo CORPUS o HASHING).")
+
+        os.makedirs(path, exist_ok=True)
+        labels = np.asarray(dataset.index, dtype=ID_DTYPE)
+        answers = dataset['best_answer']
+        nnz = 0
+        n_features = scorer.n_features
+
+        print(f"Construyendo vectores de referencia para {len(dataset)} respuestas en {path}...")
+        with open(os.path.join(path, 'data.bin'), 'wb') as data_file, \
+             open(os.path.join(path, 'indices.bin'), 'wb') as indices_file, \
+             open(os.path.join(path, 'indptr.bin'), 'wb') as indptr_file:
+            indptr_file.write(np.zeros(1, dtype=INDPTR_DTYPE).tobytes())
+
+            # Se vectoriza por bloques para no tener todo el corpus en memoria
+            for start in range(0, len(dataset), chunk_size):
+                chunk = scorer.vectorizer.transform(answers.iloc[start:start + chunk_size].astype(str))
+                chunk.sort_indices()
+                data_file.write(chunk.data.astype(DATA_DTYPE).tobytes())
+                indices_file.write(chunk.indices.astype(INDEX_DTYPE).tobytes())
+                indptr_file.write((chunk.indptr[1:].astype(INDPTR_DTYPE) + nnz).tobytes())
+                nnz += chunk.nnz
+                print(f"  {min(start + chunk_size, len(dataset))}/{len(dataset)} respuestas vectorizadas")
+
+        # Índice question_id -> fila, ordenado para buscar con búsqueda binaria
+        order = np.argsort(labels, kind='stable')
+        labels[order].tofile(os.path.join(path, 'ids.bin'))
+        order.astype(ID_DTYPE).tofile(os.path.join(path, 'id_rows.bin'))
+
+        meta = {
+            'scorer_key': scorer.cache_key,
+            'n_rows': len(dataset),
+            'n_features': n_features,
+            'nnz': int(nnz),
+            'created_at': datetime.now().isoformat()
+        }
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+        print(f"Vectores de referencia guardados en {path} ({nnz} valores no nulos)")
+        return ReferenceVectors(path)
+
+
+if __name__ == "__main__":
+    print("--- Probando src/reference_vectors.py ---")
+    import tempfile
+    import pandas as pd
+    from src.score_calculator import ScoreCalculator
+
+    dataset = pd.DataFrame({
+        'best_answer': [
+            "Paris is the capital of France.",
+            "Plants use sunlight, water, and CO2 to make food.",
+            "Python is a high-level programming language."
+        ]
+    }, index=[10, 3, 42])
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        scorer = ScoreCalculator(mode="CORPUS", corpus=dataset['best_answer'], cache_dir=tmp_dir)
+        references = ReferenceVectors.build(dataset, scorer, os.path.join(tmp_dir, 'refs'), chunk_size=2)
+
+        assert "q_42" in references, "q_42 debería estar en los vectores de referencia."
+        assert "q_7" not in references, "q_7 no debería estar en los vectores de referencia."
+
+        indices, data = references.get_row("q_3")
+        expected = scorer.vectorizer.transform([dataset.loc[3, 'best_answer']])
+        expected.sort_indices()
+        assert np.array_equal(indices, expected.indices), "Los índices de la fila no coinciden."
+        assert np.allclose(data, expected.data), "Los valores de la fila no coinciden."
+
+        matrix, found = references.get_matrix(["q_10", "q_7", "q_42"])
+        print(f"Matriz de referencias: {matrix.shape}, encontrados: {found.tolist()}")
+        assert matrix.shape[0] == 2 and found.tolist() == [True, False, True], "La matriz de referencias no es la esperada."
+
+        # build_reference_vectors.py lee el CSV con pandas y TrafficGenerator usa el caché columnar: la clave debe coincidir
+        from src.utils import read_dataset_csv
+        from src.dataset_cache import load_cached_dataset
+        csv_path = os.path.join(tmp_dir, 'test.csv')
+        pd.DataFrame([[1, "Capital", "Geografía", answer] for answer in dataset['best_answer']]).to_csv(csv_path, header=False, index=False)
+        for mode in ["CORPUS", "HASHING"]:
+            builder_dataset = read_dataset_csv(csv_path)
+            builder_scorer = ScoreCalculator(mode=mode, corpus=builder_dataset['best_answer'], cache_dir=os.path.join(tmp_dir, 'builder'))
+            ReferenceVectors.build(builder_dataset, builder_scorer, os.path.join(tmp_dir, f"refs_{mode.lower()}"))
+
+            runtime_dataset = load_cached_dataset(csv_path, read_dataset_csv, os.path.join(tmp_dir, 'columnar'))
+            runtime_scorer = ScoreCalculator(mode=mode, corpus=runtime_dataset['best_answer'], cache_dir=os.path.join(tmp_dir, 'runtime'))
+            attached = runtime_scorer.attach_reference_vectors(os.path.join(tmp_dir, f"refs_{mode.lower()}"))
+            print(f"Modo {mode}: clave del constructor {builder_scorer.cache_key}, clave en ejecución {runtime_scorer.cache_key}")
+            assert attached is True, f"Modo {mode}: los vectores construidos desde el CSV deben valer para el dataset columnar."
+
+    print("Pruebas de ReferenceVectors completadas exitosamente.")
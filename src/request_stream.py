@@ -0,0 +1,143 @@
+from config import settings
+from src.utils import calculate_delays
+from src.request_trace import write_trace, read_trace
+import pandas as pd
+import numpy as np
+
+class RequestStream:
+    def __init__(self, dataset: pd.DataFrame, rows: np.ndarray, delays: np.ndarray):
+        # Acceso por columnas indexadas por posición en lugar de filas de pandas
+        self.labels = np.asarray(dataset.index)
+        self.titles = self._text_column(dataset, 'title')
+        self.contents = self._text_column(dataset, 'content')
+        self.best_answers = self._text_column(dataset, 'best_answer')
+        self.categories = np.asarray(dataset['class_index'])
+        self.rows = rows
+        self.delays = delays
+        self.num_requests = len(rows)
+
+    @classmethod
+    def generate(cls, dataset: pd.DataFrame, popularity, num_requests: int = settings.TRAFFIC_NUM_REQUESTS,
+                 distribution_type: str = settings.TRAFFIC_DISTRIBUTION_TYPE, lambda_param: float = settings.TRAFFIC_LAMBDA,
+                 max_delay: float = settings.TRAFFIC_MAX_DELAY_SECONDS, seed: int = settings.TRAFFIC_SEED,
+                 batch_size: int = settings.TRAFFIC_STREAM_BATCH_SIZE, load_profile=None):
+        # Todas las filas y todos los intervalos se generan de antemano, por bloques, con un único Generator
+        rng = np.random.default_rng(seed)
+        rows = np.empty(num_requests, dtype=np.int64)
+        delays = np.empty(num_requests, dtype=np.float64)
+        for start in range(0, num_requests, batch_size):
+            size = min(batch_size, num_requests - start)
+            rows[start:start + size] = popularity.sample_batch(size, rng)
+            if load_profile is None:
+                delays[start:start + size] = calculate_delays(distribution_type, lambda_param, max_delay, size, rng)
+        if load_profile is not None:
+            # Con un perfil de carga los intervalos salen de las llegadas de lambda(t), no de una distribución fija
+            offsets = load_profile.arrival_offsets(num_requests, rng)
+            delays[:-1] = np.diff(offsets)
+            delays[-1:] = 0.0
+        return cls(dataset, rows, delays)
+
+    @classmethod
+    def from_trace(cls, dataset: pd.DataFrame, path: str, speed: float = 1.0):
+        # Repite una traza grabada: mismas preguntas y mismas llegadas, comprimidas en el tiempo por speed
+        labels, offsets, metadata = read_trace(path)
+        rows = pd.Index(np.asarray(dataset.index)).get_indexer(labels)
+        missing = int((rows < 0).sum())
+        if missing:
+            raise ValueError(f"La traza {path} tiene {missing} requests con preguntas que no están en el dataset.")
+        delays = np.zeros(len(offsets))
+        delays[:-1] = np.diff(offsets) / speed
+        stream = cls(dataset, rows.astype(np.int64), delays)
+        stream.trace_metadata = metadata
+        return stream
+
+    def save_trace(self, path: str, metadata: dict = None) -> str:
+        return write_trace(path, self.labels[self.rows], self.arrival_offsets(), metadata)
+
+    def _text_column(self, dataset, column: str):
+        # Las columnas del caché columnar se decodifican fila a fila al muestrear; las de pandas pasan a listas
+        values = dataset[column]
+        return values.tolist() if isinstance(values, pd.Series) else values
+
+    def __len__(self) -> int:
+        return self.num_requests
+
+    def question_id(self, row: int) -> str:
+        return f"q_{self.labels[row]}"
+
+    def question(self, row: int) -> dict:
+        return {
+            "question_id": self.question_id(row),
+            "title": self.titles[row],
+            "content": self.contents[row],
+            "original_best_answer": self.best_answers[row],
+            "category": int(self.categories[row])
+        }
+
+    def __iter__(self):
+        # (pregunta, espera hasta el siguiente request)
+        for row, delay in zip(self.rows.tolist(), self.delays.tolist()):
+            yield self.question(row), delay
+
+    def arrival_offsets(self) -> np.ndarray:
+        # Instantes de llegada en segundos desde el inicio; el primer request sale en 0
+        offsets = np.zeros(self.num_requests)
+        np.cumsum(self.delays[:-1], out=offsets[1:])
+        return offsets
+
+
+if __name__ == "__main__":
+    print("--- Probando src/request_stream.py ---")
+    import tempfile
+    import os
+    from src.popularity import PopularityModel
+
+    dataset = pd.DataFrame({
+        'class_index': [1, 2, 3, 4] * 250,
+        'title': [f"title {i}" for i in range(1000)],
+        'content': [f"content {i}" for i in range(1000)],
+        'best_answer': [f"answer {i}" for i in range(1000)]
+    }, index=range(5000, 6000))
+    popularity = PopularityModel(dataset, model='ZIPF', category_weights={}, seed=42)
+
+    stream = RequestStream.generate(dataset, popularity, num_requests=10000, distribution_type='POISSON',
+                                    lambda_param=2.0, max_delay=5, seed=42, batch_size=4096)
+    requests = list(stream)
+    question, delay = requests[0]
+    print(f"Primer request: {question} (espera {delay:.3f}s)")
+    assert question['question_id'] == f"q_{dataset.index[stream.rows[0]]}", "El question_id debe usar la etiqueta del índice."
+    assert question['title'] == dataset['title'].iat[stream.rows[0]], "El título no corresponde a la fila."
+    assert all(0.1 <= delay <= 5 for _, delay in requests), "Los intervalos deben respetar los límites de calculate_delay."
+    print(f"Intervalo medio: {stream.delays.mean():.3f}s, preguntas distintas: {len(set(stream.rows.tolist()))}")
+
+    offsets = stream.arrival_offsets()
+    assert offsets[0] == 0.0 and np.isclose(offsets[-1], stream.delays[:-1].sum()), "Los instantes de llegada no coinciden."
+
+    repeated = RequestStream.generate(dataset, popularity, num_requests=10000, distribution_type='POISSON',
+                                      lambda_param=2.0, max_delay=5, seed=42, batch_size=4096)
+    assert np.array_equal(stream.rows, repeated.rows) and np.array_equal(stream.delays, repeated.delays), "La misma semilla debería repetir el stream."
+
+    from src.load_profile import LoadProfile
+    ramp = RequestStream.generate(dataset, popularity, num_requests=10000, seed=42,
+                                  load_profile=LoadProfile('RAMP', peak_lambda=50.0, min_lambda=5.0, period_seconds=100))
+    ramp_offsets = ramp.arrival_offsets()
+    print(f"Rampa: {len(ramp)} requests en {ramp_offsets[-1]:.1f}s, primeros 10s {np.sum(ramp_offsets < 10)}, 90-100s {np.sum((ramp_offsets >= 90) & (ramp_offsets < 100))}")
+    assert np.sum(ramp_offsets < 10) < np.sum((ramp_offsets >= 90) & (ramp_offsets < 100)), "La rampa debería aumentar la tasa de llegada."
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        trace_path = stream.save_trace(os.path.join(tmp_dir, 'run.trace'), {'seed': 42})
+        replay = RequestStream.from_trace(dataset, trace_path)
+        assert [question for question, _ in replay] == [question for question, _ in requests], "La traza debe repetir las mismas preguntas."
+        assert np.allclose(replay.arrival_offsets(), offsets), "La traza debe repetir las mismas llegadas."
+        fast = RequestStream.from_trace(dataset, trace_path, speed=10.0)
+        assert np.isclose(fast.arrival_offsets()[-1], offsets[-1] / 10), "A 10x las llegadas deben comprimirse 10 veces."
+        assert not RequestStream.from_trace(dataset, trace_path, speed=float('inf')).delays.any(), "MAX no debería esperar."
+        print(f"Traza de {len(replay)} requests: {os.path.getsize(trace_path)} bytes, metadatos {replay.trace_metadata}")
+
+        try:
+            RequestStream.from_trace(dataset.iloc[:10], trace_path)
+            raise AssertionError("Una traza con preguntas fuera del dataset debería fallar.")
+        except ValueError as e:
+            print(f"Traza incompatible detectada: {e}")
+
+    print("Pruebas de request_stream completadas exitosamente.")
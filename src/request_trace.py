@@ -0,0 +1,77 @@
+import numpy as np
+import struct
+import json
+import os
+
+# Cabecera: magic, versión, número de requests y largo de los metadatos JSON que la siguen
+TRACE_MAGIC = b'YTRC'
+TRACE_VERSION = 1
+HEADER_FORMAT = '<4sIQI'
+# Un registro por request: etiqueta de la pregunta en el dataset (question_id = f"q_{label}") y llegada programada
+RECORD_DTYPE = np.dtype([('label', '<i8'), ('offset', '<f8')])
+
+def question_label(question_id: str) -> int:
+    return int(question_id[2:])
+
+def write_trace(path: str, labels, offsets, metadata: dict = None) -> str:
+    records = np.empty(len(labels), dtype=RECORD_DTYPE)
+    records['label'] = labels
+    records['offset'] = offsets
+    meta_bytes = json.dumps(metadata or {}).encode('utf-8')
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(struct.pack(HEADER_FORMAT, TRACE_MAGIC, TRACE_VERSION, len(records), len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(records.tobytes())
+    return path
+
+def read_trace(path: str) -> tuple:
+    with open(path, 'rb') as f:
+        magic, version, count, meta_length = struct.unpack(HEADER_FORMAT, f.read(struct.calcsize(HEADER_FORMAT)))
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"{path} no es una traza de requests.")
+        if version != TRACE_VERSION:
+            raise ValueError(f"Versión de traza {version} no soportada (se esperaba {TRACE_VERSION}).")
+        metadata = json.loads(f.read(meta_length).decode('utf-8'))
+        data = f.read(count * RECORD_DTYPE.itemsize)
+    if len(data) != count * RECORD_DTYPE.itemsize:
+        raise ValueError(f"La traza {path} está truncada: {len(data) // RECORD_DTYPE.itemsize} de {count} requests.")
+    records = np.frombuffer(data, dtype=RECORD_DTYPE)
+    return records['label'].copy(), records['offset'].copy(), metadata
+
+def parse_replay_speed(speed: str) -> float:
+    # "1" = tiempo real, "N" = N veces más rápido, "MAX" = sin esperas
+    if str(speed).upper() == 'MAX':
+        return float('inf')
+    speed = float(speed)
+    if speed <= 0:
+        raise ValueError("La velocidad de reproducción debe ser positiva o MAX.")
+    return speed
+
+
+if __name__ == "__main__":
+    print("--- Probando src/request_trace.py ---")
+    import tempfile
+
+    labels = np.array([5, 17, 5, 42], dtype=np.int64)
+    offsets = np.array([0.0, 0.25, 1.5, 1.75])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = write_trace(os.path.join(tmp_dir, 'traces', 'run.trace'), labels, offsets, {'seed': 7})
+        print(f"Traza escrita: {os.path.getsize(path)} bytes para {len(labels)} requests")
+        read_labels, read_offsets, metadata = read_trace(path)
+        assert np.array_equal(read_labels, labels) and np.array_equal(read_offsets, offsets), "La traza leída no coincide."
+        assert metadata == {'seed': 7}, "Los metadatos de la traza no coinciden."
+
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 4)
+        try:
+            read_trace(path)
+            raise AssertionError("Una traza truncada debería fallar.")
+        except ValueError as e:
+            print(f"Traza truncada detectada: {e}")
+
+    assert question_label("q_42") == 42 and parse_replay_speed("max") == float('inf') and parse_replay_speed("10") == 10.0
+    print("Pruebas de request_trace completadas exitosamente.")
@@ -1,42 +1,292 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import hashlib
+import os
+from config import settings
+from src.reference_vectors import ReferenceVectors
+from src.dataset_cache import text_digest
+
+SCORER_MODES = ["PAIR", "CORPUS", "HASHING"]
+# Modos con un TF-IDF ajustado una sola vez y persistido en disco
+FITTED_MODES = ["CORPUS", "HASHING"]
+
+def pretokenized(tokens):
+    # Analizador para textos que MetricEngine ya tokenizó: mismos tokens que el analizador 'word' con stop words en inglés
+    return tokens
+
+class HashingTfidfVectorizer:
+    # TF-IDF sobre buckets de hashing: la memoria depende de n_features, no del tamaño del corpus
+    def __init__(self, n_features: int, idf: np.ndarray = None, analyzer=None):
+        self.n_features = n_features
+        if analyzer is None:
+            self.hasher = HashingVectorizer(
+                n_features=n_features,
+                lowercase=True,
+                stop_words='english',
+                alternate_sign=False,
+                norm=None
+            )
+        else:
+            self.hasher = HashingVectorizer(n_features=n_features, analyzer=analyzer, alternate_sign=False, norm=None)
+        self.idf = idf
+
+    def fit(self, corpus, chunk_size: int = 10000):
+        document_frequency = np.zeros(self.n_features, dtype=np.int64)
+        n_documents = 0
+        corpus = list(corpus)
+        for start in range(0, len(corpus), chunk_size):
+            counts = self.hasher.transform(corpus[start:start + chunk_size])
+            counts.sum_duplicates()
+            document_frequency += np.bincount(counts.indices, minlength=self.n_features)
+            n_documents += counts.shape[0]
+        # Misma fórmula que TfidfTransformer(smooth_idf=True)
+        self.idf = np.log((1 + n_documents) / (1 + document_frequency)) + 1
+        return self
+
+    def transform(self, texts) -> sp.csr_matrix:
+        counts = self.hasher.transform(texts)
+        return normalize(counts @ sp.diags(self.idf, format='csr'), norm='l2', copy=False).tocsr()
 
 class ScoreCalculator:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(
-            lowercase=True,
-            stop_words='english',
-            max_features=1000
+    def __init__(self, mode=settings.SCORER_MODE, corpus=None, cache_dir=settings.SCORER_CACHE_DIR,
+                 corpus_max_features=settings.SCORER_CORPUS_MAX_FEATURES, fitted_path=None,
+                 hashing_features=settings.SCORER_HASHING_FEATURES):
+        self.mode = mode.upper()
+        self.cache_dir = cache_dir
+        self.corpus_max_features = corpus_max_features
+        self.hashing_features = hashing_features
+        self.cache_key = None
+        self.cache_path = None
+        self.reference_vectors = None
+
+        if self.mode == "PAIR":
+            self.vectorizer = TfidfVectorizer(
+                lowercase=True,
+                stop_words='english',
+                max_features=1000
+            )
+            print("ScoreCalculator inicializado con TF-IDF y similitud de coseno.")
+        elif self.mode in FITTED_MODES:
+            if corpus is not None:
+                self.vectorizer = self._load_or_fit_corpus(corpus)
+            elif fitted_path is not None:
+                # Usado por procesos que cargan un TF-IDF ya ajustado sin tener el corpus
+                self.vectorizer = self.load_fitted_vectorizer(fitted_path)
+                self.cache_path = fitted_path
+            else:
+                raise ValueError(f"El modo {self.mode} necesita el corpus de respuestas (best_answer) para ajustar el TF-IDF.")
+            if self.mode == "CORPUS":
+                print(f"ScoreCalculator inicializado con TF-IDF ajustado al corpus ({self.n_features} términos).")
+            else:
+                print(f"ScoreCalculator inicializado con TF-IDF sobre hashing ({self.n_features} buckets).")
+        else:
+            raise ValueError(f"Modo de scoring '{mode}' no soportado. Usa {', '.join(SCORER_MODES)}.")
+        self.token_vectorizer = self._build_token_vectorizer()
+
+    @property
+    def version(self) -> str:
+        # Identifica el scorer en columnas y metadatos de resultados re-evaluados
+        if self.mode == "PAIR":
+            return "pair"
+        return f"{self.mode.lower()}_{self.cache_key}"
+
+    @property
+    def n_features(self) -> int:
+        if self.mode == "HASHING":
+            return self.vectorizer.n_features
+        return len(self.vectorizer.vocabulary_)
+
+    def _build_token_vectorizer(self):
+        # Mismo vocabulario e idf (o los mismos buckets) que self.vectorizer, sobre secuencias de tokens ya calculadas
+        if self.mode == "PAIR":
+            return TfidfVectorizer(analyzer=pretokenized, max_features=1000)
+        if self.mode == "HASHING":
+            return HashingTfidfVectorizer(self.vectorizer.n_features, self.vectorizer.idf, analyzer=pretokenized)
+        vectorizer = TfidfVectorizer(vocabulary=self.vectorizer.vocabulary_, analyzer=pretokenized)
+        vectorizer.idf_ = self.vectorizer.idf_
+        return vectorizer
+
+    def _corpus_params(self) -> dict:
+        if self.mode == "HASHING":
+            return {'mode': 'HASHING', 'n_features': self.hashing_features}
+        return {
+            'lowercase': True,
+            'stop_words': 'english',
+            'max_features': self.corpus_max_features
+        }
+
+    def _corpus_cache_key(self, corpus) -> str:
+        # La clave cambia si cambia el contenido del corpus o los parámetros del vectorizador
+        digest = hashlib.sha1()
+        digest.update(repr(sorted(self._corpus_params().items())).encode('utf-8'))
+        # Columna del caché columnar: su huella ya guarda text_digest y evita leer todas las filas
+        fingerprint = getattr(corpus, 'fingerprint', None)
+        if fingerprint is None:
+            fingerprint = text_digest(corpus)
+        digest.update(fingerprint.encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def _load_or_fit_corpus(self, corpus):
+        if getattr(corpus, 'fingerprint', None) is None:
+            corpus = pd.Series(corpus).dropna().astype(str).reset_index(drop=True)
+        self.cache_key = self._corpus_cache_key(corpus)
+        self.cache_path = os.path.join(self.cache_dir, f"tfidf_{self.mode.lower()}_{self.cache_key}.npz")
+
+        if os.path.exists(self.cache_path):
+            print(f"Cargando TF-IDF ajustado desde caché: {self.cache_path}")
+            return self.load_fitted_vectorizer(self.cache_path)
+
+        # Solo un reajuste necesita recorrer el corpus completo
+        corpus = pd.Series(corpus).dropna().astype(str).reset_index(drop=True)
+        print(f"Ajustando TF-IDF sobre el corpus ({len(corpus)} respuestas)...")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if self.mode == "HASHING":
+            vectorizer = HashingTfidfVectorizer(self.hashing_features).fit(corpus)
+            np.savez_compressed(
+                self.cache_path,
+                n_features=np.array(vectorizer.n_features),
+                idf=vectorizer.idf,
+                cache_key=np.array(self.cache_key)
+            )
+        else:
+            vectorizer = TfidfVectorizer(**self._corpus_params())
+            vectorizer.fit(corpus)
+            np.savez_compressed(
+                self.cache_path,
+                terms=vectorizer.get_feature_names_out().astype(str),
+                idf=vectorizer.idf_,
+                cache_key=np.array(self.cache_key)
+            )
+        print(f"TF-IDF ajustado guardado en: {self.cache_path}")
+        return vectorizer
+
+    def load_fitted_vectorizer(self, path: str):
+        fitted = np.load(path, allow_pickle=False)
+        if 'cache_key' in fitted.files:
+            self.cache_key = str(fitted['cache_key'])
+        if self.mode == "HASHING":
+            return HashingTfidfVectorizer(int(fitted['n_features']), fitted['idf'])
+
+        vocabulary = {term: i for i, term in enumerate(fitted['terms'].tolist())}
+        params = self._corpus_params()
+        params.pop('max_features')
+        vectorizer = TfidfVectorizer(vocabulary=vocabulary, **params)
+        vectorizer.idf_ = fitted['idf']
+        return vectorizer
+
+    def attach_reference_vectors(self, path: str) -> bool:
+        if self.mode not in FITTED_MODES:
+            print(f"Advertencia: Los vectores de referencia solo se usan en los modos {', '.join(FITTED_MODES)} (modo actual: {self.mode}).")
+            return False
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            print(f"Advertencia: No se encontraron vectores de referencia en {path}.")
+            return False
+
+        reference_vectors = ReferenceVectors(path)
+        if reference_vectors.scorer_key != self.cache_key:
+            print(f"Advertencia: Los vectores de referencia en {path} fueron construidos con otro TF-IDF. Ignorándolos.")
+            print("Reconstrúyelos con: python scripts/build_reference_vectors.py")
+            return False
+
+        self.reference_vectors = reference_vectors
+        return True
+
+    def _similarity_with_reference(self, question_id: str, llm_answer, vectorizer) -> float:
+        reference_indices, reference_data = self.reference_vectors.get_row(question_id)
+        answer_vector = vectorizer.transform([llm_answer])
+        answer_vector.sort_indices()
+
+        _, reference_positions, answer_positions = np.intersect1d(
+            reference_indices, answer_vector.indices, assume_unique=True, return_indices=True
         )
-        print("ScoreCalculator inicializado con TF-IDF y similitud de coseno.")
+        return float(np.dot(reference_data[reference_positions], answer_vector.data[answer_positions]))
+
+    def has_reference(self, question_id: str) -> bool:
+        return self.reference_vectors is not None and question_id is not None and question_id in self.reference_vectors
+
+    def calculate_similarity(self, original_answer: str, llm_answer: str, question_id: str = None) -> float:
+        return self._similarity(original_answer, llm_answer, question_id, self.vectorizer)
+
+    def calculate_similarity_tokens(self, original_tokens, answer_tokens, question_id: str = None) -> float:
+        # Mismo score a partir de los tokens que ya calculó MetricEngine, sin volver a tokenizar los textos
+        return self._similarity(original_tokens, answer_tokens, question_id, self.token_vectorizer)
 
-    def calculate_similarity(self, original_answer: str, llm_answer: str) -> float:
+    def _similarity(self, original_answer, llm_answer, question_id: str, vectorizer) -> float:
         try:
+            if self.has_reference(question_id) and llm_answer:
+                # La respuesta original ya está vectorizada: solo se vectoriza la del LLM
+                similarity = self._similarity_with_reference(question_id, llm_answer, vectorizer)
+                return round(max(0.0, min(1.0, similarity)), 4)
+
             if not original_answer or not llm_answer:
                 print("Advertencia: Una de las respuestas está vacía. Retornando score 0.")
                 return 0.0
 
-            tfidf_matrix = self.vectorizer.fit_transform([original_answer, llm_answer])
-            
-            similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-            
+            if self.mode in FITTED_MODES:
+                # Las filas ya vienen normalizadas (L2), el coseno es el producto punto
+                tfidf_matrix = vectorizer.transform([original_answer, llm_answer])
+                similarity = tfidf_matrix[0].multiply(tfidf_matrix[1]).sum()
+            else:
+                tfidf_matrix = vectorizer.fit_transform([original_answer, llm_answer])
+                similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
+
             similarity = max(0.0, min(1.0, similarity))
-            
+
             return round(similarity, 4)
         except Exception as e:
             print(f"Error al calcular similitud: {e}")
             return 0.0
 
-    def calculate_score(self, original_answer: str, llm_answer: str) -> float:
-        return self.calculate_similarity(original_answer, llm_answer)
+    def calculate_score(self, original_answer: str, llm_answer: str, question_id: str = None) -> float:
+        return self.calculate_similarity(original_answer, llm_answer, question_id)
+
+    def _scores_with_references(self, question_ids, answers, scores: np.ndarray) -> np.ndarray:
+        reference_matrix, found = self.reference_vectors.get_matrix(question_ids)
+        found_answers = [answers[i] for i in np.flatnonzero(found)]
+        answer_matrix = self.vectorizer.transform([answer if isinstance(answer, str) else "" for answer in found_answers])
+        similarities = np.asarray(reference_matrix.multiply(answer_matrix).sum(axis=1)).ravel()
+        scores[found] = np.round(np.clip(similarities, 0.0, 1.0), 4)
+        return found
+
+    def calculate_scores_batch(self, originals, answers, question_ids=None) -> np.ndarray:
+        originals = list(originals)
+        answers = list(answers)
+        if len(originals) != len(answers):
+            raise ValueError(f"Las listas deben tener el mismo largo ({len(originals)} originales, {len(answers)} respuestas).")
+
+        scores = np.zeros(len(originals), dtype=np.float64)
+        if self.mode == "PAIR":
+            # En modo PAIR cada par tiene su propio vocabulario, no se puede vectorizar el lote
+            for i, (original, answer) in enumerate(zip(originals, answers)):
+                scores[i] = self.calculate_similarity(original, answer)
+            return scores
+
+        pending = np.ones(len(originals), dtype=bool)
+        if self.reference_vectors is not None and question_ids is not None:
+            pending = ~self._scores_with_references(list(question_ids), answers, scores)
+
+        valid = [i for i, (original, answer) in enumerate(zip(originals, answers))
+                 if pending[i] and isinstance(original, str) and isinstance(answer, str) and original and answer]
+        if not valid:
+            return scores
+
+        # Una sola pasada de vectorización: primero los originales, luego las respuestas
+        tfidf_matrix = self.vectorizer.transform([originals[i] for i in valid] + [answers[i] for i in valid])
+        n_valid = len(valid)
+        similarities = np.asarray(tfidf_matrix[:n_valid].multiply(tfidf_matrix[n_valid:]).sum(axis=1)).ravel()
+        scores[valid] = np.round(np.clip(similarities, 0.0, 1.0), 4)
+        return scores
 
 
 if __name__ == "__main__":
     print("--- Probando src/score_calculator.py ---")
-    
-    calculator = ScoreCalculator()
-    
+
+    calculator = ScoreCalculator(mode="PAIR")
+
     original_1 = "Paris is the capital of France."
     llm_1 = "The capital of France is Paris."
     score_1 = calculator.calculate_score(original_1, llm_1)
@@ -45,7 +295,7 @@ if __name__ == "__main__":
     print(f"LLM: {llm_1}")
     print(f"Score: {score_1}")
     assert score_1 > 0.5, "El score debería ser alto para respuestas similares."
-    
+
     original_2 = "Paris is the capital of France."
     llm_2 = "The sun is a star in our solar system."
     score_2 = calculator.calculate_score(original_2, llm_2)
@@ -54,7 +304,7 @@ if __name__ == "__main__":
     print(f"LLM: {llm_2}")
     print(f"Score: {score_2}")
     assert score_2 < 0.5, "El score debería ser bajo para respuestas diferentes."
-    
+
     original_3 = "Photosynthesis is the process by which plants convert light into energy."
     llm_3 = "Photosynthesis is the process by which plants convert light into energy."
     score_3 = calculator.calculate_score(original_3, llm_3)
@@ -63,5 +313,72 @@ if __name__ == "__main__":
     print(f"LLM: {llm_3}")
     print(f"Score: {score_3}")
     assert score_3 > 0.9, "El score debería ser muy alto para respuestas idénticas."
-    
+
+    import tempfile
+    corpus = [original_1, original_2, original_3, llm_2, "Plants need water and sunlight to grow."]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        corpus_calculator = ScoreCalculator(mode="CORPUS", corpus=corpus, cache_dir=cache_dir)
+        score_4 = corpus_calculator.calculate_score(original_1, llm_1)
+        cached_calculator = ScoreCalculator(mode="CORPUS", corpus=corpus, cache_dir=cache_dir)
+        print(f"\nPrueba 4 - Modo CORPUS (ajustado y desde caché): {score_4}")
+        assert score_4 == cached_calculator.calculate_score(original_1, llm_1), "El TF-IDF cargado desde caché debería dar el mismo score."
+        assert score_4 > 0.9, "El score debería ser alto para respuestas con el mismo vocabulario."
+
+        batch_scores = corpus_calculator.calculate_scores_batch([original_1, original_2, ""], [llm_1, llm_2, llm_3])
+        print(f"\nPrueba 5 - Scoring en lote: {batch_scores}")
+        assert batch_scores[0] == score_4, "El scoring en lote debería coincidir con el scoring individual."
+        score_5 = corpus_calculator.calculate_score(original_2, llm_2)
+        assert batch_scores[1] == score_5, "El scoring en lote debería coincidir con el scoring individual."
+        assert batch_scores[2] == 0.0, "Un par con una respuesta vacía debería tener score 0."
+
+        references_dataset = pd.DataFrame({'best_answer': corpus}, index=[7, 8, 9, 10, 11])
+        ReferenceVectors.build(references_dataset, corpus_calculator, os.path.join(cache_dir, 'refs'))
+        assert corpus_calculator.attach_reference_vectors(os.path.join(cache_dir, 'refs')), "Los vectores de referencia deberían ser compatibles."
+        score_6 = corpus_calculator.calculate_score(None, llm_1, question_id="q_7")
+        print(f"\nPrueba 6 - Score contra vector de referencia precalculado: {score_6}")
+        assert score_6 == score_4, "El score con vector de referencia debería coincidir con el score completo."
+        batch_scores = corpus_calculator.calculate_scores_batch([original_1, original_2], [llm_1, llm_2], ["q_7", "q_99"])
+        assert batch_scores[0] == score_4 and batch_scores[1] == score_5, "El lote con referencias debería coincidir con el scoring individual."
+
+        hashing_calculator = ScoreCalculator(mode="HASHING", corpus=corpus, cache_dir=cache_dir, hashing_features=2**12)
+        score_7 = hashing_calculator.calculate_score(original_1, llm_1)
+        score_8 = hashing_calculator.calculate_score(original_2, llm_2)
+        print(f"\nPrueba 7 - Modo HASHING: similares={score_7}, diferentes={score_8}")
+        assert score_7 > 0.9 and score_8 < 0.5, "El modo HASHING debería ordenar los pares igual que el modo CORPUS."
+        worker_calculator = ScoreCalculator(mode="HASHING", fitted_path=hashing_calculator.cache_path)
+        assert worker_calculator.calculate_score(original_1, llm_1) == score_7, "El TF-IDF de hashing cargado desde disco debería dar el mismo score."
+
+        # Los tokens de MetricEngine dan el mismo score que el analizador de sklearn sobre el texto
+        from src.metric_engine import TokenizedText
+        for tokens_calculator in (calculator, corpus_calculator, hashing_calculator):
+            for original, answer in [(original_1, llm_1), (original_2, llm_2), (original_3, llm_3)]:
+                assert tokens_calculator.calculate_similarity_tokens(TokenizedText(original).tokens, TokenizedText(answer).tokens) == \
+                    tokens_calculator.calculate_score(original, answer), f"Modo {tokens_calculator.mode}: el score sobre tokens no coincide."
+        assert corpus_calculator.calculate_similarity_tokens(None, TokenizedText(llm_1).tokens, question_id="q_7") == score_6, \
+            "El score sobre tokens con vector de referencia no coincide."
+        print("\nPrueba 8 - Scores sobre tokens ya calculados: iguales en los modos PAIR, CORPUS y HASHING")
+
+        # Columna perezosa del caché columnar: con el TF-IDF ya en disco no se lee ninguna fila
+        from src.dataset_cache import TextColumn
+
+        class CountingColumn(TextColumn):
+            reads = 0
+
+            def __getitem__(self, row: int) -> str:
+                CountingColumn.reads += 1
+                return super().__getitem__(row)
+
+        encoded = [answer.encode('utf-8') for answer in corpus]
+        offsets = np.concatenate([[0], np.cumsum([len(value) for value in encoded])]).astype(np.int64)
+        lazy_corpus = CountingColumn(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8), fingerprint="sha256:123:1:best_answer")
+        for mode in FITTED_MODES:
+            fitted_calculator = ScoreCalculator(mode=mode, corpus=lazy_corpus, cache_dir=cache_dir)
+            reads_after_fit = CountingColumn.reads
+            assert reads_after_fit > 0, "El primer ajuste sí debe leer el corpus."
+            lazy_calculator = ScoreCalculator(mode=mode, corpus=lazy_corpus, cache_dir=cache_dir)
+            assert CountingColumn.reads == reads_after_fit, f"Modo {mode}: cargar el TF-IDF desde caché no debería materializar la columna."
+            assert lazy_calculator.cache_key == fitted_calculator.cache_key, "La clave debería salir de la huella de la columna."
+            assert lazy_calculator.calculate_score(original_1, llm_1) == fitted_calculator.calculate_score(original_1, llm_1)
+        print(f"\nPrueba 9 - Columna perezosa: TF-IDF desde caché sin leer filas ({CountingColumn.reads} lecturas solo en los ajustes)")
+
     print("\nPruebas de ScoreCalculator completadas exitosamente.")
@@ -0,0 +1,127 @@
+from concurrent.futures import ProcessPoolExecutor
+from config import settings
+from datetime import datetime
+import threading
+import time
+
+_worker_engine = None
+
+def _init_worker(mode: str, fitted_path: str, reference_vectors_path: str, metrics: list):
+    # Cada proceso del pool crea su propio ScoreCalculator y MetricEngine una sola vez
+    global _worker_engine
+    from src.score_calculator import ScoreCalculator
+    from src.metric_engine import MetricEngine
+    scorer = ScoreCalculator(mode=mode, fitted_path=fitted_path)
+    if reference_vectors_path:
+        scorer.attach_reference_vectors(reference_vectors_path)
+    _worker_engine = MetricEngine(metrics=metrics, scorer=scorer)
+
+def _score_in_worker(original_answer: str, llm_answer: str, question_id: str) -> tuple:
+    started_at = time.time()
+    timings_before = dict(_worker_engine.timings)
+    scores = _worker_engine.score(original_answer, llm_answer, question_id)
+    metric_seconds = {name: _worker_engine.timings[name] - timings_before[name] for name in timings_before}
+    return scores, metric_seconds, started_at, time.time() - started_at
+
+class ScoringPipeline:
+    def __init__(self, scorer, on_scored, metrics=settings.SCORING_METRICS, max_workers=settings.SCORING_WORKERS,
+                 queue_size=settings.SCORING_QUEUE_SIZE):
+        self.on_scored = on_scored
+        self.queue_size = queue_size
+        reference_vectors_path = scorer.reference_vectors.path if scorer.reference_vectors is not None else None
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(scorer.mode, scorer.cache_path, reference_vectors_path, metrics)
+        )
+        # Limita cuántas respuestas pueden esperar score al mismo tiempo
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.lock = threading.Lock()
+        self.queue_depth = 0
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'backpressure_waits': 0,
+            'max_queue_depth': 0,
+            'queue_wait_seconds': 0.0,
+            'score_seconds': 0.0,
+            'write_back_seconds': 0.0,
+            'metric_seconds': {}
+        }
+        print(f"ScoringPipeline inicializado: {max_workers} procesos, cola máxima de {queue_size} respuestas")
+
+    def submit(self, question_id: str, original_answer: str, llm_answer: str):
+        if not self.slots.acquire(blocking=False):
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Cola de scoring llena ({self.queue_size}). Esperando...")
+            with self.lock:
+                self.stats['backpressure_waits'] += 1
+            self.slots.acquire()
+
+        submitted_at = time.time()
+        with self.lock:
+            self.queue_depth += 1
+            self.stats['submitted'] += 1
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self.queue_depth)
+
+        future = self.executor.submit(_score_in_worker, original_answer, llm_answer, question_id)
+        future.add_done_callback(lambda f: self._on_done(question_id, submitted_at, f))
+
+    def _on_done(self, question_id: str, submitted_at: float, future):
+        try:
+            scores, metric_seconds, started_at, score_seconds = future.result()
+            write_start = time.time()
+            self.on_scored(question_id, scores)
+            write_back_seconds = time.time() - write_start
+            with self.lock:
+                for name, seconds in metric_seconds.items():
+                    self.stats['metric_seconds'][name] = self.stats['metric_seconds'].get(name, 0.0) + seconds
+                self.stats['completed'] += 1
+                self.stats['queue_wait_seconds'] += max(0.0, started_at - submitted_at)
+                self.stats['score_seconds'] += score_seconds
+                self.stats['write_back_seconds'] += write_back_seconds
+        except Exception as e:
+            print(f"Error en el scoring asíncrono para {question_id}: {e}")
+            with self.lock:
+                self.stats['failed'] += 1
+        finally:
+            with self.lock:
+                self.queue_depth -= 1
+            self.slots.release()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['metric_seconds'] = dict(self.stats['metric_seconds'])
+            stats['queue_depth'] = self.queue_depth
+        completed = max(1, stats['completed'])
+        stats['avg_queue_wait_seconds'] = stats['queue_wait_seconds'] / completed
+        stats['avg_score_seconds'] = stats['score_seconds'] / completed
+        stats['avg_write_back_seconds'] = stats['write_back_seconds'] / completed
+        return stats
+
+    def close(self):
+        print(f"Esperando a que terminen {self.queue_depth} scores pendientes...")
+        self.executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    print("--- Probando src/scoring_pipeline.py ---")
+    from src.score_calculator import ScoreCalculator
+
+    scores = {}
+    pipeline = ScoringPipeline(ScoreCalculator(mode="PAIR"),
+                               lambda question_id, metric_scores: scores.update({question_id: metric_scores['tfidf_cosine']}),
+                               metrics=['tfidf_cosine', 'token_f1'], max_workers=2, queue_size=2)
+
+    pipeline.submit("q_test_001", "Paris is the capital of France.", "The capital of France is Paris.")
+    pipeline.submit("q_test_002", "Paris is the capital of France.", "The sun is a star in our solar system.")
+    pipeline.submit("q_test_003", "Plants convert light into energy.", "Plants convert light into energy.")
+    pipeline.close()
+
+    print(f"Scores recibidos: {scores}")
+    print(f"Estadísticas: {pipeline.get_stats()}")
+    assert len(scores) == 3, "Deberían haberse recibido 3 scores."
+    assert scores["q_test_001"] > 0.5 and scores["q_test_002"] < 0.5, "Los scores asíncronos no son los esperados."
+    assert pipeline.get_stats()['queue_depth'] == 0, "La cola debería quedar vacía."
+    print("Pruebas de ScoringPipeline completadas exitosamente.")
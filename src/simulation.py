@@ -0,0 +1,259 @@
+from config import settings
+from collections import OrderedDict
+import numpy as np
+import itertools
+import sqlite3
+import heapq
+import json
+
+LATENCY_MODELS = ('LOGNORMAL', 'SAMPLES')
+# Con el mismo instante, primero vencen los TTL, luego terminan los requests y prefetches en curso y al final llegan los nuevos
+EVENT_PRIORITY = {'expire': 0, 'complete': 1, 'prefetch': 1, 'arrival': 2}
+
+class EventQueue:
+    # Reloj virtual: avanza de evento en evento, sin esperas reales
+    def __init__(self):
+        self.now = 0.0
+        self.events = []
+        self.sequence = itertools.count()
+
+    def schedule(self, at: float, kind: str, payload=None):
+        heapq.heappush(self.events, (at, EVENT_PRIORITY[kind], next(self.sequence), kind, payload))
+
+    def pop(self) -> tuple:
+        at, _, _, kind, payload = heapq.heappop(self.events)
+        self.now = at
+        return kind, payload
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+class SimulatedCache:
+    # Misma interfaz que CacheSystem, en memoria y con el TTL medido en el reloj virtual
+    def __init__(self, events: EventQueue, ttl_seconds=settings.CACHE_TTL_SECONDS, max_size=settings.CACHE_MAX_SIZE,
+                 policy=settings.CACHE_POLICY):
+        self.events = events
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.policy = policy.upper()
+        if self.policy not in ('LRU', 'LFU', 'FIFO'):
+            raise ValueError(f"Política de caché no soportada en simulación: {policy}. Use LRU, LFU o FIFO")
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.frequencies = {}
+        # LFU: heap con (frecuencia, orden, key); las entradas desactualizadas se descartan al desalojar
+        self.lfu_heap = []
+        self.sequence = itertools.count()
+        self.evictions = 0
+        self.expirations = 0
+        print(f"CacheSystem simulado: TTL={ttl_seconds}s, MaxSize={max_size}, Policy={self.policy}")
+
+    def _touch(self, key: str):
+        if self.policy == 'LRU':
+            self.entries.move_to_end(key)
+        elif self.policy == 'LFU':
+            self.frequencies[key] += 1
+            heapq.heappush(self.lfu_heap, (self.frequencies[key], next(self.sequence), key))
+
+    def _evict(self):
+        if self.policy == 'LFU':
+            while self.lfu_heap:
+                frequency, _, key = heapq.heappop(self.lfu_heap)
+                if self.frequencies.get(key) == frequency:
+                    break
+        else:
+            key = next(iter(self.entries))
+        self._remove(key)
+        self.evictions += 1
+
+    def _remove(self, key: str):
+        del self.entries[key]
+        del self.versions[key]
+        self.frequencies.pop(key, None)
+
+    def get(self, key: str):
+        value = self.entries.get(key)
+        if value is None:
+            return None
+        self._touch(key)
+        return json.loads(value)
+
+    def contains(self, key: str) -> bool:
+        return key in self.entries
+
+    def set(self, key: str, value: dict):
+        # Como SETEX: guardar de nuevo una clave reinicia su TTL
+        if key in self.entries:
+            self._touch(key)
+        else:
+            if len(self.entries) >= self.max_size:
+                self._evict()
+            if self.policy == 'LFU':
+                self.frequencies[key] = 1
+                heapq.heappush(self.lfu_heap, (1, next(self.sequence), key))
+        self.entries[key] = json.dumps(value)
+        version = next(self.sequence)
+        self.versions[key] = version
+        self.events.schedule(self.events.now + self.ttl_seconds, 'expire', (key, version))
+
+    def expire(self, key: str, version: int):
+        # Un vencimiento programado antes de reescribir o desalojar la clave ya no aplica
+        if self.versions.get(key) == version:
+            self._remove(key)
+            self.expirations += 1
+
+    def update(self, key: str, fields: dict) -> bool:
+        value = self.entries.get(key)
+        if value is None:
+            return False
+        updated_value = json.loads(value)
+        updated_value.update(fields)
+        self.entries[key] = json.dumps(updated_value)
+        return True
+
+    def invalidate(self, key: str):
+        if key in self.entries:
+            self._remove(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.versions.clear()
+        self.frequencies.clear()
+        self.lfu_heap = []
+
+    def size(self):
+        return len(self.entries)
+
+RECORDED_COLUMNS = ['llm_latency_seconds', 'llm_generated_answer', 'quality_score', 'metric_scores',
+                    'prompt_tokens', 'completion_tokens']
+
+def load_recorded_answers(db_path: str) -> list:
+    # Respuestas reales registradas por un experimento anterior: latencia, texto, tokens y scores
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(f"""
+            SELECT {', '.join(RECORDED_COLUMNS)} FROM query_results
+            WHERE llm_latency_seconds IS NOT NULL AND llm_generated_answer NOT LIKE '[Error:%';
+        """).fetchall()
+    except sqlite3.OperationalError as e:
+        raise ValueError(f"No se pudieron leer respuestas del LLM desde {db_path}: {e}")
+    finally:
+        conn.close()
+    if not rows:
+        raise ValueError(f"{db_path} no tiene latencias del LLM registradas.")
+    return [dict(zip(RECORDED_COLUMNS, row)) for row in rows]
+
+class LatencyModel:
+    def __init__(self, model=settings.SIMULATION_LATENCY_MODEL, median_seconds=settings.SIMULATION_LLM_LATENCY_MEDIAN_SECONDS,
+                 sigma=settings.SIMULATION_LLM_LATENCY_SIGMA, samples_path=settings.SIMULATION_LATENCY_SAMPLES_PATH,
+                 seed=settings.TRAFFIC_SEED):
+        self.model = model.upper()
+        if self.model not in LATENCY_MODELS:
+            raise ValueError(f"Modelo de latencia no soportado: {model}. Disponibles: {', '.join(LATENCY_MODELS)}")
+        self.median_seconds = median_seconds
+        self.sigma = sigma
+        self.samples_path = samples_path
+        self.rng = np.random.default_rng(seed)
+        self.samples = load_recorded_answers(samples_path) if self.model == 'SAMPLES' else None
+
+    def sample(self) -> dict:
+        # Con SAMPLES se repite una respuesta registrada completa, así los scores también son realistas
+        if self.model == 'SAMPLES':
+            return dict(self.samples[self.rng.integers(len(self.samples))])
+        return {'llm_latency_seconds': float(self.median_seconds * np.exp(self.sigma * self.rng.standard_normal()))}
+
+    def describe(self) -> dict:
+        if self.model == 'SAMPLES':
+            return {'model': self.model, 'samples_path': self.samples_path, 'samples': len(self.samples),
+                    'median_seconds': float(np.median([sample['llm_latency_seconds'] for sample in self.samples]))}
+        return {'model': self.model, 'median_seconds': self.median_seconds, 'sigma': self.sigma}
+
+class SimulatedLLM:
+    # Mismo resultado que LLMConnector.generate_answer, con la latencia tomada del modelo y sin llamar a ningún LLM
+    def __init__(self, latency_model: LatencyModel = None, error_rate=settings.SIMULATION_LLM_ERROR_RATE, seed=settings.TRAFFIC_SEED):
+        self.latency_model = latency_model or LatencyModel(seed=seed)
+        self.error_rate = error_rate
+        self.rng = np.random.default_rng(None if seed is None else seed + 1)
+        self.model_id = f"simulated:{self.latency_model.model.lower()}"
+        self.warmup_seconds = 0.0
+        self.baseline_latency_seconds = None
+
+    def generate_answer(self, question_title: str, question_content: str) -> dict:
+        # Además de las claves de LLMConnector incluye los scores de la respuesta registrada, si la hay
+        sample = self.latency_model.sample()
+        failed = self.error_rate > 0 and self.rng.random() < self.error_rate
+        metric_scores = sample.get('metric_scores')
+        return {
+            'answer': "[Error: fallo simulado del LLM]" if failed else sample.get('llm_generated_answer') or f"[Simulado] {question_title}",
+            'prompt_tokens': sample.get('prompt_tokens'),
+            'completion_tokens': sample.get('completion_tokens'),
+            'llm_latency_seconds': round(sample['llm_latency_seconds'], 4),
+            'llm_retries': 0,
+            'rate_limit_wait_seconds': 0.0,
+            'quality_score': sample.get('quality_score'),
+            'metric_scores': json.loads(metric_scores) if metric_scores else None
+        }
+
+
+if __name__ == "__main__":
+    print("--- Probando src/simulation.py ---")
+
+    events = EventQueue()
+    cache = SimulatedCache(events, ttl_seconds=10, max_size=2, policy='LRU')
+    cache.set('a', {'answer': 1})
+    cache.set('b', {'answer': 2})
+    cache.get('a')
+    cache.set('c', {'answer': 3})
+    assert cache.get('b') is None and cache.get('a') == {'answer': 1}, "LRU debería desalojar la clave menos usada."
+
+    # El TTL vence en tiempo virtual al procesar los eventos
+    events.schedule(5, 'arrival')
+    events.pop()
+    cache.set('a', {'answer': 1})
+    while events:
+        kind, payload = events.pop()
+        if kind == 'expire':
+            cache.expire(*payload)
+    assert cache.size() == 0 and cache.expirations == 2 and events.now == 15, "Las claves deberían vencer en t=10 y t=15."
+
+    lfu = SimulatedCache(EventQueue(), ttl_seconds=10, max_size=2, policy='LFU')
+    lfu.set('a', {})
+    lfu.set('b', {})
+    lfu.get('a')
+    lfu.set('c', {})
+    assert lfu.get('b') is None and lfu.get('a') == {}, "LFU debería desalojar la clave menos frecuente."
+
+    fifo = SimulatedCache(EventQueue(), ttl_seconds=10, max_size=2, policy='FIFO')
+    fifo.set('a', {})
+    fifo.set('b', {})
+    fifo.get('a')
+    fifo.set('c', {})
+    assert fifo.get('a') is None and fifo.get('b') == {}, "FIFO debería desalojar la clave más antigua."
+
+    latency_model = LatencyModel(model='LOGNORMAL', median_seconds=2.0, sigma=0.5, seed=7)
+    latencies = np.array([latency_model.sample()['llm_latency_seconds'] for _ in range(10000)])
+    print(f"Latencia simulada: mediana {np.median(latencies):.3f}s, p99 {np.percentile(latencies, 99):.3f}s")
+    assert abs(np.median(latencies) - 2.0) < 0.1, "La mediana debería acercarse a la configurada."
+
+    llm = SimulatedLLM(latency_model, error_rate=0.1, seed=7)
+    errors = sum(llm.generate_answer("t", "c")['answer'].startswith("[Error:") for _ in range(5000))
+    print(f"Errores simulados: {errors}/5000")
+    assert 400 < errors < 600, "La tasa de errores debería acercarse a la configurada."
+
+    import tempfile
+    import os
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(os.path.join(tmp_dir, 'recorded.db'))
+        conn.execute("CREATE TABLE query_results (question_id TEXT, llm_latency_seconds REAL, llm_generated_answer TEXT, "
+                     "quality_score REAL, metric_scores TEXT, prompt_tokens INTEGER, completion_tokens INTEGER);")
+        conn.executemany("INSERT INTO query_results VALUES (?, ?, ?, ?, ?, ?, ?);", [
+            ('q_1', 1.5, 'Respuesta', 0.4, '{"tfidf_cosine": 0.4}', 10, 20),
+            ('q_2', 30.0, '[Error: timeout]', None, None, None, None)
+        ])
+        conn.commit()
+        conn.close()
+        recorded = SimulatedLLM(LatencyModel(model='SAMPLES', samples_path=os.path.join(tmp_dir, 'recorded.db'), seed=7), error_rate=0.0)
+        answer = recorded.generate_answer("t", "c")
+        print(f"Respuesta registrada: {answer}")
+        assert answer['llm_latency_seconds'] == 1.5 and answer['metric_scores'] == {'tfidf_cosine': 0.4}, "Debería repetir la respuesta registrada sin errores."
+    print("Pruebas de simulation completadas exitosamente.")
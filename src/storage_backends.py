@@ -0,0 +1,582 @@
+from config import settings
+from contextlib import contextmanager
+import sqlite3
+import threading
+import csv
+import io
+import os
+
+LLM_ACCOUNTING_COLUMNS = {
+    'prompt_tokens': 'INTEGER',
+    'completion_tokens': 'INTEGER',
+    'llm_latency_seconds': 'REAL',
+    'llm_retries': 'INTEGER',
+    'rate_limit_wait_seconds': 'REAL'
+}
+
+# Columnas propias de cada respuesta generada (una fila por pregunta y modelo)
+ANSWER_COLUMNS = ['llm_generated_answer', 'quality_score', 'timestamp'] + list(LLM_ACCOUNTING_COLUMNS) + ['metric_scores']
+QUESTION_COLUMNS = ['question_title', 'question_content', 'original_best_answer']
+
+REQUEST_STAGES = ['cache_lookup', 'llm', 'scoring', 'db_write', 'cache_write']
+EVENT_LATENCY_COLUMNS = ['latency_seconds'] + [f"{stage}_seconds" for stage in REQUEST_STAGES]
+EVENT_COLUMNS = ['ts', 'question_id', 'model', 'hit', 'cache_tier', 'error'] + EVENT_LATENCY_COLUMNS
+
+DEFAULT_MODEL = 'unknown'
+LEGACY_TABLE = 'query_results_legacy'
+
+QUERY_RESULTS_SELECT = """
+    SELECT
+        a.*,
+        q.question_title,
+        q.question_content,
+        q.original_best_answer,
+        (SELECT COUNT(*) FROM request_events e WHERE e.question_id = a.question_id) AS request_count
+    FROM answers a
+    JOIN questions q ON q.question_id = a.question_id
+"""
+
+# Índices cubrientes: request_count por pregunta, hit rate en el tiempo y percentiles de latencia
+INDEX_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS idx_request_events_question ON request_events(question_id);",
+    "CREATE INDEX IF NOT EXISTS idx_request_events_ts_hit ON request_events(ts, hit);",
+    "CREATE INDEX IF NOT EXISTS idx_request_events_latency ON request_events(latency_seconds);",
+    "CREATE INDEX IF NOT EXISTS idx_request_events_hit_latency ON request_events(hit, latency_seconds);",
+    "CREATE INDEX IF NOT EXISTS idx_answers_quality_score ON answers(quality_score);"
+]
+
+# Solo la primera vez (o en bases creadas antes de store_stats) se calculan los agregados completos
+STORE_STATS_INIT = """
+    INSERT INTO store_stats (id, questions, answers, scored_answers, quality_score_sum, requests, cache_hits, errors)
+    SELECT
+        1,
+        (SELECT COUNT(*) FROM questions),
+        (SELECT COUNT(*) FROM answers),
+        (SELECT COUNT(quality_score) FROM answers),
+        (SELECT COALESCE(SUM(quality_score), 0) FROM answers),
+        (SELECT COUNT(*) FROM request_events),
+        (SELECT COALESCE(SUM(hit), 0) FROM request_events),
+        (SELECT COALESCE(SUM(error), 0) FROM request_events)
+    WHERE NOT EXISTS (SELECT 1 FROM store_stats);
+    """
+
+# Parámetros de cada experimento (modelo de popularidad, etc.) guardados junto a sus resultados
+EXPERIMENT_METADATA_STATEMENT = """
+    CREATE TABLE IF NOT EXISTS experiment_metadata (
+        name TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+SQLITE_SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS questions (
+        question_id TEXT PRIMARY KEY,
+        question_title TEXT,
+        question_content TEXT,
+        original_best_answer TEXT
+    );
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS answers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question_id TEXT NOT NULL REFERENCES questions(question_id),
+        model TEXT NOT NULL,
+        llm_generated_answer TEXT,
+        quality_score REAL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        {', '.join(f'{column} {column_type}' for column, column_type in LLM_ACCOUNTING_COLUMNS.items())},
+        metric_scores TEXT,
+        UNIQUE(question_id, model)
+    );
+    """,
+    # Log de solo inserción: una fila por request, hit o miss
+    f"""
+    CREATE TABLE IF NOT EXISTS request_events (
+        id INTEGER PRIMARY KEY,
+        ts REAL,
+        question_id TEXT NOT NULL,
+        model TEXT,
+        hit INTEGER NOT NULL,
+        cache_tier TEXT,
+        error INTEGER NOT NULL DEFAULT 0,
+        {', '.join(f'{column} REAL' for column in EVENT_LATENCY_COLUMNS)}
+    );
+    """,
+    *INDEX_STATEMENTS,
+    # Agregados mantenidos por triggers para que stats() no tenga que recorrer las tablas
+    """
+    CREATE TABLE IF NOT EXISTS store_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        questions INTEGER NOT NULL,
+        answers INTEGER NOT NULL,
+        scored_answers INTEGER NOT NULL,
+        quality_score_sum REAL NOT NULL,
+        requests INTEGER NOT NULL,
+        cache_hits INTEGER NOT NULL,
+        errors INTEGER NOT NULL
+    );
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_questions_insert AFTER INSERT ON questions BEGIN
+        UPDATE store_stats SET questions = questions + 1 WHERE id = 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_questions_delete AFTER DELETE ON questions BEGIN
+        UPDATE store_stats SET questions = questions - 1 WHERE id = 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_answers_insert AFTER INSERT ON answers BEGIN
+        UPDATE store_stats SET
+            answers = answers + 1,
+            scored_answers = scored_answers + (NEW.quality_score IS NOT NULL),
+            quality_score_sum = quality_score_sum + COALESCE(NEW.quality_score, 0)
+        WHERE id = 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_answers_score_update AFTER UPDATE OF quality_score ON answers BEGIN
+        UPDATE store_stats SET
+            scored_answers = scored_answers + (NEW.quality_score IS NOT NULL) - (OLD.quality_score IS NOT NULL),
+            quality_score_sum = quality_score_sum + COALESCE(NEW.quality_score, 0) - COALESCE(OLD.quality_score, 0)
+        WHERE id = 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_answers_delete AFTER DELETE ON answers BEGIN
+        UPDATE store_stats SET
+            answers = answers - 1,
+            scored_answers = scored_answers - (OLD.quality_score IS NOT NULL),
+            quality_score_sum = quality_score_sum - COALESCE(OLD.quality_score, 0)
+        WHERE id = 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_request_events_insert AFTER INSERT ON request_events BEGIN
+        UPDATE store_stats SET requests = requests + 1, cache_hits = cache_hits + NEW.hit, errors = errors + NEW.error
+        WHERE id = 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_request_events_delete AFTER DELETE ON request_events BEGIN
+        UPDATE store_stats SET requests = requests - 1, cache_hits = cache_hits - OLD.hit, errors = errors - OLD.error
+        WHERE id = 1;
+    END;
+    """,
+    STORE_STATS_INIT,
+    # Vista compatible con la tabla query_results original (a.* incluye columnas agregadas después)
+    f"CREATE VIEW IF NOT EXISTS query_results AS {QUERY_RESULTS_SELECT};",
+    EXPERIMENT_METADATA_STATEMENT
+]
+
+POSTGRES_TYPES = {'INTEGER': 'BIGINT', 'REAL': 'DOUBLE PRECISION', 'DATETIME': 'TEXT'}
+
+def _postgres_type(column_type: str) -> str:
+    return POSTGRES_TYPES.get(column_type.upper(), column_type)
+
+# En PostgreSQL store_stats tiene una fila por shard y cada conexión actualiza la suya, para que varios
+# procesos no se serialicen en una sola fila; los triggers son por sentencia (un COPY actualiza una vez)
+POSTGRES_STATS_SHARDS = 16
+POSTGRES_STATS_SHARD_SQL = f"pg_backend_pid() % {POSTGRES_STATS_SHARDS}"
+
+POSTGRES_STATS_FUNCTIONS = [
+    f"""
+    CREATE OR REPLACE FUNCTION store_stats_questions() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE store_stats SET questions = questions + (SELECT COUNT(*) FROM new_rows) WHERE id = {POSTGRES_STATS_SHARD_SQL};
+        ELSE
+            UPDATE store_stats SET questions = questions - (SELECT COUNT(*) FROM old_rows) WHERE id = {POSTGRES_STATS_SHARD_SQL};
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION store_stats_answers() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE store_stats s SET
+                answers = s.answers + n.row_count,
+                scored_answers = s.scored_answers + n.scored,
+                quality_score_sum = s.quality_score_sum + n.score_sum
+            FROM (SELECT COUNT(*) AS row_count, COUNT(quality_score) AS scored,
+                         COALESCE(SUM(quality_score), 0) AS score_sum FROM new_rows) n
+            WHERE s.id = {POSTGRES_STATS_SHARD_SQL};
+        ELSIF TG_OP = 'UPDATE' THEN
+            UPDATE store_stats s SET
+                scored_answers = s.scored_answers + n.scored - o.scored,
+                quality_score_sum = s.quality_score_sum + n.score_sum - o.score_sum
+            FROM (SELECT COUNT(quality_score) AS scored, COALESCE(SUM(quality_score), 0) AS score_sum FROM new_rows) n,
+                 (SELECT COUNT(quality_score) AS scored, COALESCE(SUM(quality_score), 0) AS score_sum FROM old_rows) o
+            WHERE s.id = {POSTGRES_STATS_SHARD_SQL};
+        ELSE
+            UPDATE store_stats s SET
+                answers = s.answers - o.row_count,
+                scored_answers = s.scored_answers - o.scored,
+                quality_score_sum = s.quality_score_sum - o.score_sum
+            FROM (SELECT COUNT(*) AS row_count, COUNT(quality_score) AS scored,
+                         COALESCE(SUM(quality_score), 0) AS score_sum FROM old_rows) o
+            WHERE s.id = {POSTGRES_STATS_SHARD_SQL};
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION store_stats_request_events() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE store_stats s SET requests = s.requests + n.row_count, cache_hits = s.cache_hits + n.hits, errors = s.errors + n.errors
+            FROM (SELECT COUNT(*) AS row_count, COALESCE(SUM(hit), 0) AS hits, COALESCE(SUM(error), 0) AS errors FROM new_rows) n
+            WHERE s.id = {POSTGRES_STATS_SHARD_SQL};
+        ELSE
+            UPDATE store_stats s SET requests = s.requests - o.row_count, cache_hits = s.cache_hits - o.hits, errors = s.errors - o.errors
+            FROM (SELECT COUNT(*) AS row_count, COALESCE(SUM(hit), 0) AS hits, COALESCE(SUM(error), 0) AS errors FROM old_rows) o
+            WHERE s.id = {POSTGRES_STATS_SHARD_SQL};
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+]
+
+POSTGRES_STATS_TRIGGERS = [
+    ('questions', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('questions', 'DELETE', 'OLD TABLE AS old_rows'),
+    ('answers', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('answers', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('answers', 'DELETE', 'OLD TABLE AS old_rows'),
+    ('request_events', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('request_events', 'DELETE', 'OLD TABLE AS old_rows')
+]
+
+POSTGRES_SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS questions (
+        question_id TEXT PRIMARY KEY,
+        question_title TEXT,
+        question_content TEXT,
+        original_best_answer TEXT
+    );
+    """,
+    # timestamp se guarda como texto ISO 8601, igual que en SQLite
+    f"""
+    CREATE TABLE IF NOT EXISTS answers (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        question_id TEXT NOT NULL REFERENCES questions(question_id),
+        model TEXT NOT NULL,
+        llm_generated_answer TEXT,
+        quality_score DOUBLE PRECISION,
+        timestamp TEXT,
+        {', '.join(f'{column} {_postgres_type(column_type)}' for column, column_type in LLM_ACCOUNTING_COLUMNS.items())},
+        metric_scores TEXT,
+        UNIQUE(question_id, model)
+    );
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS request_events (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        ts DOUBLE PRECISION,
+        question_id TEXT NOT NULL,
+        model TEXT,
+        hit INTEGER NOT NULL,
+        cache_tier TEXT,
+        error INTEGER NOT NULL DEFAULT 0,
+        {', '.join(f'{column} DOUBLE PRECISION' for column in EVENT_LATENCY_COLUMNS)}
+    );
+    """,
+    *INDEX_STATEMENTS,
+    """
+    CREATE TABLE IF NOT EXISTS store_stats (
+        id INTEGER PRIMARY KEY,
+        questions BIGINT NOT NULL,
+        answers BIGINT NOT NULL,
+        scored_answers BIGINT NOT NULL,
+        quality_score_sum DOUBLE PRECISION NOT NULL,
+        requests BIGINT NOT NULL,
+        cache_hits BIGINT NOT NULL,
+        errors BIGINT NOT NULL
+    );
+    """,
+    *POSTGRES_STATS_FUNCTIONS,
+    *[statement for table, operation, transition in POSTGRES_STATS_TRIGGERS for statement in (
+        f"DROP TRIGGER IF EXISTS trg_{table}_{operation.lower()} ON {table};",
+        f"""
+        CREATE TRIGGER trg_{table}_{operation.lower()} AFTER {operation} ON {table}
+        REFERENCING {transition} FOR EACH STATEMENT EXECUTE FUNCTION store_stats_{table}();
+        """
+    )],
+    STORE_STATS_INIT,
+    f"""
+    INSERT INTO store_stats (id, questions, answers, scored_answers, quality_score_sum, requests, cache_hits, errors)
+    SELECT shard, 0, 0, 0, 0, 0, 0, 0 FROM generate_series(0, {POSTGRES_STATS_SHARDS - 1}) AS shard
+    ON CONFLICT (id) DO NOTHING;
+    """,
+    f"CREATE OR REPLACE VIEW query_results AS {QUERY_RESULTS_SELECT};",
+    EXPERIMENT_METADATA_STATEMENT
+]
+
+# Clave del advisory lock que serializa la creación del esquema entre procesos
+POSTGRES_SCHEMA_LOCK = 4021
+
+def _import_psycopg2():
+    try:
+        import psycopg2
+        import psycopg2.pool
+        import psycopg2.extras
+    except ImportError:
+        raise ImportError("La librería 'psycopg2' no está instalada. Ejecuta: pip install psycopg2-binary")
+    return psycopg2
+
+def is_legacy_database(db_path: str) -> bool:
+    # Consulta de solo lectura para avisar antes de abrir la base con DataStore
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'query_results';").fetchone()
+    finally:
+        conn.close()
+    return row is not None and row[0] == 'table'
+
+class SQLiteBackend:
+    name = 'SQLite'
+    TIME_BUCKET_SQL = "CAST(ts / ? AS INTEGER) * ?"
+
+    def __init__(self, db_path=settings.SQLITE_DB_PATH, migrate_legacy=False):
+        self.db_path = db_path
+        self.description = db_path
+        # Solo scripts/migrate_schema.py migra (con respaldo y verificación); el resto rechaza el esquema anterior
+        # antes de conectarse, porque activar WAL ya reescribe el archivo
+        self.migrate_legacy = migrate_legacy
+        if not migrate_legacy and is_legacy_database(db_path):
+            raise ValueError(f"{db_path} usa el esquema anterior (tabla query_results). "
+                             f"Mígrala con respaldo antes de abrirla: python scripts/migrate_schema.py {db_path}")
+        self._ensure_data_directory_exists()
+        # Una sola conexión para todo el proceso; el lock la comparte entre el hilo principal y el escritor
+        self.lock = threading.RLock()
+        self.conn = self._get_connection()
+        self._create_schema()
+
+    def _ensure_data_directory_exists(self):
+        data_dir = os.path.dirname(self.db_path)
+        if data_dir and not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+
+    def _get_connection(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS};")
+        conn.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB};")
+        conn.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE};")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        with self.lock:
+            try:
+                yield self.conn
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def sql(self, statement: str) -> str:
+        return statement
+
+    def executemany(self, cursor, statement: str, rows: list):
+        cursor.executemany(statement, rows)
+
+    def lock_for_write(self, cursor):
+        # SQLite ya admite un solo escritor a la vez
+        pass
+
+    def insert_events(self, cursor, events: list):
+        cursor.executemany(f"""
+            INSERT INTO request_events ({', '.join(EVENT_COLUMNS)})
+            VALUES ({', '.join('?' * len(EVENT_COLUMNS))});
+        """, events)
+
+    def get_column_types(self, relation: str) -> dict:
+        with self.connection() as conn:
+            return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({relation});").fetchall()}
+
+    def add_column(self, column: str, column_type: str):
+        # Columnas extra de answers (p. ej. las de rescore_results.py); la vista las incluye por a.*
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA table_info(answers);")
+            if column not in {row[1] for row in cursor.fetchall()}:
+                cursor.execute(f"ALTER TABLE answers ADD COLUMN {column} {column_type};")
+                conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _create_schema(self):
+        with self.lock:
+            cursor = self.conn.cursor()
+            # La migración de una base de datos anterior se hace completa o no se hace; IMMEDIATE toma el lock de
+            # escritura de entrada para que varios procesos que arrancan a la vez esperen en lugar de fallar
+            cursor.execute("BEGIN IMMEDIATE;")
+            try:
+                legacy_columns = self._get_legacy_columns(cursor)
+                if legacy_columns:
+                    cursor.execute(f"ALTER TABLE query_results RENAME TO {LEGACY_TABLE};")
+                for statement in SQLITE_SCHEMA_STATEMENTS:
+                    cursor.execute(statement)
+                if legacy_columns:
+                    self._migrate_legacy_rows(cursor, legacy_columns)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def _get_legacy_columns(self, cursor) -> dict:
+        # Las bases de datos anteriores guardan todo en una tabla query_results (ahora es una vista)
+        cursor.execute("SELECT type FROM sqlite_master WHERE name = 'query_results';")
+        row = cursor.fetchone()
+        if row is None or row[0] != 'table':
+            return {}
+        cursor.execute("PRAGMA table_info(query_results);")
+        return {column[1]: column[2] for column in cursor.fetchall()}
+
+    def _migrate_legacy_rows(self, cursor, legacy_columns: dict):
+        print(f"Migrando {self.db_path} al esquema normalizado (questions, answers, request_events)...")
+        question_columns = [column for column in QUESTION_COLUMNS if column in legacy_columns]
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO questions (question_id, {', '.join(question_columns)})
+            SELECT question_id, {', '.join(question_columns)} FROM {LEGACY_TABLE};
+        """)
+
+        # Columnas agregadas a mano (p. ej. por rescore_results.py) se conservan en answers
+        legacy_only = {'id', 'question_id', 'request_count'} | set(QUESTION_COLUMNS)
+        answer_columns = []
+        for column, column_type in legacy_columns.items():
+            if column in legacy_only:
+                continue
+            if column not in ANSWER_COLUMNS:
+                cursor.execute(f"ALTER TABLE answers ADD COLUMN {column} {column_type};")
+            answer_columns.append(column)
+        cursor.execute(f"""
+            INSERT INTO answers (id, question_id, model, {', '.join(answer_columns)})
+            SELECT id, question_id, ?, {', '.join(answer_columns)} FROM {LEGACY_TABLE};
+        """, (DEFAULT_MODEL,))
+
+        # request_count se convierte en un miss seguido de hits; el momento de cada request no se conoce (ts NULL)
+        cursor.execute(f"""
+            WITH RECURSIVE expanded(question_id, n, total) AS (
+                SELECT question_id, 1, COALESCE(request_count, 1) FROM {LEGACY_TABLE}
+                UNION ALL
+                SELECT question_id, n + 1, total FROM expanded WHERE n < total
+            )
+            INSERT INTO request_events (ts, question_id, model, hit)
+            SELECT NULL, question_id, ?, n > 1 FROM expanded;
+        """, (DEFAULT_MODEL,))
+        cursor.execute(f"DROP TABLE {LEGACY_TABLE};")
+        print(f"Migración completada: {cursor.execute('SELECT COUNT(*) FROM answers;').fetchone()[0]} respuestas, "
+              f"{cursor.execute('SELECT COUNT(*) FROM request_events;').fetchone()[0]} requests")
+
+class PostgresBackend:
+    name = 'PostgreSQL'
+    TIME_BUCKET_SQL = "FLOOR(ts / ?) * ?"
+
+    def __init__(self, host=settings.POSTGRES_DB_HOST, port=settings.POSTGRES_DB_PORT, dbname=settings.POSTGRES_DB_NAME,
+                 user=settings.POSTGRES_DB_USER, password=settings.POSTGRES_DB_PASSWORD,
+                 min_connections=settings.POSTGRES_POOL_MIN_CONN, max_connections=settings.POSTGRES_POOL_MAX_CONN):
+        psycopg2 = _import_psycopg2()
+        self.extras = psycopg2.extras
+        # Cada proceso tiene su propio pool; el escritor y las lecturas toman conexiones distintas
+        self.pool = psycopg2.pool.ThreadedConnectionPool(min_connections, max_connections, host=host, port=port,
+                                                         dbname=dbname, user=user, password=password)
+        # ThreadedConnectionPool falla si se agota; el semáforo hace que getconn espere en su lugar
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.description = f"postgresql://{user}@{host}:{port}/{dbname}"
+        self._create_schema()
+
+    @contextmanager
+    def connection(self):
+        with self.slots:
+            conn = self.pool.getconn()
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                # putconn descarta la transacción abierta que haya dejado una lectura
+                self.pool.putconn(conn)
+
+    def sql(self, statement: str) -> str:
+        return statement.replace('?', '%s')
+
+    def lock_for_write(self, cursor):
+        # Tomar primero el shard de store_stats (y después las filas en orden de question_id) evita deadlocks
+        # entre lotes de distintos procesos
+        cursor.execute(f"SELECT 1 FROM store_stats WHERE id = {POSTGRES_STATS_SHARD_SQL} FOR UPDATE;")
+
+    def executemany(self, cursor, statement: str, rows: list):
+        # execute_batch agrupa muchas filas por ida y vuelta al servidor
+        self.extras.execute_batch(cursor, self.sql(statement), rows, page_size=1000)
+
+    def insert_events(self, cursor, events: list):
+        # COPY es la forma más rápida de cargar un lote; None se escribe como campo vacío, que COPY lee como NULL
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(events)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY request_events ({', '.join(EVENT_COLUMNS)}) FROM STDIN WITH (FORMAT csv);", buffer)
+
+    def get_column_types(self, relation: str) -> dict:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT column_name, data_type FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = %s
+                ORDER BY ordinal_position;
+            """, (relation,))
+            return dict(cursor.fetchall())
+
+    def add_column(self, column: str, column_type: str):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_advisory_xact_lock(%s);", (POSTGRES_SCHEMA_LOCK,))
+            if column not in self._answer_columns(cursor):
+                cursor.execute(f"ALTER TABLE answers ADD COLUMN {column} {_postgres_type(column_type)};")
+                # En PostgreSQL a.* se expande al crear la vista, así que hay que recrearla
+                cursor.execute("DROP VIEW IF EXISTS query_results;")
+                cursor.execute(f"CREATE VIEW query_results AS {QUERY_RESULTS_SELECT};")
+            conn.commit()
+
+    def _answer_columns(self, cursor) -> set:
+        cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'answers';
+        """)
+        return {row[0] for row in cursor.fetchall()}
+
+    def close(self):
+        self.pool.closeall()
+
+    def _create_schema(self):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            # Varios generadores pueden arrancar a la vez contra la misma base de datos
+            cursor.execute("SELECT pg_advisory_xact_lock(%s);", (POSTGRES_SCHEMA_LOCK,))
+            # experiment_metadata es lo último que se crea; si existe, no se vuelve a ejecutar DDL que bloquearía a
+            # los procesos que ya están escribiendo
+            cursor.execute("SELECT to_regclass('experiment_metadata');")
+            if cursor.fetchone()[0] is None:
+                for statement in POSTGRES_SCHEMA_STATEMENTS:
+                    cursor.execute(statement)
+            conn.commit()
+
+def create_backend(db_type: str = settings.DB_TYPE, db_path: str = settings.SQLITE_DB_PATH, migrate_legacy: bool = False):
+    db_type = db_type.upper()
+    if db_type == "SQLITE":
+        return SQLiteBackend(db_path, migrate_legacy=migrate_legacy)
+    elif db_type in ("POSTGRESQL", "POSTGRES"):
+        return PostgresBackend()
+    raise ValueError(f"DB_TYPE '{db_type}' no soportado. Usa 'SQLITE' o 'POSTGRESQL'.")
@@ -1,92 +1,347 @@
+import os
 import time
 import random
-from src.utils import load_dataset, select_random_question, calculate_delay
+import threading
+import itertools
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from src.utils import load_dataset
+from src.popularity import PopularityModel
+from src.request_stream import RequestStream
+from src.request_trace import parse_replay_speed
+from src.load_profile import LoadProfile
+from src.prefetcher import Prefetcher
 from src.cache_system import CacheSystem
 from src.llm_connector import LLMConnector
-from src.score_calculator import ScoreCalculator
-from src.data_store import DataStore
+from src.score_calculator import ScoreCalculator, FITTED_MODES
+from src.data_store import DataStore, REQUEST_STAGES
+from src.scoring_pipeline import ScoringPipeline
+from src.metric_engine import MetricEngine
+from src.simulation import EventQueue, SimulatedCache, SimulatedLLM
+from src.latency_histogram import (new_latency_histograms, latency_histograms_to_dict, latency_histograms_from_dict,
+                                   print_latency_table, END_TO_END)
 from config import settings
 from datetime import datetime
 
+STAGES = REQUEST_STAGES
+CACHE_TIER = 'redis'
+SIMULATED_CACHE_TIER = 'simulated'
+
 class TrafficGenerator:
     def __init__(self):
         self.dataset = load_dataset()
         if self.dataset is None or self.dataset.empty:
             raise ValueError("No se pudo cargar el dataset. Verifica la ruta en .env")
         
-        self.cache = CacheSystem()
-        self.llm = LLMConnector()
-        self.scorer = ScoreCalculator()
-        self.store = DataStore()
+        self.mode = settings.TRAFFIC_MODE
+        if self.mode == "SIMULATION":
+            # Sin Redis ni LLM: un reloj virtual maneja las llegadas, las latencias y los vencimientos del TTL
+            self.events = EventQueue()
+            self.cache = SimulatedCache(self.events)
+            self.llm = SimulatedLLM()
+            self.cache_tier = SIMULATED_CACHE_TIER
+        else:
+            self.cache = CacheSystem()
+            self.llm = LLMConnector()
+            self.cache_tier = CACHE_TIER
+        self.scorer = ScoreCalculator(corpus=self.dataset['best_answer'])
+        if self.scorer.mode in FITTED_MODES:
+            self.scorer.attach_reference_vectors(settings.SCORER_REFERENCE_VECTORS_PATH)
+        self.metric_engine = MetricEngine(scorer=self.scorer)
+        sink = None
+        if settings.COLUMNAR_SINK_ENABLED:
+            from src.columnar_store import ColumnarSink
+            sink = ColumnarSink()
+        self.store = DataStore(sink=sink)
+        self.scoring_pipeline = None
+        if settings.SCORING_ASYNC:
+            self.scoring_pipeline = ScoringPipeline(self.scorer, self._on_score_ready, metrics=self.metric_engine.metric_names)
         
         self.distribution_type = settings.TRAFFIC_DISTRIBUTION_TYPE
         self.lambda_param = settings.TRAFFIC_LAMBDA
         self.num_requests = settings.TRAFFIC_NUM_REQUESTS
         self.max_delay = settings.TRAFFIC_MAX_DELAY_SECONDS
+        self.workers = settings.TRAFFIC_WORKERS
+        self.load_profile = None
+        self.trace_path = None
+        if settings.TRAFFIC_TRACE_REPLAY_PATH:
+            # Misma secuencia de preguntas y llegadas que una ejecución anterior (o una captura de producción)
+            self.replay_speed = parse_replay_speed(settings.TRAFFIC_REPLAY_SPEED)
+            self.stream = RequestStream.from_trace(self.dataset, settings.TRAFFIC_TRACE_REPLAY_PATH, self.replay_speed)
+            self.num_requests = len(self.stream)
+            self.popularity = None
+            metadata = dict(self.stream.trace_metadata)
+            metadata['trace'] = {'replayed': settings.TRAFFIC_TRACE_REPLAY_PATH, 'speed': settings.TRAFFIC_REPLAY_SPEED}
+        else:
+            self.popularity = PopularityModel(self.dataset)
+            if settings.TRAFFIC_LOAD_PROFILE:
+                self.load_profile = LoadProfile()
+            self.stream = RequestStream.generate(self.dataset, self.popularity, self.num_requests, self.distribution_type,
+                                                 self.lambda_param, self.max_delay, load_profile=self.load_profile)
+            metadata = {
+                'popularity': self.popularity.describe(),
+                'traffic': {
+                    'distribution': self.distribution_type,
+                    'lambda': self.lambda_param,
+                    'num_requests': self.num_requests,
+                    'max_delay_seconds': self.max_delay,
+                    'mode': self.mode
+                }
+            }
+            if self.load_profile is not None:
+                metadata['traffic']['load_profile'] = self.load_profile.describe()
+            if settings.TRAFFIC_TRACE_RECORD:
+                # La carga completa se conoce antes de empezar, así que la traza se graba de una vez
+                run_name = os.path.splitext(os.path.basename(settings.SQLITE_DB_PATH))[0]
+                if settings.TRAFFIC_PROCESS_INDEX is not None:
+                    run_name = f"{run_name}_p{settings.TRAFFIC_PROCESS_INDEX}"
+                trace_path = os.path.join(settings.TRAFFIC_TRACE_DIR, f"{run_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.trace")
+                self.trace_path = self.stream.save_trace(trace_path, metadata)
+                metadata['trace'] = {'recorded': self.trace_path}
+        if self.mode == "SIMULATION":
+            metadata['simulation'] = dict(self.llm.latency_model.describe(), error_rate=self.llm.error_rate, workers=self.workers)
+        self.prefetcher = None
+        if settings.PREFETCH_ENABLED:
+            # El stream da acceso a las preguntas del dataset que todavía nadie pidió
+            self.prefetcher = Prefetcher(self.cache.contains, catalog=self.stream)
+            metadata['prefetch'] = self.prefetcher.describe()
+        self.store.save_metadata(metadata)
+        # En lazo abierto varios workers actualizan las estadísticas a la vez
+        self.lock = threading.Lock()
         
         self.stats = {
             'total_requests': 0,
             'cache_hits': 0,
             'cache_misses': 0,
             'llm_errors': 0,
-            'successful_responses': 0
+            'successful_responses': 0,
+            'llm_seconds': 0.0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'rate_limit_wait_seconds': 0.0,
+            'llm_warmup_seconds': self.llm.warmup_seconds
+        }
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+        self.stage_counts = {stage: 0 for stage in STAGES}
+        # Histogramas logarítmicos por etapa y de punta a punta, separados en hits y misses
+        self.latency_histograms = new_latency_histograms(STAGES)
+        self.run_start_time = None
+        self.run_end_time = None
+        self.simulation_stats = {'wall_seconds': 0.0, 'simulated_seconds': 0.0, 'busy': 0, 'waiting': deque()}
+        self.load_stats = {
+            'scheduled': 0,
+            'schedule_seconds': 0.0,
+            'completed': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'dispatch_lag_seconds': 0.0,
+            'max_dispatch_lag_seconds': 0.0,
+            'start_time': None,
+            'last_completion_time': None
         }
         
         print(f"TrafficGenerator inicializado:")
-        print(f"  - Distribución: {self.distribution_type}")
+        print(f"  - Modo: {self.mode}" + (f" ({self.workers} workers)" if self.mode in ("OPEN_LOOP", "SIMULATION") else ""))
+        if self.mode == "SIMULATION":
+            print(f"  - LLM simulado: {self.llm.latency_model.describe()} (errores: {self.llm.error_rate:.1%})")
+        if self.load_profile is not None:
+            print(f"  - Perfil de carga: {self.load_profile.describe()} (media a largo plazo {self.load_profile.mean_rate():.3f} req/s)")
+            if self.mode == "CLOSED_LOOP":
+                print("  - Advertencia: en CLOSED_LOOP cada request espera al anterior y la tasa real queda por debajo del perfil.")
+        else:
+            print(f"  - Distribución: {self.distribution_type}")
         print(f"  - Lambda: {self.lambda_param}")
         print(f"  - Número de requests: {self.num_requests}")
         print(f"  - Delay máximo: {self.max_delay}s")
+        if self.popularity is not None:
+            print(f"  - Popularidad: {self.popularity.describe()}")
+        if settings.TRAFFIC_TRACE_REPLAY_PATH:
+            print(f"  - Repitiendo traza: {settings.TRAFFIC_TRACE_REPLAY_PATH} ({len(self.stream)} requests, velocidad {settings.TRAFFIC_REPLAY_SPEED})")
+        elif self.trace_path is not None:
+            print(f"  - Traza grabada en: {self.trace_path}")
+        if self.prefetcher is not None:
+            print(f"  - Prefetch en tiempo ocioso: {self.prefetcher.describe()}")
+        if self.llm.baseline_latency_seconds is not None:
+            print(f"  - Latencia base del LLM: {self.llm.baseline_latency_seconds:.2f}s (warm-up: {self.llm.warmup_seconds:.2f}s)")
+
+    def _record_stage(self, stage: str, start_time: float, request_stages: dict):
+        self._add_stage(stage, time.time() - start_time, request_stages)
+
+    def _add_stage(self, stage: str, elapsed: float, request_stages: dict):
+        with self.lock:
+            self.stage_seconds[stage] += elapsed
+            self.stage_counts[stage] += 1
+        request_stages[stage] = elapsed
+
+    def _increment(self, name: str, value=1):
+        with self.lock:
+            self.stats[name] += value
+
+    def _record_request_event(self, question_id: str, hit: bool, request_start: float, request_stages: dict, error: bool = False,
+                              end_time: float = None):
+        # Cada request queda en el log de eventos con su latencia total y por etapa
+        latency = (end_time if end_time is not None else time.time()) - request_start
+        with self.lock:
+            histograms = self.latency_histograms['hit' if hit else 'miss']
+            histograms[END_TO_END].record(latency)
+            for stage, seconds in request_stages.items():
+                histograms[stage].record(seconds)
+        self.store.record_request_event(
+            question_id,
+            hit=hit,
+            model=self.llm.model_id,
+            cache_tier=self.cache_tier if hit else None,
+            error=error,
+            latency_seconds=latency,
+            stage_seconds=request_stages,
+            ts=request_start
+        )
+
+    def _on_score_ready(self, question_id: str, metric_scores: dict):
+        # Llamado desde el pool de scoring cuando termina el score de una respuesta
+        quality_score = self.metric_engine.primary_score(metric_scores)
+        self.store.update_quality_score(question_id, quality_score, metric_scores, model=self.llm.model_id)
+        self.cache.update(question_id, {'quality_score': quality_score, 'metric_scores': metric_scores})
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Score asíncrono para {question_id}: {quality_score}")
 
-    def process_query(self, question: dict):
+    def process_query(self, question: dict, scheduled_time: float = None):
         question_id = question['question_id']
-        self.stats['total_requests'] += 1
+        self._increment('total_requests')
+        # En lazo abierto la latencia se mide desde la llegada programada, incluida la espera por un worker libre
+        request_start = scheduled_time if scheduled_time is not None else time.time()
+        request_stages = {}
         
+        stage_start = time.time()
         cached_result = self.cache.get(question_id)
+        if not cached_result and self.prefetcher is not None and self.prefetcher.wait_for(question_id):
+            # La pregunta se estaba precargando: la búsqueda incluye la espera por ese resultado
+            cached_result = self.cache.get(question_id)
+        self._record_stage('cache_lookup', stage_start, request_stages)
         
         if cached_result:
-            self.stats['cache_hits'] += 1
+            self._increment('cache_hits')
+            if self.prefetcher is not None:
+                self.prefetcher.on_hit(question_id)
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Cache HIT para {question_id}")
-            existing_result = self.store.get_result_by_question_id(question_id)
-            if existing_result:
-                existing_result['request_count'] = existing_result.get('request_count', 1) + 1
-                self.store.save_query_result(existing_result)
+            self._record_request_event(question_id, True, request_start, request_stages)
         else:
-            self.stats['cache_misses'] += 1
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Cache MISS para {question_id} - Consultando LLM...")
-            
-            llm_answer = self.llm.generate_answer(
-                question['title'],
-                question['content']
-            )
-            
-            if llm_answer.startswith("[Error:"):
-                self.stats['llm_errors'] += 1
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] Error del LLM para {question_id}: {llm_answer}")
-                return
-            
-            self.stats['successful_responses'] += 1
-            
-            quality_score = self.scorer.calculate_score(
+            self._increment('cache_misses')
+            if self.prefetcher is None:
+                return self._process_miss(question, request_start, request_stages)
+            # Mientras este miss espera al LLM no se precarga la misma pregunta
+            self.prefetcher.on_miss(question_id)
+            try:
+                self._process_miss(question, request_start, request_stages)
+            finally:
+                self.prefetcher.miss_finished(question_id)
+
+    def _process_miss(self, question: dict, request_start: float, request_stages: dict):
+        question_id = question['question_id']
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Cache MISS para {question_id} - Consultando LLM...")
+        
+        stage_start = time.time()
+        llm_result = self.llm.generate_answer(
+            question['title'],
+            question['content']
+        )
+        self._record_stage('llm', stage_start, request_stages)
+        llm_answer = llm_result['answer']
+        self._increment('llm_seconds', llm_result['llm_latency_seconds'])
+        self._increment('rate_limit_wait_seconds', llm_result['rate_limit_wait_seconds'])
+        self._increment('prompt_tokens', llm_result['prompt_tokens'] or 0)
+        self._increment('completion_tokens', llm_result['completion_tokens'] or 0)
+        
+        if llm_answer.startswith("[Error:"):
+            self._increment('llm_errors')
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Error del LLM para {question_id}: {llm_answer}")
+            self._record_request_event(question_id, False, request_start, request_stages, error=True)
+            return
+        
+        self._increment('successful_responses')
+        
+        # Con scoring asíncrono el resultado se publica sin score y se completa después
+        quality_score = None
+        metric_scores = None
+        if self.scoring_pipeline is None:
+            stage_start = time.time()
+            metric_scores = self.metric_engine.score(
                 question['original_best_answer'],
-                llm_answer
+                llm_answer,
+                question_id
             )
-            
-            result = {
-                'question_id': question_id,
-                'question_title': question['title'],
-                'question_content': question['content'],
-                'original_best_answer': question['original_best_answer'],
-                'llm_generated_answer': llm_answer,
-                'quality_score': quality_score
-            }
-            
-            self.store.save_query_result(result)
-            
-            self.cache.set(question_id, result)
-            
+            quality_score = self.metric_engine.primary_score(metric_scores)
+            self._record_stage('scoring', stage_start, request_stages)
+        
+        result = self._build_result(question, llm_result, quality_score, metric_scores)
+        
+        stage_start = time.time()
+        self.store.save_query_result(result)
+        self._record_stage('db_write', stage_start, request_stages)
+        
+        stage_start = time.time()
+        self.cache.set(question_id, result)
+        self._record_stage('cache_write', stage_start, request_stages)
+        self._record_request_event(question_id, False, request_start, request_stages)
+        
+        if self.scoring_pipeline is not None:
+            self.scoring_pipeline.submit(question_id, question['original_best_answer'], llm_answer)
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Procesado {question_id} - Score pendiente (cola: {self.scoring_pipeline.queue_depth})")
+        else:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Procesado {question_id} - Score: {quality_score}")
 
+    def _serve(self, question: dict, scheduled_time: float = None):
+        # Los requests reales tienen prioridad: mientras haya alguno en curso no se lanzan prefetches
+        if self.prefetcher is None:
+            return self.process_query(question, scheduled_time)
+        self.prefetcher.request_started(question)
+        try:
+            self.process_query(question, scheduled_time)
+        finally:
+            self.prefetcher.request_finished()
+
+    def _prefetch_question(self, question: dict, cancel: threading.Event) -> dict:
+        # Mismo camino que un miss, sin contar como request y con la llamada al LLM cancelable. Si la llamada ya terminó,
+        # la respuesta se guarda aunque haya llegado un request: descartarla no devuelve el tiempo del LLM
+        question_id = question['question_id']
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Prefetch de {question_id}...")
+        llm_result = self.llm.generate_answer(question['title'], question['content'], cancel=cancel)
+        if llm_result.get('cancelled') or llm_result['answer'].startswith("[Error:"):
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Prefetch de {question_id} sin respuesta: {llm_result['answer']}")
+            return llm_result
+        if self.cache.contains(question_id):
+            # Solo cuenta como usado el prefetch cuya respuesta llenó la caché
+            return dict(llm_result, duplicate=True)
+
+        quality_score = None
+        metric_scores = None
+        if self.scoring_pipeline is None:
+            metric_scores = self.metric_engine.score(question['original_best_answer'], llm_result['answer'], question_id)
+            quality_score = self.metric_engine.primary_score(metric_scores)
+        result = self._build_result(question, llm_result, quality_score, metric_scores)
+        self.store.save_query_result(result)
+        self.cache.set(question_id, result)
+        if self.scoring_pipeline is not None:
+            self.scoring_pipeline.submit(question_id, question['original_best_answer'], llm_result['answer'])
+        return llm_result
+
+    def _build_result(self, question: dict, llm_result: dict, quality_score: float = None, metric_scores: dict = None) -> dict:
+        return {
+            'question_id': question['question_id'],
+            'model': self.llm.model_id,
+            'question_title': question['title'],
+            'question_content': question['content'],
+            'original_best_answer': question['original_best_answer'],
+            'llm_generated_answer': llm_result['answer'],
+            'quality_score': quality_score,
+            'metric_scores': metric_scores,
+            'prompt_tokens': llm_result['prompt_tokens'],
+            'completion_tokens': llm_result['completion_tokens'],
+            'llm_latency_seconds': llm_result['llm_latency_seconds'],
+            'llm_retries': llm_result['llm_retries'],
+            'rate_limit_wait_seconds': llm_result['rate_limit_wait_seconds']
+        }
+
     def print_stats(self):
         print(f"\n{'='*60}")
         print("ESTADÍSTICAS DEL SISTEMA")
@@ -96,44 +351,357 @@ class TrafficGenerator:
         print(f"Cache misses: {self.stats['cache_misses']} ({self.stats['cache_misses']/max(1, self.stats['total_requests'])*100:.2f}%)")
         print(f"Respuestas exitosas del LLM: {self.stats['successful_responses']}")
         print(f"Errores del LLM: {self.stats['llm_errors']}")
+        print(f"Tiempo en el LLM: {self.stats['llm_seconds']:.2f}s (espera por rate limit: {self.stats['rate_limit_wait_seconds']:.2f}s)")
+        print(f"Warm-up del LLM (excluido): {self.stats['llm_warmup_seconds']:.2f}s")
+        print(f"Tokens: {self.stats['prompt_tokens']} prompt + {self.stats['completion_tokens']} completion")
         print(f"Tamaño de caché: {self.cache.size()}")
-        print(f"Registros en DB: {len(self.store.get_all_results())}")
+        store_stats = self.store.stats()
+        avg_quality_score = 'N/A' if store_stats['avg_quality_score'] is None else f"{store_stats['avg_quality_score']:.4f}"
+        print(f"Registros en DB: {store_stats['answers']} respuestas, {store_stats['request_count']} requests "
+              f"({store_stats['hit_rate']:.2f}% hits), score medio: {avg_quality_score}")
+        write_stats = self.store.get_write_stats()
+        print(f"Escrituras en DB: {write_stats['writes']} en {write_stats['batches']} commits "
+              f"(promedio {write_stats['avg_batch_size']:.1f} por commit, máximo {write_stats['max_batch_size']}, errores: {write_stats['errors']})")
+        if self.mode == "SIMULATION":
+            simulated_seconds = self.simulation_stats['simulated_seconds']
+            wall_seconds = self.simulation_stats['wall_seconds']
+            print(f"Tiempo simulado: {simulated_seconds:.1f}s en {wall_seconds:.2f}s reales "
+                  f"({simulated_seconds / wall_seconds if wall_seconds > 0 else 0:.0f}x)")
+            print(f"Caché simulada: {self.cache.evictions} desalojos, {self.cache.expirations} vencimientos por TTL")
+        if self.mode in ("OPEN_LOOP", "SIMULATION") and self.load_stats['start_time'] is not None:
+            load_stats = self.get_load_stats()
+            print(f"Throughput ofrecido: {load_stats['offered_rps']:.2f} req/s | logrado: {load_stats['achieved_rps']:.2f} req/s "
+                  f"({load_stats['completed']}/{load_stats['scheduled']} completados)")
+            print(f"  - Retraso de despacho: {load_stats['avg_dispatch_lag_seconds'] * 1000:.2f}ms promedio, "
+                  f"{load_stats['max_dispatch_lag_seconds'] * 1000:.2f}ms máximo (en vuelo máximo: {load_stats['max_in_flight']}/{self.workers})")
+        if self.prefetcher is not None:
+            prefetch_stats = self.prefetcher.get_stats()
+            print(f"Prefetch: {prefetch_stats['issued']} lanzados, {prefetch_stats['used']} usados por un request "
+                  f"({prefetch_stats['usefulness']:.1%}), {prefetch_stats['adopted']} esperados por un request en curso")
+            print(f"  - Desperdiciados: {prefetch_stats['wasted']} ({prefetch_stats['abandoned']} abandonados, {prefetch_stats['errors']} con error, "
+                  f"{prefetch_stats['duplicates']} duplicados, el resto sin pedir) | en curso: {prefetch_stats['pending']}")
+            print(f"  - Tiempo de LLM en prefetch: {prefetch_stats['llm_seconds']:.2f}s (útil: {prefetch_stats['useful_llm_seconds']:.2f}s, "
+                  f"desperdiciado: {prefetch_stats['wasted_llm_seconds']:.2f}s)")
+        with self.lock:
+            latency_histograms = latency_histograms_from_dict(latency_histograms_to_dict(self.latency_histograms))
+        print_latency_table(latency_histograms)
+        if self.scoring_pipeline is not None:
+            scoring_stats = self.scoring_pipeline.get_stats()
+            print(f"Scoring asíncrono: {scoring_stats['completed']}/{scoring_stats['submitted']} completados, {scoring_stats['failed']} fallidos")
+            print(f"  - Profundidad de cola: {scoring_stats['queue_depth']} (máxima: {scoring_stats['max_queue_depth']}, esperas por cola llena: {scoring_stats['backpressure_waits']})")
+            print(f"  - Espera en cola: {scoring_stats['avg_queue_wait_seconds'] * 1000:.2f}ms, scoring: {scoring_stats['avg_score_seconds'] * 1000:.2f}ms, escritura: {scoring_stats['avg_write_back_seconds'] * 1000:.2f}ms")
+            metric_seconds = scoring_stats['metric_seconds']
+            completed = max(1, scoring_stats['completed'])
+        else:
+            metric_seconds = {name: timing['total_seconds'] for name, timing in self.metric_engine.get_timings().items()}
+            completed = max(1, self.stage_counts['scoring'])
+        print("Tiempo por métrica (promedio por respuesta):")
+        for name, seconds in metric_seconds.items():
+            print(f"  - {name}: {seconds / completed * 1000:.3f}ms")
         print(f"{'='*60}\n")
 
+    def snapshot(self) -> dict:
+        # Estado acumulado en tipos simples, para combinarlo con el de otros procesos generadores
+        with self.lock:
+            if self.mode == "SIMULATION":
+                # En simulación el tiempo real no dice nada del throughput: se usa el reloj virtual
+                run_seconds = self.events.now
+            else:
+                run_seconds = ((self.run_end_time or time.time()) - self.run_start_time) if self.run_start_time else 0.0
+            return {
+                'stats': dict(self.stats),
+                'completed': self.load_stats['completed'] if self.mode != "CLOSED_LOOP" else self.stats['total_requests'],
+                'run_seconds': run_seconds,
+                'simulated': self.mode == "SIMULATION",
+                'latency_histograms': latency_histograms_to_dict(self.latency_histograms)
+            }
+
+    def get_load_stats(self) -> dict:
+        with self.lock:
+            load_stats = dict(self.load_stats)
+        completed = load_stats['completed']
+        elapsed = (load_stats['last_completion_time'] or load_stats['start_time'] or 0) - (load_stats['start_time'] or 0)
+        load_stats['offered_rps'] = load_stats['scheduled'] / load_stats['schedule_seconds'] if load_stats['schedule_seconds'] > 0 else 0.0
+        load_stats['achieved_rps'] = completed / elapsed if elapsed > 0 else 0.0
+        load_stats['avg_dispatch_lag_seconds'] = load_stats['dispatch_lag_seconds'] / completed if completed else 0.0
+        return load_stats
+
     def run(self):
         print(f"\n{'='*60}")
-        print(f"Iniciando generación de tráfico...")
+        print(f"Iniciando generación de tráfico ({self.mode})...")
         print(f"{'='*60}\n")
         
-        for i in range(self.num_requests):
-            question = select_random_question(self.dataset)
-            
-            if question is None:
-                print("Error: No se pudo seleccionar una pregunta. Saltando...")
-                continue
-            
+        self.run_start_time = time.time()
+        if self.prefetcher is not None and self.mode != "SIMULATION":
+            # En simulación los prefetches son eventos del reloj virtual; en los modos reales, hilos de baja prioridad
+            self.prefetcher.start(self._prefetch_question)
+        if self.mode == "OPEN_LOOP":
+            self._run_open_loop()
+        elif self.mode == "SIMULATION":
+            self._run_simulation()
+        else:
+            self._run_closed_loop()
+        self.run_end_time = time.time()
+        # Los histogramas quedan con el experimento para compararlo con otros en compare_experiments.py
+        self.store.save_metadata({'latency_histograms': latency_histograms_to_dict(self.latency_histograms)})
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.store.save_metadata({'prefetch': dict(self.prefetcher.describe(), **self.prefetcher.get_stats())})
+        
+        if self.scoring_pipeline is not None:
+            self.scoring_pipeline.close()
+        
+        print(f"\n{'='*60}")
+        print(f"Generación de tráfico completada!")
+        print(f"{'='*60}")
+        self.print_stats()
+        if self.store.sink is not None:
+            # Los eventos ya se escribieron en streaming; falta la foto final de resultados
+            self.store.export_columnar(datasets=['results'])
+        self.store.close()
+
+    
+    def _run_closed_loop(self):
+        for i, (question, delay) in enumerate(self.stream):
             try:
-                self.process_query(question)
+                self._serve(question)
             except Exception as e:
                 print(f"Error procesando consulta {i+1}: {e}")
-                import traceback
                 traceback.print_exc()
             
             if i < self.num_requests - 1:
-                delay = calculate_delay(
-                    self.distribution_type,
-                    self.lambda_param,
-                    self.max_delay
-                )
                 time.sleep(delay)
             
             if (i + 1) % 50 == 0:
                 self.print_stats()
+    
+    def _run_open_loop(self):
+        # Las llegadas se programan de antemano: un request lento no retrasa a los siguientes
+        offsets = self.stream.arrival_offsets()
+        self.load_stats['scheduled'] = len(offsets)
+        self.load_stats['schedule_seconds'] = float(offsets[-1]) if len(offsets) else 0.0
         
-        print(f"\n{'='*60}")
-        print(f"Generación de tráfico completada!")
-        print(f"{'='*60}")
-        self.print_stats()
+        start = time.time()
+        self.load_stats['start_time'] = start
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="TrafficWorker") as executor:
+            for i, ((question, _), offset) in enumerate(zip(self.stream, offsets.tolist())):
+                scheduled_time = start + offset
+                wait = scheduled_time - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                executor.submit(self._process_scheduled, question, scheduled_time, i)
+                
+                if (i + 1) % 50 == 0:
+                    self.print_stats()
+    
+    def _process_scheduled(self, question: dict, scheduled_time: float, index: int):
+        # El retraso de despacho mide cuánto esperó la llegada en la cola por un worker libre
+        dispatch_lag = max(0.0, time.time() - scheduled_time)
+        with self.lock:
+            self.load_stats['in_flight'] += 1
+            self.load_stats['max_in_flight'] = max(self.load_stats['max_in_flight'], self.load_stats['in_flight'])
+            self.load_stats['dispatch_lag_seconds'] += dispatch_lag
+            self.load_stats['max_dispatch_lag_seconds'] = max(self.load_stats['max_dispatch_lag_seconds'], dispatch_lag)
+        try:
+            self._serve(question, scheduled_time=scheduled_time)
+        except Exception as e:
+            print(f"Error procesando consulta {index+1}: {e}")
+            traceback.print_exc()
+        finally:
+            with self.lock:
+                self.load_stats['in_flight'] -= 1
+                self.load_stats['completed'] += 1
+                self.load_stats['last_completion_time'] = time.time()
+
+    def _run_simulation(self):
+        # Simulación de eventos discretos: las llegadas del stream, las llamadas al LLM (hasta TRAFFIC_WORKERS a la vez)
+        # y los vencimientos del TTL se procesan en orden de tiempo virtual, sin esperas reales
+        offsets = self.stream.arrival_offsets()
+        self.load_stats['scheduled'] = len(offsets)
+        self.load_stats['schedule_seconds'] = float(offsets[-1]) if len(offsets) else 0.0
+        # Los instantes virtuales se guardan como si el experimento empezara ahora
+        epoch = time.time()
+        self.load_stats['start_time'] = epoch
+        self.load_stats['last_completion_time'] = epoch
+        progress_interval = max(50, self.num_requests // 10)
+        
+        arrivals = zip(self.stream, offsets.tolist())
+        for (question, _), offset in itertools.islice(arrivals, 1):
+            self.events.schedule(offset, 'arrival', question)
+        while self.load_stats['completed'] < self.load_stats['scheduled']:
+            kind, payload = self.events.pop()
+            if kind == 'expire':
+                self.cache.expire(*payload)
+            elif kind == 'arrival':
+                # La siguiente llegada se programa recién ahora: la cola de eventos no crece con el número de requests
+                for (question, _), offset in itertools.islice(arrivals, 1):
+                    self.events.schedule(offset, 'arrival', question)
+                self._simulate_arrival(payload, epoch)
+                if self.stats['total_requests'] % progress_interval == 0:
+                    self.simulation_stats['simulated_seconds'] = self.events.now
+                    self.simulation_stats['wall_seconds'] = time.time() - epoch
+                    self.print_stats()
+            elif kind == 'prefetch':
+                self._simulate_prefetch_done(payload, epoch)
+            else:
+                self._simulate_completion(payload, epoch)
+            if self.prefetcher is not None:
+                self._simulate_prefetches()
+        
+        self.simulation_stats['simulated_seconds'] = self.events.now
+        self.simulation_stats['wall_seconds'] = time.time() - epoch
+    
+    def _simulate_arrival(self, question: dict, epoch: float):
+        now = self.events.now
+        self._increment('total_requests')
+        if self.prefetcher is not None:
+            self.prefetcher.record_request(question)
+        request_stages = {}
+        cached_result = self.cache.get(question['question_id'])
+        self._add_stage('cache_lookup', settings.SIMULATION_CACHE_LATENCY_SECONDS, request_stages)
+        lookup_end = now + settings.SIMULATION_CACHE_LATENCY_SECONDS
+        
+        if cached_result:
+            # Un hit no ocupa al LLM y termina con la búsqueda en caché
+            self._increment('cache_hits')
+            if self.prefetcher is not None:
+                self.prefetcher.on_hit(question['question_id'])
+            self._record_request_event(question['question_id'], True, epoch + now, request_stages, end_time=epoch + lookup_end)
+            self.load_stats['completed'] += 1
+            self.load_stats['last_completion_time'] = max(self.load_stats['last_completion_time'], epoch + lookup_end)
+            return
+        
+        request = (question, now, request_stages)
+        if self.prefetcher is not None:
+            entry = self.prefetcher.adopt(question['question_id'])
+            if entry is not None:
+                # Hit o miss se decide cuando termina el prefetch que está esperando
+                entry['adopters'].append(request)
+                return
+            self.prefetcher.on_miss(question['question_id'])
+            if not self._llm_slot_free():
+                self._preempt_prefetch(now)
+        self._increment('cache_misses')
+        if self._llm_slot_free():
+            self._simulate_llm_call(request, lookup_end)
+        else:
+            self.simulation_stats['waiting'].append(request)
+    
+    def _llm_slot_free(self) -> bool:
+        # Los prefetches en curso ocupan llamadas al LLM igual que los requests
+        in_flight = self.simulation_stats['busy'] + (len(self.prefetcher.in_flight) if self.prefetcher is not None else 0)
+        return in_flight < self.workers
+    
+    def _preempt_prefetch(self, now: float):
+        # Sin llamadas libres, un request cancela el prefetch más reciente que nadie está esperando
+        preemptable = [(entry['start'], question_id) for question_id, entry in self.prefetcher.in_flight.items() if not entry['adopters']]
+        if not preemptable:
+            return
+        start, question_id = max(preemptable)
+        # Su evento 'prefetch' queda en la cola y se ignora al salir
+        self.prefetcher.finish(question_id, {'answer': "[Error: Llamada cancelada]", 'cancelled': True, 'llm_latency_seconds': now - start})
+    
+    def _simulate_prefetches(self):
+        # Tiempo ocioso: sin requests en cola y con llamadas libres, se precargan las preguntas más probables
+        now = self.events.now
+        while (not self.simulation_stats['waiting'] and len(self.prefetcher.in_flight) < self.prefetcher.max_in_flight
+               and self._llm_slot_free()):
+            question = self.prefetcher.next_candidate()
+            if question is None:
+                return
+            entry = self.prefetcher.begin(question)
+            entry['start'] = now
+            entry['adopters'] = []
+            llm_result = self.llm.generate_answer(question['title'], question['content'])
+            end = now + llm_result['llm_latency_seconds']
+            if not llm_result['answer'].startswith("[Error:"):
+                end += settings.SIMULATION_DB_WRITE_SECONDS + settings.SIMULATION_CACHE_LATENCY_SECONDS
+            self.events.schedule(end, 'prefetch', (question, entry, llm_result))
+    
+    def _simulate_prefetch_done(self, payload: tuple, epoch: float):
+        question, entry, llm_result = payload
+        question_id = question['question_id']
+        if self.prefetcher.in_flight.get(question_id) is not entry:
+            # Prefetch cancelado por un request
+            return
+        now = self.events.now
+        failed = llm_result['answer'].startswith("[Error:")
+        if not failed and self.cache.contains(question_id):
+            llm_result = dict(llm_result, duplicate=True)
+        self.prefetcher.finish(question_id, llm_result)
+        if not failed and not llm_result.get('duplicate'):
+            result = self._build_result(question, llm_result, llm_result['quality_score'], llm_result['metric_scores'])
+            self.store.save_query_result(result, ts=epoch + now)
+            self.cache.set(question_id, result)
+        
+        for request in entry['adopters']:
+            _, arrival, request_stages = request
+            if failed:
+                # Sin respuesta precargada el request sigue como un miss normal
+                self._increment('cache_misses')
+                self.prefetcher.on_miss(question_id)
+                if self._llm_slot_free():
+                    self._simulate_llm_call(request, now)
+                else:
+                    self.simulation_stats['waiting'].append(request)
+                continue
+            # La búsqueda en caché incluye la espera por el prefetch
+            self._increment('cache_hits')
+            self.prefetcher.on_hit(question_id)
+            wait = now - arrival - request_stages['cache_lookup']
+            with self.lock:
+                self.stage_seconds['cache_lookup'] += wait
+            request_stages['cache_lookup'] += wait
+            self._record_request_event(question_id, True, epoch + arrival, request_stages, end_time=epoch + now)
+            self.load_stats['completed'] += 1
+            self.load_stats['last_completion_time'] = max(self.load_stats['last_completion_time'], epoch + now)
+        while self.simulation_stats['waiting'] and self._llm_slot_free():
+            self._simulate_llm_call(self.simulation_stats['waiting'].popleft(), now)
+    
+    def _simulate_llm_call(self, request: tuple, start: float):
+        question, arrival, request_stages = request
+        # El retraso de despacho es la espera en cola por una llamada libre al LLM
+        dispatch_lag = start - (arrival + settings.SIMULATION_CACHE_LATENCY_SECONDS)
+        self.simulation_stats['busy'] += 1
+        self.load_stats['in_flight'] = self.simulation_stats['busy']
+        self.load_stats['max_in_flight'] = max(self.load_stats['max_in_flight'], self.load_stats['in_flight'])
+        self.load_stats['dispatch_lag_seconds'] += dispatch_lag
+        self.load_stats['max_dispatch_lag_seconds'] = max(self.load_stats['max_dispatch_lag_seconds'], dispatch_lag)
+        
+        llm_result = self.llm.generate_answer(question['title'], question['content'])
+        self._add_stage('llm', llm_result['llm_latency_seconds'], request_stages)
+        end = start + llm_result['llm_latency_seconds']
+        if not llm_result['answer'].startswith("[Error:"):
+            end += settings.SIMULATION_DB_WRITE_SECONDS + settings.SIMULATION_CACHE_LATENCY_SECONDS
+        self.events.schedule(end, 'complete', (question, arrival, request_stages, llm_result))
+    
+    def _simulate_completion(self, payload: tuple, epoch: float):
+        question, arrival, request_stages, llm_result = payload
+        now = self.events.now
+        question_id = question['question_id']
+        self._increment('llm_seconds', llm_result['llm_latency_seconds'])
+        
+        if llm_result['answer'].startswith("[Error:"):
+            self._increment('llm_errors')
+            self._record_request_event(question_id, False, epoch + arrival, request_stages, error=True, end_time=epoch + now)
+        else:
+            self._increment('successful_responses')
+            # La respuesta entra en la caché al terminar, y desde ahí corre su TTL
+            result = self._build_result(question, llm_result, llm_result['quality_score'], llm_result['metric_scores'])
+            self.store.save_query_result(result, ts=epoch + now)
+            self._add_stage('db_write', settings.SIMULATION_DB_WRITE_SECONDS, request_stages)
+            self.cache.set(question_id, result)
+            self._add_stage('cache_write', settings.SIMULATION_CACHE_LATENCY_SECONDS, request_stages)
+            self._record_request_event(question_id, False, epoch + arrival, request_stages, end_time=epoch + now)
+        
+        self.load_stats['completed'] += 1
+        self.load_stats['last_completion_time'] = max(self.load_stats['last_completion_time'], epoch + now)
+        if self.prefetcher is not None:
+            self.prefetcher.miss_finished(question_id)
+        self.simulation_stats['busy'] -= 1
+        self.load_stats['in_flight'] = self.simulation_stats['busy']
+        if self.simulation_stats['waiting']:
+            self._simulate_llm_call(self.simulation_stats['waiting'].popleft(), now)
 
 
 if __name__ == "__main__":
@@ -4,7 +4,16 @@ from config import settings
 import random
 import os
 
-def load_dataset(path=settings.DATA_PATH):
+def load_dataset(path=settings.DATA_PATH, use_cache=settings.DATASET_CACHE_ENABLED):
+    if use_cache and os.path.exists(path):
+        try:
+            from src.dataset_cache import load_cached_dataset
+            return load_cached_dataset(path, read_dataset_csv)
+        except Exception as e:
+            print(f"Advertencia: No se pudo usar el caché columnar del dataset ({e}). Leyendo el CSV.")
+    return read_dataset_csv(path)
+
+def read_dataset_csv(path=settings.DATA_PATH):
     try:
         df = pd.read_csv(path, header=None, names=['class_index', 'title', 'content', 'best_answer'])
         df.dropna(subset=['title', 'content', 'best_answer'], inplace=True)
@@ -18,11 +27,16 @@ def load_dataset(path=settings.DATA_PATH):
         print(f"Ocurrió un error al cargar el dataset: {e}")
         return None
 
-def select_random_question(dataset: pd.DataFrame) -> dict:
+def select_random_question(dataset: pd.DataFrame, popularity=None) -> dict:
     if dataset is None or dataset.empty:
         return None
 
-    random_row = dataset.sample(n=1).iloc[0]
+    if popularity is None and isinstance(dataset, pd.DataFrame):
+        random_row = dataset.sample(n=1).iloc[0]
+    else:
+        # Muestreo O(1) con la tabla alias del modelo de popularidad; con el caché columnar solo se materializa esta fila
+        position = popularity.sample() if popularity is not None else random.randrange(len(dataset))
+        random_row = dataset.iloc[position]
     question_id = f"q_{random_row.name}"
 
     return {
@@ -32,10 +46,11 @@ def select_random_question(dataset: pd.DataFrame) -> dict:
         "original_best_answer": random_row['best_answer']
     }
 
+# Llegadas de Poisson = intervalos exponenciales: los dos nombres son la misma distribución
+EXPONENTIAL_DISTRIBUTIONS = ('POISSON', 'EXPONENTIAL')
+
 def calculate_delay(distribution_type: str, lambda_param: float, max_delay: float) -> float:
-    if distribution_type.upper() == 'POISSON':
-        delay = random.expovariate(lambda_param)
-    elif distribution_type.upper() == 'EXPONENTIAL':
+    if distribution_type.upper() in EXPONENTIAL_DISTRIBUTIONS:
         delay = random.expovariate(lambda_param)
     elif distribution_type.upper() == 'UNIFORM':
         delay = random.uniform(0.1, max_delay) 
@@ -45,6 +60,31 @@ def calculate_delay(distribution_type: str, lambda_param: float, max_delay: floa
 
     return max(0.1, min(delay, max_delay))
 
+def calculate_delays(distribution_type: str, lambda_param: float, max_delay: float, size: int, rng: np.random.Generator) -> np.ndarray:
+    # Versión vectorizada de calculate_delay: un lote de intervalos con la misma distribución y los mismos límites
+    if distribution_type.upper() in EXPONENTIAL_DISTRIBUTIONS:
+        delays = rng.exponential(1.0 / lambda_param, size)
+    else:
+        if distribution_type.upper() != 'UNIFORM':
+            print(f"Advertencia: Distribución '{distribution_type}' no reconocida. Usando uniforme.")
+        delays = rng.uniform(0.1, max_delay, size)
+    return np.maximum(0.1, np.minimum(delays, max_delay))
+
+def start_process_with_env(context, overrides: dict, target, name: str, args: tuple):
+    # Con spawn el hijo importa config.settings de cero: la configuración le llega en las variables de entorno heredadas
+    # al lanzarlo, y el entorno del padre se restaura enseguida
+    previous = {variable: os.environ.get(variable) for variable in overrides}
+    os.environ.update(overrides)
+    try:
+        process = context.Process(target=target, name=name, args=args)
+        process.start()
+    finally:
+        for variable, value in previous.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+    return process
 
 if __name__ == "__main__":
     print("--- Probando src/utils.py ---")